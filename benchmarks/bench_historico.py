@@ -0,0 +1,122 @@
+"""Mede a leitura de um histórico sintético grande.
+
+Compara o filtro por mês com ``datetime.strptime`` (como o relatório fazia)
+com a conferência por fatias fixas, e mede a reconstrução dos resumos
+mensais e a geração do relatório a partir deles.
+
+Uso::
+
+    python benchmarks/bench_historico.py [linhas]
+"""
+
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import persistence  # noqa: E402
+
+CATEGORIAS = ["MEDICAMENTOS", "MATERIAL", "VACINAS", "INSUMOS"]
+MUNICIPIOS = ["ARACRUZ", "LINHARES", "SERRA", "IBIRAÇU", "FUNDÃO"]
+EMISSORES = ["ANA", "JOÃO", "MARIA"]
+MES = "2024-05"
+
+
+def gerar_historico(caminho: str, linhas: int) -> None:
+    """Histórico em ordem cronológica com os dois formatos de data."""
+
+    aleatorio = random.Random(1)
+    data = datetime(2021, 1, 1, 8, 0)
+    passo = timedelta(minutes=4)
+    with open(caminho, "w", newline="", encoding="utf-8-sig") as arquivo:
+        writer = csv.writer(arquivo, delimiter=";")
+        writer.writerow(persistence.CABECALHO_HISTORICO)
+        for n in range(linhas):
+            data += passo
+            formato = "%d/%m/%Y %H:%M" if n % 3 else "%d/%m/%Y %H:%M:%S"
+            writer.writerow(
+                [
+                    data.strftime(formato),
+                    str(n),
+                    aleatorio.choice(CATEGORIAS),
+                    aleatorio.choice(EMISSORES),
+                    aleatorio.choice(MUNICIPIOS),
+                    aleatorio.randint(1, 20),
+                ]
+            )
+
+
+def totais_strptime(caminho: str, mes: str) -> dict[tuple[str, str, str], int]:
+    """Leitura original, aceitando também a data sem segundos."""
+
+    totais: dict[tuple[str, str, str], int] = {}
+    with open(caminho, newline="", encoding="utf-8-sig") as arquivo:
+        for row in csv.DictReader(arquivo, delimiter=";"):
+            texto = row["Data e Hora"]
+            try:
+                data = datetime.strptime(texto, "%d/%m/%Y %H:%M:%S")
+            except ValueError:
+                data = datetime.strptime(texto, "%d/%m/%Y %H:%M")
+            if data.strftime("%Y-%m") != mes:
+                continue
+            chave = (row["Categoria"], row["Município"], row["Emissor"])
+            totais[chave] = totais.get(chave, 0) + int(row["Volumes"])
+    return totais
+
+
+def totais_fatias(caminho: str, mes: str) -> dict[tuple[str, str, str], int]:
+    """Mesmo filtro comparando só o trecho ``MM/AAAA`` da data."""
+
+    mes_ano = f"{mes[5:7]}/{mes[:4]}"
+    totais: dict[tuple[str, str, str], int] = {}
+    with open(caminho, newline="", encoding="utf-8-sig") as arquivo:
+        reader = csv.reader(arquivo, delimiter=";")
+        next(reader, None)
+        for row in reader:
+            if row[0][3:10] != mes_ano or not persistence._data_hora_valida(row[0]):
+                continue
+            chave = (row[2], row[4], row[3])
+            totais[chave] = totais.get(chave, 0) + int(row[5])
+    return totais
+
+
+def medir(descricao: str, funcao, linhas: int):
+    inicio = time.perf_counter()
+    resultado = funcao()
+    tempo = time.perf_counter() - inicio
+    print(f"{descricao:>22}: {tempo:8.3f} s | {linhas / tempo:12,.0f} linhas/s")
+    return resultado
+
+
+def main() -> None:
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as pasta:
+        persistence.recurso_caminho = lambda nome: os.path.join(pasta, nome)
+        caminho = persistence.recurso_caminho("historico_impressoes.csv")
+        gerar_historico(caminho, linhas)
+        print(f"{linhas:,} linhas, {os.path.getsize(caminho) / 1e6:.1f} MB")
+
+        antigo = medir("strptime", lambda: totais_strptime(caminho, MES), linhas)
+        novo = medir("fatias fixas", lambda: totais_fatias(caminho, MES), linhas)
+        assert antigo == novo
+        medir("reconstruir resumos", persistence.reconstruir_resumos, linhas)
+
+        inicio = time.perf_counter()
+        relatorio = persistence.gerar_relatorio_mensal(MES)
+        tempo = time.perf_counter() - inicio
+        with open(relatorio, newline="", encoding="utf-8-sig") as arquivo:
+            gerado = {
+                (c, m, e): int(v)
+                for c, m, e, v in list(csv.reader(arquivo, delimiter=";"))[1:]
+            }
+        assert gerado == novo
+        print(f"{'relatório (resumos)':>22}: {tempo * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
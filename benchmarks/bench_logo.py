@@ -0,0 +1,60 @@
+"""Compara o empacotamento da logo pixel a pixel com o vetorizado.
+
+Uso::
+
+    python benchmarks/bench_logo.py
+"""
+
+import os
+import sys
+import timeit
+
+from PIL import Image
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import empacotar_bitmap, recurso_caminho  # noqa: E402
+
+
+def empacotar_pixel_a_pixel(imagem: Image.Image, largura_em_bytes: int) -> bytes:
+    """Implementação original, mantida como referência."""
+
+    pixels = imagem.load()
+    dados = bytearray()
+    for y in range(imagem.height):
+        for x_byte in range(largura_em_bytes):
+            byte = 0
+            for b in range(8):
+                x = x_byte * 8 + b
+                if x < imagem.width and pixels[x, y] == 0:
+                    byte |= 1 << (7 - b)
+            dados.append(byte)
+    return bytes(dados)
+
+
+def main() -> None:
+    original = Image.open(recurso_caminho("logo.png")).convert("L")
+    for largura in (120, 240):
+        altura = int(round(original.height * largura / original.width))
+        imagem = original.resize((largura, altura), Image.Resampling.LANCZOS)
+        imagem = imagem.convert("1", dither=Image.Dither.FLOYDSTEINBERG)
+        largura_bytes = largura // 8
+        assert empacotar_bitmap(imagem, largura_bytes) == empacotar_pixel_a_pixel(
+            imagem, largura_bytes
+        )
+
+        n = 50
+        antigo = timeit.timeit(
+            lambda: empacotar_pixel_a_pixel(imagem, largura_bytes), number=n
+        )
+        novo = timeit.timeit(lambda: empacotar_bitmap(imagem, largura_bytes), number=n)
+        print(
+            f"{largura:>4} px ({largura}x{altura}): "
+            f"loop {antigo / n * 1e3:8.3f} ms | "
+            f"vetorizado {novo / n * 1e3:8.3f} ms | "
+            f"{antigo / novo:6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Compara a montagem das etiquetas com f-strings e com o modelo compilado.
+
+Uso::
+
+    python benchmarks/bench_template.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from printing import (  # noqa: E402
+    LabelTemplate,
+    _texto_layout,
+    listar_templates,
+    obter_template,
+)
+
+CAMPOS = {
+    "saida": "Saida: 12345",
+    "categoria": "Categoria: MEDICAMENTOS",
+    "emissor": "Emissor: FULANO",
+    "municipio": "Municipio: ARACRUZ",
+    "data": "Impresso em: 01/02/2024 10:00",
+}
+COMANDO_LOGO = "BITMAP 120,450,30,80,0,"
+BITMAP = b"\xff" * 30 * 80
+
+
+def etiquetas_por_fstring(tpl: LabelTemplate, volumes: int) -> list[bytes]:
+    """Montagem original, mantida como referência."""
+
+    layout = tpl.layout
+    rotulos = []
+    for numero in range(1, volumes + 1):
+        cmd = (
+            f"SIZE {tpl.largura_mm} mm,{tpl.altura_mm} mm\n"
+            f"GAP {tpl.gap_mm} mm,0 mm\n"
+            "CLS\n"
+        )
+        cmd += _texto_layout("titulo", "CONIMS", layout)
+        for chave, texto in CAMPOS.items():
+            cmd += _texto_layout(chave, texto, layout)
+        cmd += _texto_layout("fracao", "[ ] Fracao", layout)
+        cmd += _texto_layout("fragil", "[ ] Fragil", layout)
+        cmd += _texto_layout("numeracao", f"{numero} DE {volumes}", layout)
+        cmd += COMANDO_LOGO
+        rotulos.append(cmd.encode() + BITMAP + b"\nPRINT 1\n")
+    return rotulos
+
+
+def etiquetas_compiladas(tpl: LabelTemplate, volumes: int) -> list[bytes]:
+    """Partes fixas montadas uma vez por lote; só a numeração por etiqueta."""
+
+    antes, depois = tpl.modelo.dividir(
+        "numeracao", {chave: texto.encode() for chave, texto in CAMPOS.items()}
+    )
+    depois += COMANDO_LOGO.encode()
+    fecha = f' DE {volumes}"\n'.encode()
+    fim = b"\nPRINT 1\n"
+    return [
+        b"".join(
+            (antes, tpl.abre_numeracao, str(n).encode(), fecha, depois, BITMAP, fim)
+        )
+        for n in range(1, volumes + 1)
+    ]
+
+
+def main() -> None:
+    volumes = 1000
+    for nome in listar_templates():
+        tpl = obter_template(nome)
+        assert etiquetas_por_fstring(tpl, volumes) == etiquetas_compiladas(tpl, volumes)
+
+        n = 20
+        antigo = timeit.timeit(lambda: etiquetas_por_fstring(tpl, volumes), number=n)
+        novo = timeit.timeit(lambda: etiquetas_compiladas(tpl, volumes), number=n)
+        print(
+            f"{nome:>10}: "
+            f"f-string {volumes * n / antigo:10,.0f} etiquetas/s | "
+            f"compilado {volumes * n / novo:10,.0f} etiquetas/s | "
+            f"{antigo / novo:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""Linha de comando para imprimir etiquetas sem a interface gráfica.
+
+Uso::
+
+    python cli.py print --saida 123 --categoria MEDICAMENTOS --emissor ANA \\
+        --municipio ARACRUZ --volumes 3
+    python cli.py print --manifesto saidas.csv
+    python cli.py reprint [--saida 123] [--intervalo 5-8]
+    python cli.py report [--mes 2024-05] [--reconstruir]
+    python cli.py backup
+    python cli.py import-sqlite
+    python cli.py serve [--host 0.0.0.0] [--porta 8765]
+
+``--impressora`` escolhe o destino (veja :mod:`transport`); sem ela é usada
+a impressora configurada. As demais opções de impressão vêm de
+``settings.json``, como na interface. Este módulo não importa o PyQt5 e só
+carrega :mod:`printing` nos comandos que imprimem, para iniciar rápido.
+
+O código de saída é 0 em caso de sucesso, 1 em falha e 2 em erro de uso.
+"""
+
+import argparse
+import sys
+from datetime import datetime
+from typing import Any
+
+from log import logger
+from manifest import (
+    ErroManifesto,
+    carregar_manifesto,
+    registrar_enviadas,
+    validar_item,
+)
+from persistence import (
+    carregar_config,
+    carregar_ultima_impressao,
+    configurar_armazenamento,
+    gerar_relatorio_mensal,
+    importar_para_sqlite,
+    reconstruir_resumos,
+    salvar_config,
+)
+from resilience import SEM_RETENTATIVA, PoliticaRetentativa, configurar_disjuntores
+from transport import fechar_transportes, obter_transporte
+
+
+def _opcoes_impressao(args: argparse.Namespace) -> dict[str, Any]:
+    """Opções de impressão de ``settings.json`` e da linha de comando."""
+
+    config = carregar_config()
+    disjuntor = config.get("disjuntor") or {}
+    configurar_disjuntores(
+        int(disjuntor.get("falhas_para_abrir", 3)),
+        float(disjuntor.get("tempo_aberto", 30)),
+    )
+    repetir = args.repetir or bool(config.get("retry_automatico"))
+    opcoes: dict[str, Any] = {
+        "politica": (
+            PoliticaRetentativa.de_config(config.get("retentativa"))
+            if repetir
+            else SEM_RETENTATIVA
+        ),
+        "template": args.template or config.get("template") or None,
+        "logo_residente": bool(config.get("logo_residente")),
+        "etiquetas_por_documento": int(config.get("etiquetas_por_documento") or 0),
+        "modo": str(config.get("modo_impressao", "padrao")),
+    }
+    if args.impressora:
+        opcoes["transporte"] = obter_transporte(args.impressora)
+    return opcoes
+
+
+def _falha(erro: dict[str, Any] | None) -> int:
+    erro = erro or {"code": -1, "message": "Falha"}
+    print(f"Erro {erro['code']}: {erro['message']}", file=sys.stderr)
+    impressas = erro.get("impressas")
+    if impressas:
+        faixas = ", ".join(f"{ini}-{fim}" for ini, fim in impressas)
+        print(f"Etiquetas já enviadas: {faixas}", file=sys.stderr)
+    return 1
+
+
+def _enviadas(ok: bool, erro: dict[str, Any] | None, total: int) -> int:
+    if ok:
+        return total
+    return sum(fim - ini + 1 for ini, fim in (erro or {}).get("impressas", []))
+
+
+def comando_print(args: argparse.Namespace) -> int:
+    """Imprime uma saída (ou um manifesto) e registra no histórico."""
+
+    import printing
+
+    try:
+        if args.manifesto:
+            itens = carregar_manifesto(args.manifesto)
+        else:
+            itens = [
+                validar_item(
+                    {
+                        "saida": args.saida,
+                        "categoria": args.categoria,
+                        "emissor": args.emissor,
+                        "municipio": args.municipio,
+                        "volumes": args.volumes,
+                    }
+                )
+            ]
+    except (OSError, ErroManifesto) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 2
+
+    data_hora = datetime.now().strftime("%d/%m/%Y %H:%M")
+    opcoes = _opcoes_impressao(args)
+    total = sum(item["volumes"] for item in itens)
+    if args.manifesto:
+        # o manifesto é sempre enviado no modo padrão
+        opcoes.pop("modo")
+        ok, erro = printing.imprimir_manifesto(itens, data_hora, **opcoes)
+    else:
+        item = itens[0]
+        ok, erro = printing.imprimir_etiqueta(
+            item["saida"],
+            item["categoria"],
+            item["emissor"],
+            item["municipio"],
+            item["volumes"],
+            data_hora,
+            **opcoes,
+        )
+    contagem_total, contagem_mensal = registrar_enviadas(
+        itens,
+        _enviadas(ok, erro, total),
+        data_hora,
+        lotes=[item["volumes"] for item in itens],
+    )
+    if not ok:
+        return _falha(erro)
+    print(
+        f"{total} etiquetas impressas ({len(itens)} saídas). "
+        f"Total: {contagem_total} | Mês: {contagem_mensal}"
+    )
+    return 0
+
+
+def comando_reprint(args: argparse.Namespace) -> int:
+    """Reimprime a última saída do histórico (ou parte dela)."""
+
+    import printing
+
+    ultima = carregar_ultima_impressao(args.saida)
+    if ultima is None:
+        print("Nenhuma impressão encontrada no histórico", file=sys.stderr)
+        return 1
+    # registros de lotes interrompidos ou de faltantes cobrem só parte do lote
+    total = int(ultima["lote"])
+    inicio, fim = 1, total
+    if args.intervalo:
+        try:
+            inicio_str, fim_str = args.intervalo.replace("–", "-").split("-")
+            inicio, fim = int(inicio_str), int(fim_str)
+        except ValueError:
+            print("Use o intervalo no formato início-fim, ex.: 5-8", file=sys.stderr)
+            return 2
+        if inicio < 1 or fim > total or inicio > fim:
+            print(f"O intervalo deve estar entre 1 e {total}", file=sys.stderr)
+            return 2
+
+    ok, erro = printing.imprimir_etiqueta(
+        ultima["saida"],
+        ultima["categoria"],
+        ultima["emissor"],
+        ultima["municipio"],
+        fim - inicio + 1,
+        ultima["data_hora"],
+        inicio_indice=inicio,
+        total_exibicao=total,
+        **_opcoes_impressao(args),
+    )
+    if not ok:
+        return _falha(erro)
+    print(f"Saída {ultima['saida']}: etiquetas {inicio} a {fim} de {total} reimpressas")
+    return 0
+
+
+def comando_report(args: argparse.Namespace) -> int:
+    """Gera o relatório consolidado do mês."""
+
+    if args.reconstruir:
+        meses = reconstruir_resumos()
+        print(f"Resumos de {meses} meses refeitos a partir do histórico")
+    try:
+        caminho = gerar_relatorio_mensal(args.mes)
+    except FileNotFoundError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    print(caminho)
+    return 0
+
+
+def comando_backup(args: argparse.Namespace) -> int:
+    """Copia os arquivos de dados para ``_backup``."""
+
+    from utils import backup_automatico
+
+    backup_automatico()
+    print("Backup concluído")
+    return 0
+
+
+def comando_serve(args: argparse.Namespace) -> int:
+    """Atende jobs de outras estações pela API de :mod:`print_server`."""
+
+    import asyncio
+
+    from print_server import ServidorImpressao
+
+    servidor = ServidorImpressao(
+        _opcoes_impressao(args), args.host, args.porta, args.fila
+    )
+    try:
+        asyncio.run(servidor.executar())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def comando_import_sqlite(args: argparse.Namespace) -> int:
+    """Importa os arquivos CSV/JSON para o SQLite e passa a usá-lo."""
+
+    linhas = importar_para_sqlite()
+    config = carregar_config()
+    config["armazenamento"] = "sqlite"
+    salvar_config(config)
+    print(f"{linhas} registros importados; armazenamento alterado para SQLite")
+    return 0
+
+
+def criar_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="cli.py", description="Gerador de etiquetas sem interface gráfica."
+    )
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    impressao = argparse.ArgumentParser(add_help=False)
+    impressao.add_argument(
+        "--impressora", help="destino (win32:NOME, tcp://host:porta, arquivo:CAMINHO)"
+    )
+    impressao.add_argument("--template", help="modelo de etiqueta")
+    impressao.add_argument(
+        "--repetir", action="store_true", help="repetir em caso de falha"
+    )
+
+    imprimir = comandos.add_parser(
+        "print", parents=[impressao], help="imprime uma saída ou um manifesto"
+    )
+    imprimir.add_argument("--manifesto", help="arquivo CSV/JSON com várias saídas")
+    imprimir.add_argument("--saida")
+    imprimir.add_argument("--categoria")
+    imprimir.add_argument("--emissor")
+    imprimir.add_argument("--municipio")
+    imprimir.add_argument("--volumes", type=int, default=1)
+    imprimir.set_defaults(executar=comando_print)
+
+    reimprimir = comandos.add_parser(
+        "reprint", parents=[impressao], help="reimprime a última saída do histórico"
+    )
+    reimprimir.add_argument("--saida", help="última impressão desta saída")
+    reimprimir.add_argument("--intervalo", help="etiquetas início-fim, ex.: 5-8")
+    reimprimir.set_defaults(executar=comando_reprint)
+
+    relatorio = comandos.add_parser("report", help="gera o relatório do mês")
+    relatorio.add_argument(
+        "--mes", default=datetime.now().strftime("%Y-%m"), help="mês (YYYY-MM)"
+    )
+    relatorio.add_argument(
+        "--reconstruir",
+        action="store_true",
+        help="refaz os resumos mensais lendo todo o histórico",
+    )
+    relatorio.set_defaults(executar=comando_report)
+
+    servir = comandos.add_parser(
+        "serve", parents=[impressao], help="servidor de impressão para a rede"
+    )
+    servir.add_argument(
+        "--host", default="127.0.0.1", help="endereço (0.0.0.0 para a rede)"
+    )
+    servir.add_argument("--porta", type=int, default=8765)
+    servir.add_argument("--fila", type=int, default=100, help="tamanho da fila")
+    servir.set_defaults(executar=comando_serve)
+
+    importar = comandos.add_parser(
+        "import-sqlite", help="importa os arquivos para o banco SQLite"
+    )
+    importar.set_defaults(executar=comando_import_sqlite)
+
+    backup = comandos.add_parser("backup", help="copia os dados para _backup")
+    backup.set_defaults(executar=comando_backup)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = criar_parser().parse_args(argv)
+    logger.info("CLI: %s", args.comando)
+    try:
+        configurar_armazenamento(str(carregar_config().get("armazenamento")))
+        return int(args.executar(args))
+    except Exception as e:
+        logger.exception("Erro no comando %s", args.comando)
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    finally:
+        fechar_transportes()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""Leitura de manifestos para impressão de várias saídas de uma vez.
+
+Um manifesto é um arquivo CSV (separado por ``;`` ou ``,``, com cabeçalho)
+ou JSON (lista de objetos) em que cada linha/objeto descreve uma saída com
+as colunas ``Saída``, ``Categoria``, ``Emissor``, ``Município`` e
+``Volumes``. Os nomes das colunas não diferenciam maiúsculas nem acentos.
+O manifesto inteiro é impresso por :func:`printing.imprimir_manifesto` e
+registrado de uma só vez por :func:`registrar_enviadas`.
+"""
+
+import csv
+import json
+import os
+import unicodedata
+from typing import Any, TypedDict
+
+from persistence import registrar_impressoes
+from utils import normalize_text
+
+# Limites de tamanho dos campos, iguais aos do formulário principal
+LIMITE_SAIDA = 20
+LIMITE_CAMPO = 50
+LIMITE_VOLUMES = 9999
+
+
+class ItemManifesto(TypedDict):
+    saida: str
+    categoria: str
+    emissor: str
+    municipio: str
+    volumes: int
+
+
+class ErroManifesto(ValueError):
+    """O manifesto não pôde ser lido ou contém uma linha inválida."""
+
+
+def _chave(nome: str) -> str:
+    """Normaliza o nome de uma coluna (minúsculas, sem acentos)."""
+
+    decomposto = unicodedata.normalize("NFKD", nome.strip().lower())
+    return "".join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def validar_item(dados: dict[str, Any], linha: int = 0) -> ItemManifesto:
+    """Converte e valida uma saída (linha ``linha`` do manifesto, se houver).
+
+    Raises:
+        ErroManifesto: Se algum campo estiver ausente ou for inválido.
+    """
+
+    prefixo = f"Linha {linha}: " if linha else ""
+    campos = {_chave(str(k)): v for k, v in dados.items() if k is not None}
+    textos: dict[str, str] = {}
+    for campo, limite in (
+        ("saida", LIMITE_SAIDA),
+        ("categoria", LIMITE_CAMPO),
+        ("emissor", LIMITE_CAMPO),
+        ("municipio", LIMITE_CAMPO),
+    ):
+        texto, erro = normalize_text(str(campos.get(campo) or ""), max_len=limite)
+        if erro:
+            raise ErroManifesto(f"{prefixo}{campo}: {erro}")
+        if not texto:
+            raise ErroManifesto(f"{prefixo}{campo} não informado")
+        textos[campo] = texto
+    try:
+        volumes = int(str(campos.get("volumes", "")).strip())
+    except ValueError:
+        raise ErroManifesto(f"{prefixo}volumes inválido") from None
+    if not 1 <= volumes <= LIMITE_VOLUMES:
+        raise ErroManifesto(f"{prefixo}volumes deve estar entre 1 e {LIMITE_VOLUMES}")
+    return ItemManifesto(
+        saida=textos["saida"],
+        categoria=textos["categoria"],
+        emissor=textos["emissor"],
+        municipio=textos["municipio"],
+        volumes=volumes,
+    )
+
+
+def carregar_manifesto(caminho: str) -> list[ItemManifesto]:
+    """Lê e valida um manifesto CSV ou JSON.
+
+    Args:
+        caminho (str): Caminho do arquivo (``.json`` ou CSV).
+
+    Returns:
+        list[ItemManifesto]: Saídas na ordem do arquivo.
+
+    Raises:
+        ErroManifesto: Se o arquivo for inválido; a mensagem indica a linha.
+    """
+
+    if os.path.splitext(caminho)[1].lower() == ".json":
+        with open(caminho, "r", encoding="utf-8-sig") as arquivo:
+            try:
+                dados = json.load(arquivo)
+            except json.JSONDecodeError as e:
+                raise ErroManifesto(f"JSON inválido: {e}") from None
+        if not isinstance(dados, list) or not all(isinstance(d, dict) for d in dados):
+            raise ErroManifesto("O manifesto JSON deve ser uma lista de objetos")
+        return [validar_item(d, i) for i, d in enumerate(dados, start=1)]
+
+    with open(caminho, "r", newline="", encoding="utf-8-sig") as arquivo:
+        cabecalho = arquivo.readline()
+        delimitador = ";" if cabecalho.count(";") >= cabecalho.count(",") else ","
+        arquivo.seek(0)
+        reader = csv.DictReader(arquivo, delimiter=delimitador)
+        # a linha 1 é o cabeçalho
+        return [
+            validar_item(linha, reader.line_num)
+            for linha in reader
+            if any((v or "").strip() for v in linha.values() if isinstance(v, str))
+        ]
+
+
+def distribuir_enviadas(
+    itens: list[ItemManifesto], enviadas: int
+) -> list[tuple[ItemManifesto, int]]:
+    """Reparte as ``enviadas`` primeiras etiquetas do manifesto entre as saídas.
+
+    Returns:
+        list[tuple[ItemManifesto, int]]: Saídas com ao menos uma etiqueta
+        enviada e quantas de cada uma.
+    """
+
+    resultado = []
+    for item in itens:
+        if enviadas <= 0:
+            break
+        quantidade = min(item["volumes"], enviadas)
+        resultado.append((item, quantidade))
+        enviadas -= quantidade
+    return resultado
+
+
+def registrar_enviadas(
+    itens: list[ItemManifesto],
+    enviadas: int,
+    data_hora: str,
+    lotes: list[int] | None = None,
+) -> tuple[int, int]:
+    """Registra as ``enviadas`` primeiras etiquetas em um único commit.
+
+    Args:
+        itens (list[ItemManifesto]): Saídas do job, na ordem de impressão.
+        enviadas (int): Etiquetas enviadas desde o início do job.
+        data_hora (str): Data e hora da impressão.
+        lotes (list[int] | None): Total do lote de cada item; ``None`` usa os
+            ``volumes`` de cada um. A saída interrompida no meio é registrada
+            com esse total na coluna ``Lote``, para a reimpressão numerar as
+            etiquetas em relação ao lote inteiro.
+
+    Returns:
+        tuple[int, int]: Total geral e total do mês atual atualizados.
+    """
+
+    if lotes is None:
+        lotes = [item["volumes"] for item in itens]
+    return registrar_impressoes(
+        [
+            {
+                **item,
+                "volumes": quantidade,
+                "data_hora": data_hora,
+                "lote": lote if quantidade < lote else None,
+            }
+            for (item, quantidade), lote in zip(
+                distribuir_enviadas(itens, enviadas), lotes
+            )
+        ]
+    )
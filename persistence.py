@@ -1,23 +1,140 @@
 """Funções de persistência de dados do aplicativo."""
 
 import csv
+import io
 import json
 import os
+import shutil
+import threading
 from datetime import datetime
 from typing import Any, cast
 
+import persistence_sqlite
+from log import logger
 from utils import recurso_caminho
 
 
 DEFAULT_CONFIG: dict[str, Any] = {
     "ultima_impressora": "",
     "template": "Padrão",
+    "armazenamento": "arquivos",
     "retry_automatico": False,
+    "logo_residente": False,
+    "modo_impressao": "padrao",
+    "transporte": "",
+    "etiquetas_por_documento": 50,
+    "pool_impressoras": [],
+    "pool_lote_minimo": 50,
+    "retentativa": {
+        "tentativas": 3,
+        "atraso_inicial": 0.5,
+        "fator": 2.0,
+        "atraso_maximo": 8.0,
+        "jitter": 0.1,
+    },
+    "disjuntor": {"falhas_para_abrir": 3, "tempo_aberto": 30},
     "backup_horario": "17:10",
     "backup_quantidade": 7,
 }
 
 
+# Formatos de armazenamento do histórico, contadores e recentes
+ARMAZENAMENTOS = ("arquivos", "sqlite")
+_armazenamento = "arquivos"
+
+# Diário da transação em andamento em ``registrar_impressoes``
+DIARIO = "transacao.json"
+# Andamento do lote em impressão; cada processo usa o seu, pois os números
+# de job só são únicos dentro do processo
+CHECKPOINT = "checkpoint.json"
+CHECKPOINT_SERVIDOR = "checkpoint_servidor.json"
+CABECALHO_HISTORICO = [
+    "Data e Hora",
+    "Saída",
+    "Categoria",
+    "Emissor",
+    "Município",
+    "Volumes",
+    # total do lote, preenchido só quando o registro cobre parte dele
+    "Lote",
+]
+# Posição de cada dia e mês no CSV do histórico
+INDICE_HISTORICO = "indice_historico.json"
+# Totais de cada mês por categoria, município e emissor
+PASTA_RESUMOS = "resumos"
+# Recuo usado em cada arquivo JSON, como nas funções que o gravam
+_RECUO_JSON: dict[str, int | None] = {
+    "contagem_mensal.json": 2,
+    INDICE_HISTORICO: None,
+}
+
+# Últimas leituras dos arquivos JSON e a data/tamanho do arquivo lido
+_lidos: dict[str, tuple[tuple[int, int], Any]] = {}
+
+
+def configurar_armazenamento(nome: str) -> None:
+    """Escolhe onde histórico, contadores e recentes são gravados.
+
+    ``arquivos`` usa os arquivos CSV/JSON de ``assets``; ``sqlite`` usa o
+    banco ``historico.db`` (veja :mod:`persistence_sqlite`). Configurações e
+    checkpoint continuam em arquivos nos dois casos.
+
+    Args:
+        nome (str): Um dos valores de ``ARMAZENAMENTOS``.
+    """
+
+    global _armazenamento
+    if nome not in ARMAZENAMENTOS:
+        raise ValueError(f"Armazenamento desconhecido: {nome}")
+    _armazenamento = nome
+
+
+def _usa_sqlite() -> bool:
+    return _armazenamento == "sqlite"
+
+
+def _caminho_banco() -> str:
+    return recurso_caminho("historico.db")
+
+
+def importar_para_sqlite() -> int:
+    """Copia histórico, contadores e recentes dos arquivos para o banco.
+
+    O conteúdo anterior do banco é substituído; os arquivos não são
+    alterados.
+
+    Returns:
+        int: Quantidade de linhas do histórico importadas.
+    """
+
+    return persistence_sqlite.importar_arquivos(
+        _caminho_banco(),
+        recurso_caminho("historico_impressoes.csv"),
+        recurso_caminho("contagem.json"),
+        recurso_caminho("contagem_mensal.json"),
+        recurso_caminho("recentes.json"),
+    )
+
+
+def exportar_historico() -> str:
+    """Obtém um CSV com todo o histórico, para abrir em planilhas.
+
+    No armazenamento em arquivos é o próprio ``historico_impressoes.csv``; no
+    SQLite o histórico é exportado para a pasta ``reports``.
+
+    Returns:
+        str: Caminho do arquivo CSV.
+    """
+
+    if not _usa_sqlite():
+        return recurso_caminho("historico_impressoes.csv")
+    reports_dir = os.path.join(os.path.dirname(recurso_caminho("")), "reports")
+    os.makedirs(reports_dir, exist_ok=True)
+    destino = os.path.join(reports_dir, "historico_impressoes.csv")
+    persistence_sqlite.exportar_csv(_caminho_banco(), destino)
+    return destino
+
+
 def carregar_config() -> dict[str, Any]:
     """Lê as configurações persistidas do aplicativo."""
 
@@ -44,6 +161,67 @@ def salvar_config(dados: dict[str, Any]) -> None:
         json.dump(dados, arquivo, ensure_ascii=False, indent=4)
 
 
+# Serializa a gravação do checkpoint (thread da fila) e sua remoção (interface)
+_checkpoint_lock = threading.Lock()
+
+
+def salvar_checkpoint(dados: dict[str, Any], nome: str = CHECKPOINT) -> None:
+    """Grava o andamento do lote em impressão.
+
+    O arquivo é substituído de forma atômica, de modo que uma queda durante a
+    gravação mantém o checkpoint anterior intacto.
+
+    Args:
+        dados (dict[str, Any]): Dados do lote e quantidade já enviada.
+        nome (str): Arquivo do checkpoint em ``assets``; o servidor de
+            impressão usa ``CHECKPOINT_SERVIDOR``.
+    """
+
+    caminho = recurso_caminho(nome)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = caminho + ".tmp"
+    with _checkpoint_lock:
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(dados, arquivo, ensure_ascii=False, indent=4)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, caminho)
+
+
+def carregar_checkpoint(nome: str = CHECKPOINT) -> dict[str, Any] | None:
+    """Lê o checkpoint de um lote interrompido, se houver."""
+
+    caminho = recurso_caminho(nome)
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, "r", encoding="utf-8") as arquivo:
+        try:
+            dados: dict[str, Any] = json.load(arquivo)
+        except Exception:
+            return None
+    return dados
+
+
+def limpar_checkpoint(job: int | None = None, nome: str = CHECKPOINT) -> None:
+    """Remove o checkpoint após o lote ser concluído ou registrado.
+
+    Args:
+        job (int | None): Remove apenas o checkpoint gravado por este job;
+            o da fila pode já pertencer ao job seguinte. ``None`` remove
+            qualquer checkpoint.
+        nome (str): Arquivo do checkpoint em ``assets``.
+    """
+
+    caminho = recurso_caminho(nome)
+    with _checkpoint_lock:
+        if job is not None:
+            dados = carregar_checkpoint(nome)
+            if dados is None or dados.get("job") != job:
+                return
+        if os.path.exists(caminho):
+            os.remove(caminho)
+
+
 def carregar_contagem() -> tuple[int, int]:
     """Lê os contadores de impressão.
 
@@ -51,13 +229,22 @@ def carregar_contagem() -> tuple[int, int]:
         tuple[int, int]: Total geral e total do mês atual.
     """
 
-    caminho = recurso_caminho("contagem.json")
     mes_atual = datetime.now().strftime("%m-%Y")
+    if _usa_sqlite():
+        return persistence_sqlite.carregar_contagem(_caminho_banco(), mes_atual)
+    _recuperar_transacao()
+    caminho = recurso_caminho("contagem.json")
     contagem_total: int = 0
     contagem_mensal: int = 0
     if os.path.exists(caminho):
-        with open(caminho, "r", encoding="utf-8") as arquivo:
-            dados: dict[str, int | str] = json.load(arquivo)
+        try:
+            with open(caminho, "r", encoding="utf-8") as arquivo:
+                dados: dict[str, int | str] = json.load(arquivo)
+        except ValueError:
+            # arquivo truncado por uma queda: os totais são refeitos pelos meses
+            logger.warning("contagem.json inválido; totais refeitos pelos meses")
+            dados = _contagem_pelos_meses(mes_atual)
+            salvar_contagem(int(dados["total_geral"]), int(dados["total_mes"]))
         if dados.get("mes_atual") == mes_atual:
             contagem_total = int(dados.get("total_geral") or 0)
             contagem_mensal = int(dados.get("total_mes") or 0)
@@ -70,6 +257,20 @@ def carregar_contagem() -> tuple[int, int]:
     return contagem_total, contagem_mensal
 
 
+def _contagem_pelos_meses(mes_atual: str) -> dict[str, int | str]:
+    """Contadores calculados a partir de ``contagem_mensal.json``."""
+
+    try:
+        por_mes = carregar_historico_mensal()
+    except ValueError:
+        por_mes = {}
+    return {
+        "total_geral": sum(int(total) for total in por_mes.values()),
+        "total_mes": int(por_mes.get(mes_atual, 0)),
+        "mes_atual": mes_atual,
+    }
+
+
 def salvar_contagem(contagem_total: int, contagem_mensal: int) -> None:
     """Persiste os contadores de impressão.
 
@@ -78,6 +279,14 @@ def salvar_contagem(contagem_total: int, contagem_mensal: int) -> None:
         contagem_mensal (int): Quantidade de etiquetas impressas no mês.
     """
 
+    if _usa_sqlite():
+        persistence_sqlite.salvar_contagem(
+            _caminho_banco(),
+            contagem_total,
+            contagem_mensal,
+            datetime.now().strftime("%m-%Y"),
+        )
+        return
     caminho = recurso_caminho("contagem.json")
     os.makedirs(os.path.dirname(caminho), exist_ok=True)
     dados: dict[str, int | str] = {
@@ -108,20 +317,88 @@ def salvar_historico(
         data_hora (str): Data e hora da impressão.
     """
 
+    registro = {
+        "saida": saida,
+        "categoria": categoria,
+        "emissor": emissor,
+        "municipio": municipio,
+        "volumes": volumes,
+        "data_hora": data_hora,
+    }
+    if _usa_sqlite():
+        persistence_sqlite.salvar_historico(_caminho_banco(), registro)
+        return
+    _recuperar_transacao()
+    transacao = _transacao_historico([registro])
+    _gravar_diario(transacao)
+    _aplicar_transacao(transacao)
+
+
+def carregar_ultima_impressao(saida: str | None = None) -> dict[str, Any] | None:
+    """Obtém o último registro do histórico, opcionalmente de uma saída.
+
+    Args:
+        saida (str | None): Número da saída procurada; ``None`` para qualquer.
+
+    Returns:
+        dict[str, Any] | None: ``saida``, ``categoria``, ``emissor``,
+        ``municipio``, ``volumes``, ``data_hora`` e ``lote`` (total do lote,
+        igual a ``volumes`` quando o registro é o lote inteiro) do registro,
+        ou ``None``.
+    """
+
+    if _usa_sqlite():
+        return persistence_sqlite.carregar_ultima_impressao(_caminho_banco(), saida)
     caminho = recurso_caminho("historico_impressoes.csv")
-    existe = os.path.exists(caminho)
-    with open(caminho, "a", newline="", encoding="utf-8-sig") as arquivo:
-        writer = csv.writer(arquivo, delimiter=";")
-        if not existe:
-            writer.writerow(
-                ["Data e Hora", "Saída", "Categoria", "Emissor", "Município", "Volumes"]
-            )
-        writer.writerow([data_hora, saida, categoria, emissor, municipio, volumes])
+    tamanho = (_assinatura(caminho) or (0, 0))[1]
+    if tamanho == 0:
+        return None
+    # lê os dias do último mês e depois os meses anteriores, do fim para o
+    # começo do arquivo, até achar o registro
+    indice = _carregar_indice(tamanho)
+    faixas = sorted(
+        [
+            *indice["dias"].values(),
+            *(f for mes, f in indice["meses"].items() if mes != indice["mes_dias"]),
+        ],
+        key=lambda f: f[1],
+        reverse=True,
+    )
+    ultima: list[str] | None = None
+    posicao_ultima = -1
+    with open(caminho, "rb") as arquivo:
+        for inicio, fim in faixas:
+            if fim <= posicao_ultima:
+                break
+            arquivo.seek(inicio)
+            posicao = inicio
+            while posicao < fim:
+                linha = arquivo.readline()
+                if not linha:
+                    break
+                campos = next(csv.reader([linha.decode("utf-8")], delimiter=";"))
+                if len(campos) >= 6 and saida in (None, campos[1]):
+                    if posicao > posicao_ultima:
+                        ultima, posicao_ultima = campos, posicao
+                posicao += len(linha)
+    if ultima is None:
+        return None
+    return {
+        "saida": ultima[1],
+        "categoria": ultima[2],
+        "emissor": ultima[3],
+        "municipio": ultima[4],
+        "volumes": int(ultima[5]),
+        "data_hora": ultima[0],
+        "lote": int(ultima[6]) if len(ultima) > 6 and ultima[6] else int(ultima[5]),
+    }
 
 
 def carregar_recentes() -> dict[str, dict[str, int]]:
     """Lê as listas de valores usados recentemente."""
 
+    if _usa_sqlite():
+        return persistence_sqlite.carregar_recentes(_caminho_banco())
     caminho = recurso_caminho("recentes.json")
     if os.path.exists(caminho):
         with open(caminho, "r", encoding="utf-8") as arquivo:
@@ -132,7 +409,19 @@ def carregar_recentes() -> dict[str, dict[str, int]]:
 def atualizar_recentes(categoria: str, emissor: str, municipio: str) -> None:
     """Atualiza o contador de valores mais utilizados."""
 
+    if _usa_sqlite():
+        persistence_sqlite.atualizar_recentes(
+            _caminho_banco(), categoria, emissor, municipio
+        )
+        return
     dados = carregar_recentes()
+    _somar_recentes(dados, categoria, emissor, municipio)
+    _gravar_recentes(dados)
+
+
+def _somar_recentes(
+    dados: dict[str, dict[str, int]], categoria: str, emissor: str, municipio: str
+) -> None:
     for campo, valor in (
         ("categoria", categoria),
         ("emissor", emissor),
@@ -146,6 +435,8 @@ def atualizar_recentes(categoria: str, emissor: str, municipio: str) -> None:
         ordenado = sorted(mapa.items(), key=lambda x: x[1], reverse=True)[:20]
         dados[campo] = {k: v for k, v in ordenado}
 
+
+def _gravar_recentes(dados: dict[str, dict[str, int]]) -> None:
     caminho = recurso_caminho("recentes.json")
     os.makedirs(os.path.dirname(caminho), exist_ok=True)
     with open(caminho, "w", encoding="utf-8") as arquivo:
@@ -170,6 +461,9 @@ def registrar_contagem_mensal(mes: str, quantidade: int) -> None:
         quantidade (int): Quantidade de etiquetas a somar.
     """
 
+    if _usa_sqlite():
+        persistence_sqlite.registrar_contagem_mensal(_caminho_banco(), mes, quantidade)
+        return
     caminho = recurso_caminho("contagem_mensal.json")
     if os.path.exists(caminho):
         with open(caminho, "r", encoding="utf-8") as arquivo:
@@ -181,6 +475,478 @@ def registrar_contagem_mensal(mes: str, quantidade: int) -> None:
         json.dump(dados, arquivo, ensure_ascii=False, indent=2)
 
 
+def registrar_impressao(
+    saida: str,
+    categoria: str,
+    emissor: str,
+    municipio: str,
+    volumes: int,
+    data_hora: str,
+    recentes: bool = True,
+    lote: int | None = None,
+) -> tuple[int, int]:
+    """Registra uma impressão no histórico, nos contadores e nos recentes.
+
+    Todas as gravações formam uma única transação; veja
+    :func:`registrar_impressoes`.
+
+    Args:
+        saida (str): Número da saída.
+        categoria (str): Categoria da etiqueta.
+        emissor (str): Nome de quem emitiu a etiqueta.
+        municipio (str): Município de destino.
+        volumes (int): Quantidade de etiquetas impressas.
+        data_hora (str): Data e hora da impressão.
+        recentes (bool): Se ``False`` a lista de recentes não é alterada
+            (usado ao completar um lote já registrado).
+        lote (int | None): Total do lote quando ``volumes`` é só parte dele
+            (lote interrompido ou faltantes); gravado na coluna ``Lote``.
+
+    Returns:
+        tuple[int, int]: Total geral e total do mês atual atualizados.
+    """
+
+    return registrar_impressoes(
+        [
+            {
+                "saida": saida,
+                "categoria": categoria,
+                "emissor": emissor,
+                "municipio": municipio,
+                "volumes": volumes,
+                "data_hora": data_hora,
+                "lote": lote,
+            }
+        ],
+        recentes,
+    )
+
+
+def registrar_impressoes(
+    registros: list[dict[str, Any]], recentes: bool = True
+) -> tuple[int, int]:
+    """Registra várias impressões em uma única transação.
+
+    Equivale a chamar, para cada registro, :func:`salvar_historico`,
+    :func:`atualizar_recentes` e :func:`registrar_contagem_mensal`, além de
+    somar os volumes em ``contagem.json``. No armazenamento em arquivos todo
+    o novo conteúdo é gravado antes em um diário (``transacao.json``) e só
+    então aplicado aos arquivos, que são sincronizados com o disco antes de o
+    diário ser removido; se o aplicativo cair no meio, o diário é reaplicado
+    na próxima gravação ou ao carregar a contagem. Os arquivos JSON já lidos
+    não são lidos de novo enquanto não mudarem.
+
+    Args:
+        registros (list[dict[str, Any]]): Itens com ``saida``, ``categoria``,
+            ``emissor``, ``municipio``, ``volumes`` e ``data_hora`` e,
+            opcionalmente, ``lote``.
+        recentes (bool): Se ``False`` a lista de recentes não é alterada.
+
+    Returns:
+        tuple[int, int]: Total geral e total do mês atual atualizados.
+    """
+
+    registros = [r for r in registros if int(r["volumes"]) > 0]
+    if _usa_sqlite():
+        return persistence_sqlite.registrar_impressoes(
+            _caminho_banco(), registros, datetime.now().strftime("%m-%Y"), recentes
+        )
+    _recuperar_transacao()
+    if not registros:
+        return carregar_contagem()
+    transacao, totais = _montar_transacao(registros, recentes)
+    _gravar_diario(transacao)
+    _aplicar_transacao(transacao)
+    return totais
+
+
+def _assinatura(caminho: str) -> tuple[int, int] | None:
+    try:
+        info = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+    return info.st_mtime_ns, info.st_size
+
+
+def _ler_json(nome: str, padrao: Any) -> Any:
+    """Lê um arquivo JSON de ``assets``, reaproveitando a última leitura.
+
+    O conteúdo devolvido é compartilhado e não deve ser alterado.
+    """
+
+    caminho = recurso_caminho(nome)
+    assinatura = _assinatura(caminho)
+    if assinatura is None:
+        return padrao
+    lido = _lidos.get(caminho)
+    if lido is not None and lido[0] == assinatura:
+        return lido[1]
+    with open(caminho, "r", encoding="utf-8") as arquivo:
+        dados = json.load(arquivo)
+    _lidos[caminho] = (assinatura, dados)
+    return dados
+
+
+def _montar_transacao(
+    registros: list[dict[str, Any]], recentes: bool
+) -> tuple[dict[str, Any], tuple[int, int]]:
+    """Calcula o novo conteúdo de todos os arquivos afetados pelos registros."""
+
+    transacao = _transacao_historico(registros)
+    arquivos = transacao["arquivos"]
+    mes_atual = datetime.now().strftime("%m-%Y")
+    quantidade = sum(int(r["volumes"]) for r in registros)
+
+    try:
+        contagem = _ler_json("contagem.json", {})
+    except ValueError:
+        # as etiquetas já saíram: o registro não pode falhar por um arquivo
+        # truncado, que é regravado por esta transação
+        logger.warning("contagem.json inválido; totais refeitos pelos meses")
+        contagem = _contagem_pelos_meses(mes_atual)
+    contagem_total = int(contagem.get("total_geral") or 0) + quantidade
+    contagem_mensal = quantidade
+    if contagem.get("mes_atual") == mes_atual:
+        contagem_mensal += int(contagem.get("total_mes") or 0)
+    por_mes = dict(_ler_json("contagem_mensal.json", {}))
+    por_mes[mes_atual] = por_mes.get(mes_atual, 0) + quantidade
+    arquivos["contagem.json"] = {
+        "total_geral": contagem_total,
+        "total_mes": contagem_mensal,
+        "mes_atual": mes_atual,
+    }
+    arquivos["contagem_mensal.json"] = por_mes
+    if recentes:
+        usados = {
+            campo: dict(valores)
+            for campo, valores in _ler_json("recentes.json", {}).items()
+        }
+        for r in registros:
+            _somar_recentes(usados, r["categoria"], r["emissor"], r["municipio"])
+        arquivos["recentes.json"] = usados
+    return transacao, (contagem_total, contagem_mensal)
+
+
+def _transacao_historico(registros: list[dict[str, Any]]) -> dict[str, Any]:
+    """Linhas a acrescentar ao histórico, seu índice e os resumos mensais."""
+
+    _garantir_resumos()
+    tamanho = (_assinatura(recurso_caminho("historico_impressoes.csv")) or (0, 0))[1]
+    indice = _carregar_indice(tamanho)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=";")
+
+    def linha_csv(campos: list[Any]) -> str:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(campos)
+        return buffer.getvalue()
+
+    linhas = ["\ufeff" + linha_csv(CABECALHO_HISTORICO)] if tamanho == 0 else []
+    posicao = tamanho + sum(len(linha.encode("utf-8")) for linha in linhas)
+    for r in registros:
+        linha = linha_csv(
+            [
+                r["data_hora"],
+                r["saida"],
+                r["categoria"],
+                r["emissor"],
+                r["municipio"],
+                int(r["volumes"]),
+                *([int(r["lote"])] if r.get("lote") else []),
+            ]
+        )
+        fim = posicao + len(linha.encode("utf-8"))
+        dia = _dia_registro(r["data_hora"])
+        if dia is not None:
+            _indexar(indice, dia, posicao, fim)
+        posicao = fim
+        linhas.append(linha)
+    indice["tamanho"] = posicao
+
+    arquivos = _somar_resumos(registros)
+    arquivos[INDICE_HISTORICO] = indice
+    return {
+        "historico": {"tamanho": tamanho, "linhas": "".join(linhas)},
+        "arquivos": arquivos,
+    }
+
+
+def _gravar_diario(transacao: dict[str, Any]) -> None:
+    """Grava o diário; a transação vale a partir deste ponto."""
+
+    caminho = recurso_caminho(DIARIO)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        json.dump(transacao, arquivo, ensure_ascii=False)
+        arquivo.flush()
+        os.fsync(arquivo.fileno())
+    os.replace(temporario, caminho)
+
+
+def _aplicar_transacao(transacao: dict[str, Any]) -> None:
+    """Aplica o diário aos arquivos e o remove.
+
+    Pode ser repetida: o histórico volta ao tamanho anterior à transação
+    antes de receber as linhas, a menos que elas já estejam lá.
+    """
+
+    historico = transacao["historico"]
+    tamanho = int(historico["tamanho"])
+    linhas = historico["linhas"].encode("utf-8")
+    with open(recurso_caminho("historico_impressoes.csv"), "a+b") as arquivo:
+        arquivo.seek(tamanho)
+        if arquivo.read(len(linhas)) != linhas:
+            arquivo.truncate(tamanho)
+            arquivo.write(linhas)
+        arquivo.flush()
+        os.fsync(arquivo.fileno())
+
+    for nome, dados in transacao["arquivos"].items():
+        caminho = recurso_caminho(nome)
+        if not os.path.isdir(os.path.dirname(caminho)):
+            # os resumos apagados são refeitos a partir do histórico
+            continue
+        temporario = caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(
+                dados, arquivo, ensure_ascii=False, indent=_RECUO_JSON.get(nome, 4)
+            )
+            arquivo.flush()
+            # o diário só pode sair depois que os arquivos chegaram ao disco
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, caminho)
+        assinatura = _assinatura(caminho)
+        if assinatura is not None:
+            _lidos[caminho] = (assinatura, dados)
+    os.remove(recurso_caminho(DIARIO))
+
+
+def _recuperar_transacao() -> None:
+    """Conclui uma transação interrompida, se houver diário pendente."""
+
+    caminho = recurso_caminho(DIARIO)
+    if not os.path.exists(caminho):
+        return
+    with open(caminho, "r", encoding="utf-8") as arquivo:
+        try:
+            transacao = json.load(arquivo)
+        except ValueError:
+            transacao = None
+    if transacao is None:
+        # o diário só recebe o nome final depois de gravado por inteiro
+        os.remove(caminho)
+        return
+    _aplicar_transacao(transacao)
+
+
+def _data_hora_valida(data_hora: str) -> bool:
+    """Confere ``dd/mm/aaaa hh:mm`` ou ``dd/mm/aaaa hh:mm:ss`` por posição.
+
+    O histórico tem os dois formatos (a interface não grava os segundos). A
+    conferência por fatias fixas é bem mais rápida que ``datetime.strptime``
+    e não cria objetos de data; o mês é o trecho ``[3:10]`` (``MM/AAAA``).
+    """
+
+    if len(data_hora) == 16:
+        segundos = ""
+    elif len(data_hora) == 19 and data_hora[16] == ":":
+        segundos = data_hora[17:19]
+    else:
+        return False
+    if data_hora[2] != "/" or data_hora[5] != "/" or data_hora[10] != " ":
+        return False
+    digitos = (
+        data_hora[0:2]
+        + data_hora[3:5]
+        + data_hora[6:10]
+        + data_hora[11:13]
+        + data_hora[14:16]
+        + segundos
+    )
+    return data_hora[13] == ":" and digitos.isascii() and digitos.isdigit()
+
+
+def _dia_registro(data_hora: str) -> str | None:
+    """Dia (``YYYY-MM-DD``) de uma data do histórico, ou ``None`` se inválida."""
+
+    if not _data_hora_valida(data_hora):
+        return None
+    return f"{data_hora[6:10]}-{data_hora[3:5]}-{data_hora[0:2]}"
+
+
+def _mes_registro(data_hora: str) -> str | None:
+    """Mês (``YYYY-MM``) de uma data do histórico, ou ``None`` se inválida."""
+
+    if not _data_hora_valida(data_hora):
+        return None
+    return f"{data_hora[6:10]}-{data_hora[3:5]}"
+
+
+def _indexar(indice: dict[str, Any], dia: str, inicio: int, fim: int) -> None:
+    mes = dia[:7]
+    faixa = indice["meses"].get(mes)
+    indice["meses"][mes] = [inicio if faixa is None else faixa[0], fim]
+    if mes < indice["mes_dias"]:
+        return
+    if mes > indice["mes_dias"]:
+        # só o mês mais recente é indexado por dia
+        indice["dias"] = {}
+        indice["mes_dias"] = mes
+    faixa = indice["dias"].get(dia)
+    indice["dias"][dia] = [inicio if faixa is None else faixa[0], fim]
+
+
+def _carregar_indice(tamanho: int) -> dict[str, Any]:
+    """Índice do histórico, completado até ``tamanho`` bytes.
+
+    O índice (``indice_historico.json``) guarda, para cada mês e para cada
+    dia do mês mais recente (``mes_dias``), a posição em bytes do início da
+    primeira linha e do fim da última linha no CSV. Hoje só
+    :func:`carregar_ultima_impressao` o usa, lendo os trechos do fim para o
+    começo; o relatório mensal usa os resumos, que já têm os totais. Como o
+    índice vai inteiro para o diário a cada impressão, os dias dos meses
+    anteriores ficam só na faixa do mês e o arquivo não cresce com o
+    histórico. As gravações feitas pelo aplicativo já atualizam
+    o índice; linhas acrescentadas por fora são indexadas aqui, lendo apenas
+    a parte final do arquivo ainda não indexada.
+    """
+
+    lido = _ler_json(INDICE_HISTORICO, None)
+    indice: dict[str, Any] = {"tamanho": 0, "dias": {}, "meses": {}, "mes_dias": ""}
+    if lido is not None and lido.get("tamanho", 0) <= tamanho:
+        # índices anteriores ao ``mes_dias`` têm os dias de todos os meses
+        mes_dias = lido.get("mes_dias") or max(lido["dias"], default="")[:7]
+        indice = {
+            "tamanho": int(lido["tamanho"]),
+            "dias": {
+                dia: faixa
+                for dia, faixa in lido["dias"].items()
+                if dia.startswith(mes_dias)
+            },
+            "meses": dict(lido["meses"]),
+            "mes_dias": mes_dias,
+        }
+    if indice["tamanho"] == tamanho:
+        return indice
+
+    with open(recurso_caminho("historico_impressoes.csv"), "rb") as arquivo:
+        if indice["tamanho"]:
+            arquivo.seek(indice["tamanho"] - 1)
+            if arquivo.read(1) != b"\n":
+                # o arquivo foi alterado antes do fim indexado
+                indice = {"tamanho": 0, "dias": {}, "meses": {}, "mes_dias": ""}
+        arquivo.seek(indice["tamanho"])
+        posicao = indice["tamanho"]
+        for linha in arquivo:
+            data_hora = linha.split(b";", 1)[0].decode("utf-8", "replace")
+            dia = _dia_registro(data_hora)
+            if dia is not None:
+                _indexar(indice, dia, posicao, posicao + len(linha))
+            posicao += len(linha)
+    indice["tamanho"] = posicao
+    return indice
+
+
+def _nome_resumo(mes: str) -> str:
+    return os.path.join(PASTA_RESUMOS, f"{mes}.json")
+
+
+def _ler_resumo(mes: str) -> dict[tuple[str, str, str], int]:
+    """Totais do mês por (categoria, município, emissor)."""
+
+    return {
+        (categoria, municipio, emissor): int(total)
+        for categoria, municipio, emissor, total in _ler_json(_nome_resumo(mes), [])
+    }
+
+
+def _lista_resumo(totais: dict[tuple[str, str, str], int]) -> list[list[Any]]:
+    return [[*chave, total] for chave, total in sorted(totais.items())]
+
+
+def _somar_resumos(registros: list[dict[str, Any]]) -> dict[str, Any]:
+    """Novo conteúdo dos resumos dos meses em que há registros."""
+
+    meses: dict[str, dict[tuple[str, str, str], int]] = {}
+    for r in registros:
+        mes = _mes_registro(r["data_hora"])
+        if mes is None:
+            continue
+        if mes not in meses:
+            meses[mes] = _ler_resumo(mes)
+        totais = meses[mes]
+        chave = (r["categoria"], r["municipio"], r["emissor"])
+        totais[chave] = totais.get(chave, 0) + int(r["volumes"])
+    return {_nome_resumo(mes): _lista_resumo(totais) for mes, totais in meses.items()}
+
+
+def reconstruir_resumos() -> int:
+    """Refaz os resumos mensais lendo todo o histórico CSV.
+
+    Os resumos (pasta ``resumos`` em ``assets``, um arquivo por mês) são
+    atualizados a cada gravação no histórico; esta função só é necessária se
+    o CSV for editado à mão. Uma pasta ausente é refeita automaticamente.
+
+    Returns:
+        int: Quantidade de meses encontrados no histórico.
+    """
+
+    # agrupa pelo trecho "MM/AAAA" da data, sem convertê-la linha a linha
+    por_mes_ano: dict[str, dict[tuple[str, str, str], int]] = {}
+    caminho = recurso_caminho("historico_impressoes.csv")
+    if os.path.exists(caminho):
+        # um CSV editado à mão pode ter bytes fora do UTF-8 e volumes
+        # inválidos; essas linhas ficam de fora, como as de data inválida
+        with open(
+            caminho, newline="", encoding="utf-8-sig", errors="replace"
+        ) as arquivo:
+            reader = csv.reader(arquivo, delimiter=";")
+            next(reader, None)
+            for row in reader:
+                if len(row) < 6 or not _data_hora_valida(row[0]):
+                    continue
+                try:
+                    volumes = int(row[5])
+                except ValueError:
+                    continue
+                totais = por_mes_ano.get(row[0][3:10])
+                if totais is None:
+                    totais = por_mes_ano[row[0][3:10]] = {}
+                chave = (row[2], row[4], row[3])
+                totais[chave] = totais.get(chave, 0) + volumes
+    meses = {f"{k[3:]}-{k[:2]}": totais for k, totais in por_mes_ano.items()}
+
+    pasta = recurso_caminho(PASTA_RESUMOS)
+    temporaria = pasta + ".tmp"
+    shutil.rmtree(temporaria, ignore_errors=True)
+    os.makedirs(temporaria)
+    for mes, totais in meses.items():
+        with open(
+            os.path.join(temporaria, f"{mes}.json"), "w", encoding="utf-8"
+        ) as arquivo:
+            json.dump(_lista_resumo(totais), arquivo, ensure_ascii=False)
+    shutil.rmtree(pasta, ignore_errors=True)
+    os.replace(temporaria, pasta)
+    # o CSV editado à mão também invalida o índice, refeito na próxima leitura
+    indice = recurso_caminho(INDICE_HISTORICO)
+    if os.path.exists(indice):
+        os.remove(indice)
+    _lidos.clear()
+    return len(meses)
+
+
+def _garantir_resumos() -> None:
+    if os.path.isdir(recurso_caminho(PASTA_RESUMOS)):
+        return
+    try:
+        reconstruir_resumos()
+    except Exception:
+        # sem a pasta a gravação segue sem resumos, refeitos na próxima vez
+        logger.exception("Erro ao reconstruir os resumos mensais")
+
+
 def carregar_historico_mensal() -> dict[str, int]:
     """Obtém os dados de impressão por mês.
 
@@ -188,6 +954,8 @@ def carregar_historico_mensal() -> dict[str, int]:
         dict[str, int]: Mapeamento de ``mes`` para ``total`` de etiquetas.
     """
 
+    if _usa_sqlite():
+        return persistence_sqlite.carregar_historico_mensal(_caminho_banco())
     caminho = recurso_caminho("contagem_mensal.json")
     if os.path.exists(caminho):
         with open(caminho, "r", encoding="utf-8") as arquivo:
@@ -200,7 +968,8 @@ def gerar_relatorio_mensal(mes: str) -> str:
 
     O relatório contém os totais de etiquetas agrupados por categoria,
     município e emissor. O arquivo é salvo na pasta ``reports`` na raiz do
-    aplicativo, com o nome ``relatorio_YYYY-MM.csv``.
+    aplicativo, com o nome ``relatorio_YYYY-MM.csv``. Os totais vêm do resumo
+    do mês (veja :func:`reconstruir_resumos`), sem ler o histórico CSV.
 
     Args:
         mes (str): Mês desejado no formato ``YYYY-MM``.
@@ -209,19 +978,20 @@ def gerar_relatorio_mensal(mes: str) -> str:
         str: Caminho absoluto do relatório gerado.
     """
 
-    hist_path = recurso_caminho("historico_impressoes.csv")
+    hist_path = (
+        _caminho_banco()
+        if _usa_sqlite()
+        else recurso_caminho("historico_impressoes.csv")
+    )
     if not os.path.exists(hist_path):
         raise FileNotFoundError("Histórico de impressões não encontrado")
 
-    totais: dict[tuple[str, str, str], int] = {}
-    with open(hist_path, newline="", encoding="utf-8-sig") as arquivo:
-        reader = csv.DictReader(arquivo, delimiter=";")
-        for row in reader:
-            data = datetime.strptime(row["Data e Hora"], "%d/%m/%Y %H:%M:%S")
-            if data.strftime("%Y-%m") != mes:
-                continue
-            chave = (row["Categoria"], row["Município"], row["Emissor"])
-            totais[chave] = totais.get(chave, 0) + int(row["Volumes"])
+    if _usa_sqlite():
+        totais = persistence_sqlite.totais_do_mes(hist_path, mes)
+    else:
+        _recuperar_transacao()
+        _garantir_resumos()
+        totais = _ler_resumo(mes)
 
     base_dir = os.path.dirname(recurso_caminho(""))
     reports_dir = os.path.join(base_dir, "reports")
@@ -0,0 +1,367 @@
+"""Armazenamento de histórico, contadores e recentes em SQLite.
+
+Alternativa aos arquivos CSV/JSON de :mod:`persistence`, ativada com
+``"armazenamento": "sqlite"`` em ``settings.json``. O banco usa journal WAL,
+de modo que leituras (relatórios, histórico) não bloqueiam as gravações, e
+cada operação é uma única transação. As funções recebem o caminho do banco
+e são chamadas por :mod:`persistence`, que mantém a mesma API para os dois
+formatos. :func:`importar_arquivos` copia os dados já existentes nos
+arquivos para o banco.
+"""
+
+import csv
+import json
+import os
+import sqlite3
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Any
+
+VERSAO_ESQUEMA = 1
+LIMITE_RECENTES = 20
+CAMPOS_RECENTES = ("categoria", "emissor", "municipio")
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS historico (
+    id INTEGER PRIMARY KEY,
+    data_hora TEXT NOT NULL,
+    data TEXT NOT NULL,
+    saida TEXT NOT NULL,
+    categoria TEXT NOT NULL,
+    emissor TEXT NOT NULL,
+    municipio TEXT NOT NULL,
+    volumes INTEGER NOT NULL,
+    lote INTEGER
+);
+CREATE INDEX IF NOT EXISTS historico_data ON historico (data);
+CREATE INDEX IF NOT EXISTS historico_saida ON historico (saida);
+CREATE INDEX IF NOT EXISTS historico_categoria ON historico (categoria);
+CREATE INDEX IF NOT EXISTS historico_municipio ON historico (municipio);
+CREATE INDEX IF NOT EXISTS historico_emissor ON historico (emissor);
+
+CREATE TABLE IF NOT EXISTS contagem (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    total_geral INTEGER NOT NULL,
+    total_mes INTEGER NOT NULL,
+    mes_atual TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS contagem_mensal (
+    mes TEXT PRIMARY KEY,
+    total INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS recentes (
+    campo TEXT NOT NULL,
+    valor TEXT NOT NULL,
+    usos INTEGER NOT NULL,
+    PRIMARY KEY (campo, valor)
+);
+"""
+
+
+def data_iso(data_hora: str) -> str:
+    """Converte ``dd/mm/aaaa hh:mm[:ss]`` para ``aaaa-mm-dd hh:mm[:ss]``.
+
+    Nesse formato a ordem alfabética é a cronológica, o que permite filtrar
+    o histórico por faixa de datas usando o índice.
+    """
+
+    if len(data_hora) < 10 or data_hora[2] != "/" or data_hora[5] != "/":
+        return data_hora
+    return f"{data_hora[6:10]}-{data_hora[3:5]}-{data_hora[0:2]}{data_hora[10:]}"
+
+
+@contextmanager
+def conectar(caminho: str) -> Iterator[sqlite3.Connection]:
+    """Abre o banco (criando-o se preciso) em uma transação.
+
+    A transação é confirmada ao final do bloco ou desfeita em caso de erro.
+    """
+
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    conexao = sqlite3.connect(caminho, timeout=10)
+    try:
+        versao = conexao.execute("PRAGMA user_version").fetchone()[0]
+        if versao < VERSAO_ESQUEMA:
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.executescript(ESQUEMA)
+            conexao.execute(f"PRAGMA user_version={VERSAO_ESQUEMA}")
+        # com NORMAL, em WAL, uma queda de energia pode desfazer os últimos
+        # commits: etiquetas impressas sairiam do histórico e dos contadores
+        conexao.execute("PRAGMA synchronous=FULL")
+        with conexao:
+            yield conexao
+    finally:
+        conexao.close()
+
+
+def _inserir_historico(
+    conexao: sqlite3.Connection, registros: list[dict[str, Any]]
+) -> None:
+    conexao.executemany(
+        "INSERT INTO historico (data_hora, data, saida, categoria, emissor, "
+        "municipio, volumes, lote) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                r["data_hora"],
+                data_iso(r["data_hora"]),
+                r["saida"],
+                r["categoria"],
+                r["emissor"],
+                r["municipio"],
+                int(r["volumes"]),
+                int(r["lote"]) if r.get("lote") else None,
+            )
+            for r in registros
+        ],
+    )
+
+
+def salvar_historico(caminho: str, registro: dict[str, Any]) -> None:
+    with conectar(caminho) as conexao:
+        _inserir_historico(conexao, [registro])
+
+
+def carregar_ultima_impressao(
+    caminho: str, saida: str | None = None
+) -> dict[str, Any] | None:
+    consulta = (
+        "SELECT saida, categoria, emissor, municipio, volumes, data_hora, "
+        "COALESCE(lote, volumes) AS lote FROM historico"
+    )
+    parametros: tuple[str, ...] = ()
+    if saida is not None:
+        consulta += " WHERE saida = ?"
+        parametros = (saida,)
+    with conectar(caminho) as conexao:
+        conexao.row_factory = sqlite3.Row
+        linha = conexao.execute(
+            consulta + " ORDER BY id DESC LIMIT 1", parametros
+        ).fetchone()
+    return dict(linha) if linha is not None else None
+
+
+def _ler_contagem(conexao: sqlite3.Connection, mes_atual: str) -> tuple[int, int]:
+    linha = conexao.execute(
+        "SELECT total_geral, total_mes, mes_atual FROM contagem WHERE id = 1"
+    ).fetchone()
+    if linha is None:
+        return 0, 0
+    total, mensal, mes = linha
+    return int(total), int(mensal) if mes == mes_atual else 0
+
+
+def _gravar_contagem(
+    conexao: sqlite3.Connection, total: int, mensal: int, mes_atual: str
+) -> None:
+    conexao.execute(
+        "INSERT OR REPLACE INTO contagem (id, total_geral, total_mes, mes_atual) "
+        "VALUES (1, ?, ?, ?)",
+        (int(total or 0), int(mensal or 0), mes_atual),
+    )
+
+
+def carregar_contagem(caminho: str, mes_atual: str) -> tuple[int, int]:
+    with conectar(caminho) as conexao:
+        return _ler_contagem(conexao, mes_atual)
+
+
+def salvar_contagem(caminho: str, total: int, mensal: int, mes_atual: str) -> None:
+    with conectar(caminho) as conexao:
+        _gravar_contagem(conexao, total, mensal, mes_atual)
+
+
+def _somar_mes(conexao: sqlite3.Connection, mes: str, quantidade: int) -> None:
+    conexao.execute(
+        "INSERT INTO contagem_mensal (mes, total) VALUES (?, ?) "
+        "ON CONFLICT (mes) DO UPDATE SET total = total + excluded.total",
+        (mes, quantidade),
+    )
+
+
+def registrar_contagem_mensal(caminho: str, mes: str, quantidade: int) -> None:
+    with conectar(caminho) as conexao:
+        _somar_mes(conexao, mes, quantidade)
+
+
+def carregar_historico_mensal(caminho: str) -> dict[str, int]:
+    with conectar(caminho) as conexao:
+        return dict(conexao.execute("SELECT mes, total FROM contagem_mensal"))
+
+
+def carregar_recentes(caminho: str) -> dict[str, dict[str, int]]:
+    dados: dict[str, dict[str, int]] = {campo: {} for campo in CAMPOS_RECENTES}
+    with conectar(caminho) as conexao:
+        for campo, valor, usos in conexao.execute(
+            "SELECT campo, valor, usos FROM recentes ORDER BY usos DESC, rowid"
+        ):
+            dados.setdefault(campo, {})[valor] = usos
+    return dados
+
+
+def _somar_recentes(
+    conexao: sqlite3.Connection, categoria: str, emissor: str, municipio: str
+) -> None:
+    for campo, valor in zip(CAMPOS_RECENTES, (categoria, emissor, municipio)):
+        valor = valor.strip()
+        if not valor:
+            continue
+        conexao.execute(
+            "INSERT INTO recentes (campo, valor, usos) VALUES (?, ?, 1) "
+            "ON CONFLICT (campo, valor) DO UPDATE SET usos = usos + 1",
+            (campo, valor),
+        )
+        # mantém apenas os mais usados, como no arquivo recentes.json
+        conexao.execute(
+            "DELETE FROM recentes WHERE campo = ? AND rowid NOT IN ("
+            "SELECT rowid FROM recentes WHERE campo = ? "
+            "ORDER BY usos DESC, rowid LIMIT ?)",
+            (campo, campo, LIMITE_RECENTES),
+        )
+
+
+def atualizar_recentes(
+    caminho: str, categoria: str, emissor: str, municipio: str
+) -> None:
+    with conectar(caminho) as conexao:
+        _somar_recentes(conexao, categoria, emissor, municipio)
+
+
+def registrar_impressoes(
+    caminho: str,
+    registros: list[dict[str, Any]],
+    mes_atual: str,
+    recentes: bool = True,
+) -> tuple[int, int]:
+    """Versão de :func:`persistence.registrar_impressoes` em uma transação."""
+
+    with conectar(caminho) as conexao:
+        total, mensal = _ler_contagem(conexao, mes_atual)
+        if not registros:
+            return total, mensal
+        quantidade = sum(int(r["volumes"]) for r in registros)
+        _inserir_historico(conexao, registros)
+        total += quantidade
+        mensal += quantidade
+        _gravar_contagem(conexao, total, mensal, mes_atual)
+        _somar_mes(conexao, mes_atual, quantidade)
+        if recentes:
+            for r in registros:
+                _somar_recentes(conexao, r["categoria"], r["emissor"], r["municipio"])
+    return total, mensal
+
+
+def totais_do_mes(caminho: str, mes: str) -> dict[tuple[str, str, str], int]:
+    """Volumes do mês ``YYYY-MM`` por (categoria, município, emissor)."""
+
+    with conectar(caminho) as conexao:
+        return {
+            (categoria, municipio, emissor): int(total)
+            for categoria, municipio, emissor, total in conexao.execute(
+                "SELECT categoria, municipio, emissor, SUM(volumes) FROM historico "
+                "WHERE data >= ? AND data < ? "
+                "GROUP BY categoria, municipio, emissor",
+                (f"{mes}-01", f"{mes}-32"),
+            )
+        }
+
+
+def exportar_csv(caminho: str, destino: str) -> None:
+    """Grava o histórico do banco em ``destino`` no formato do CSV original."""
+
+    with conectar(caminho) as conexao:
+        linhas = conexao.execute(
+            "SELECT data_hora, saida, categoria, emissor, municipio, volumes, "
+            "COALESCE(lote, '') FROM historico ORDER BY id"
+        ).fetchall()
+    with open(destino, "w", newline="", encoding="utf-8-sig") as arquivo:
+        writer = csv.writer(arquivo, delimiter=";")
+        writer.writerow(
+            [
+                "Data e Hora",
+                "Saída",
+                "Categoria",
+                "Emissor",
+                "Município",
+                "Volumes",
+                "Lote",
+            ]
+        )
+        writer.writerows(linhas)
+
+
+def importar_arquivos(
+    caminho: str,
+    historico_csv: str,
+    contagem_json: str,
+    mensal_json: str,
+    recentes_json: str,
+) -> int:
+    """Substitui o conteúdo do banco pelos dados dos arquivos CSV/JSON.
+
+    Arquivos ausentes são ignorados. Tudo é feito em uma única transação.
+
+    Returns:
+        int: Quantidade de linhas do histórico importadas.
+    """
+
+    def ler_json(arquivo: str) -> Any:
+        if not os.path.exists(arquivo):
+            return None
+        with open(arquivo, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    registros: list[dict[str, Any]] = []
+    if os.path.exists(historico_csv):
+        with open(historico_csv, newline="", encoding="utf-8-sig") as arquivo:
+            for row in csv.DictReader(arquivo, delimiter=";"):
+                # históricos antigos não têm o título da coluna
+                lote = row.get("Lote") or (row.get(None) or [None])[0]
+                try:
+                    volumes = int(row["Volumes"])
+                    lote = int(lote) if lote else None
+                except (TypeError, ValueError):
+                    # linha curta ou editada à mão: fica de fora, como nos resumos
+                    continue
+                registros.append(
+                    {
+                        "data_hora": row["Data e Hora"],
+                        "saida": row["Saída"],
+                        "categoria": row["Categoria"],
+                        "emissor": row["Emissor"],
+                        "municipio": row["Município"],
+                        "volumes": volumes,
+                        "lote": lote,
+                    }
+                )
+    contagem = ler_json(contagem_json) or {}
+    mensal = ler_json(mensal_json) or {}
+    recentes = ler_json(recentes_json) or {}
+
+    with conectar(caminho) as conexao:
+        for tabela in ("historico", "contagem", "contagem_mensal", "recentes"):
+            conexao.execute(f"DELETE FROM {tabela}")
+        _inserir_historico(conexao, registros)
+        if contagem:
+            _gravar_contagem(
+                conexao,
+                int(contagem.get("total_geral") or 0),
+                int(contagem.get("total_mes") or 0),
+                str(contagem.get("mes_atual") or ""),
+            )
+        conexao.executemany(
+            "INSERT INTO contagem_mensal (mes, total) VALUES (?, ?)",
+            [(mes, int(total)) for mes, total in mensal.items()],
+        )
+        conexao.executemany(
+            "INSERT INTO recentes (campo, valor, usos) VALUES (?, ?, ?)",
+            [
+                (campo, valor, int(usos))
+                for campo, valores in recentes.items()
+                for valor, usos in sorted(
+                    valores.items(), key=lambda x: x[1], reverse=True
+                )
+            ],
+        )
+    return len(registros)
@@ -0,0 +1,394 @@
+"""Fila de impressão executada em segundo plano.
+
+Os jobs são processados um de cada vez por uma thread dedicada, de modo que a
+interface continua respondendo enquanto um lote é impresso (inclusive durante
+as esperas entre tentativas). Os eventos são informados por callbacks
+chamados na thread da fila; a interface os repassa para a thread do Qt por
+meio de sinais.
+
+Jobs de maior prioridade (reimpressões e páginas de teste) saem da fila
+primeiro e, se houver um lote em andamento, são impressos no próximo
+intervalo entre documentos desse lote, que depois continua de onde parou.
+Jobs idênticos enviados em sequência rápida (por exemplo, um clique duplo)
+são impressos uma única vez.
+"""
+
+import hashlib
+import itertools
+import json
+import queue
+import sys
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+import printing
+from log import logger
+from persistence import salvar_checkpoint
+from printer_pool import imprimir_em_pool
+from printing import ERRO_CANCELADA, ErroImpressora
+from transport import obter_transporte
+
+Resultado = tuple[bool, ErroImpressora | None]
+
+# Menor valor = maior prioridade
+PRIORIDADE_URGENTE = 0
+PRIORIDADE_NORMAL = 10
+
+# Janela (s) em que jobs idênticos são considerados duplicados
+JANELA_COALESCENCIA = 2.0
+
+_ids = itertools.count(1)
+
+
+@dataclass(eq=False)
+class JobImpressao:
+    """Dados de um job enviado à fila.
+
+    ``tipo`` é ``etiqueta`` (usa :func:`printing.imprimir_etiqueta`),
+    ``manifesto`` (imprime as saídas de ``itens`` com
+    :func:`printing.imprimir_manifesto`) ou ``teste`` (usa
+    :func:`printing.imprimir_pagina_teste`). ``acao`` é livre
+    para quem enfileira identificar o que fazer ao concluir. Com
+    ``checkpoint`` ativo, o andamento é gravado a cada documento concluído
+    (veja :func:`persistence.salvar_checkpoint`). Com duas ou mais
+    impressoras em ``pool`` o lote é dividido entre elas
+    (veja :mod:`printer_pool`). Jobs com ``prioridade`` menor passam à
+    frente dos demais (veja :class:`FilaImpressao`).
+    """
+
+    saida: str = ""
+    categoria: str = ""
+    emissor: str = ""
+    municipio: str = ""
+    volumes: int = 1
+    data_hora: str = ""
+    inicio_indice: int = 1
+    total_exibicao: int | None = None
+    opcoes: dict[str, Any] = field(default_factory=dict)
+    tipo: str = "etiqueta"
+    acao: str = ""
+    id: int = field(default_factory=lambda: next(_ids))
+    cancelamento: threading.Event = field(default_factory=threading.Event)
+    resultado: Resultado | None = None
+    checkpoint: bool = False
+    pool: list[str] = field(default_factory=list)
+    itens: list[dict[str, Any]] = field(default_factory=list)
+    prioridade: int = PRIORIDADE_NORMAL
+    # definido pela fila: imprime os jobs urgentes entre dois documentos
+    entre_documentos: Callable[[], None] | None = field(default=None, repr=False)
+
+    @property
+    def chave_idempotencia(self) -> str:
+        """Identifica jobs com o mesmo conteúdo (ignora id, data e opções)."""
+
+        campos = [
+            self.tipo,
+            self.acao,
+            self.saida,
+            self.categoria,
+            self.emissor,
+            self.municipio,
+            self.volumes,
+            self.inicio_indice,
+            self.total_exibicao,
+            self.itens,
+        ]
+        texto = json.dumps(campos, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha1(texto.encode()).hexdigest()
+
+    def cancelar(self) -> None:
+        """Solicita o cancelamento do job (antes ou durante o envio)."""
+
+        self.cancelamento.set()
+
+    @property
+    def cancelado(self) -> bool:
+        return self.cancelamento.is_set()
+
+
+def _gravar_checkpoint(
+    job: JobImpressao,
+) -> Callable[[list[tuple[int, int]]], None]:
+    def gravar(impressas: list[tuple[int, int]]) -> None:
+        salvar_checkpoint(
+            {
+                "job": job.id,
+                "saida": job.saida,
+                "categoria": job.categoria,
+                "emissor": job.emissor,
+                "municipio": job.municipio,
+                "volumes": job.volumes,
+                "data_hora": job.data_hora,
+                "inicio_indice": job.inicio_indice,
+                "total_exibicao": job.total_exibicao,
+                "acao": job.acao,
+                "enviadas": sum(fim - ini + 1 for ini, fim in impressas),
+                # no pool as faixas enviadas podem não ser contíguas
+                "impressas": impressas,
+            }
+        )
+
+    return gravar
+
+
+def executar_job(job: JobImpressao, progresso: Callable[[int, int], None]) -> Resultado:
+    """Executa o job chamando a função de impressão correspondente."""
+
+    if job.tipo == "teste":
+        return printing.imprimir_pagina_teste(
+            cancelamento=job.cancelamento, **job.opcoes
+        )
+    gravar = _gravar_checkpoint(job) if job.checkpoint else None
+    if gravar is not None:
+        gravar([])
+
+    def ao_concluir_documento(enviadas: int) -> None:
+        if gravar is not None:
+            gravar([(job.inicio_indice, job.inicio_indice + enviadas - 1)])
+        # o documento foi fechado: a impressora está livre para jobs urgentes
+        if job.entre_documentos is not None and enviadas < job.volumes:
+            job.entre_documentos()
+
+    if job.tipo == "manifesto":
+        return printing.imprimir_manifesto(
+            job.itens,
+            job.data_hora,
+            cancelamento=job.cancelamento,
+            progresso=progresso,
+            ao_concluir_documento=ao_concluir_documento,
+            **job.opcoes,
+        )
+    argumentos = (
+        job.saida,
+        job.categoria,
+        job.emissor,
+        job.municipio,
+        job.volumes,
+        job.data_hora,
+    )
+    opcoes = {
+        "inicio_indice": job.inicio_indice,
+        "total_exibicao": job.total_exibicao,
+        "cancelamento": job.cancelamento,
+        "progresso": progresso,
+        **job.opcoes,
+    }
+    if len(job.pool) > 1:
+        # as impressoras do pool fecham documentos em threads próprias; só
+        # uma delas por vez imprime os jobs urgentes, as outras seguem o lote
+        atendendo = threading.Lock()
+
+        def ao_concluir_faixas(impressas: list[tuple[int, int]]) -> None:
+            if gravar is not None:
+                gravar(impressas)
+            enviadas = sum(fim - ini + 1 for ini, fim in impressas)
+            if job.entre_documentos is None or enviadas >= job.volumes:
+                return
+            if atendendo.acquire(blocking=False):
+                try:
+                    job.entre_documentos()
+                finally:
+                    atendendo.release()
+
+        transportes = [obter_transporte(destino) for destino in job.pool]
+        return imprimir_em_pool(
+            *argumentos,
+            transportes=transportes,
+            ao_concluir_documento=ao_concluir_faixas,
+            **opcoes,
+        )
+    return printing.imprimir_etiqueta(
+        *argumentos, ao_concluir_documento=ao_concluir_documento, **opcoes
+    )
+
+
+class FilaImpressao:
+    """Processa jobs de impressão em uma thread de segundo plano.
+
+    Args:
+        ao_iniciar: Chamado com o job quando seu envio começa.
+        ao_progresso: Chamado com ``(job, enviadas, total)`` a cada escrita.
+        ao_concluir: Chamado com o job quando a impressão termina com sucesso.
+        ao_falhar: Chamado com ``(job, erro)`` em falha ou cancelamento.
+        executor: Função que efetivamente imprime; padrão :func:`executar_job`.
+        janela_coalescencia: Segundos em que um job idêntico a outro já
+            enviado (mesma :attr:`JobImpressao.chave_idempotencia`) é
+            descartado; ``0`` desativa.
+
+    Os jobs saem da fila por ``prioridade`` e, na mesma prioridade, por
+    ordem de envio. Enquanto um job é impresso, os de prioridade maior são
+    executados a cada documento concluído (``JobImpressao.entre_documentos``).
+    """
+
+    def __init__(
+        self,
+        ao_iniciar: Callable[[JobImpressao], None] | None = None,
+        ao_progresso: Callable[[JobImpressao, int, int], None] | None = None,
+        ao_concluir: Callable[[JobImpressao], None] | None = None,
+        ao_falhar: Callable[[JobImpressao, ErroImpressora], None] | None = None,
+        executor: Callable[
+            [JobImpressao, Callable[[int, int], None]], Resultado
+        ] = executar_job,
+        janela_coalescencia: float = JANELA_COALESCENCIA,
+    ) -> None:
+        self._ao_iniciar = ao_iniciar
+        self._ao_progresso = ao_progresso
+        self._ao_concluir = ao_concluir
+        self._ao_falhar = ao_falhar
+        self._executor = executor
+        self.janela_coalescencia = janela_coalescencia
+        self._fila: queue.PriorityQueue[tuple[int, int, JobImpressao | None]] = (
+            queue.PriorityQueue()
+        )
+        self._sequencia = itertools.count()
+        self._recentes: dict[str, tuple[float, JobImpressao]] = {}
+        self._pendentes: list[JobImpressao] = []
+        self._lock = threading.Lock()
+        self._vazia = threading.Event()
+        self._vazia.set()
+        self._thread: threading.Thread | None = None
+
+    def iniciar(self) -> None:
+        """Inicia a thread de processamento, se ainda não estiver ativa."""
+
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._executar, name="fila-impressao", daemon=True
+            )
+            self._thread.start()
+
+    def enviar(self, job: JobImpressao) -> JobImpressao:
+        """Enfileira um job e o retorna (para acompanhar ou cancelar).
+
+        Se um job idêntico foi enviado há menos de ``janela_coalescencia``
+        segundos (e não foi cancelado nem falhou), ``job`` é descartado e o
+        job anterior é retornado.
+        """
+
+        chave = job.chave_idempotencia
+        agora = time.monotonic()
+        with self._lock:
+            self._recentes = {
+                k: v
+                for k, v in self._recentes.items()
+                if agora - v[0] < self.janela_coalescencia
+            }
+            anterior = self._recentes.get(chave)
+            if anterior is not None:
+                existente = anterior[1]
+                if not existente.cancelado and (
+                    existente.resultado is None or existente.resultado[0]
+                ):
+                    logger.info(
+                        "Job duplicado descartado; mantido o job %s", existente.id
+                    )
+                    return existente
+            if self.janela_coalescencia > 0:
+                self._recentes[chave] = (agora, job)
+            self._pendentes.append(job)
+            self._vazia.clear()
+        self._fila.put((job.prioridade, next(self._sequencia), job))
+        self.iniciar()
+        return job
+
+    def pendentes(self) -> list[JobImpressao]:
+        """Jobs aguardando ou em execução, na ordem de envio."""
+
+        with self._lock:
+            return list(self._pendentes)
+
+    def ocupada(self) -> bool:
+        """Indica se há algum job aguardando ou em execução."""
+
+        with self._lock:
+            return bool(self._pendentes)
+
+    def cancelar_todos(self) -> None:
+        """Cancela o job atual e todos os que aguardam na fila."""
+
+        for job in self.pendentes():
+            job.cancelar()
+
+    def parar(self, timeout: float | None = None) -> None:
+        """Encerra a thread após os jobs já enfileirados."""
+
+        if self._thread is None:
+            return
+        self._fila.put((sys.maxsize, next(self._sequencia), None))
+        self._thread.join(timeout)
+
+    def aguardar(self, timeout: float | None = None) -> bool:
+        """Bloqueia até a fila esvaziar; retorna ``False`` se expirar."""
+
+        return self._vazia.wait(timeout)
+
+    def _executar(self) -> None:
+        while True:
+            _, _, job = self._fila.get()
+            try:
+                if job is None:
+                    return
+                self._processar(job)
+            finally:
+                self._fila.task_done()
+
+    def _atender_urgentes(self, atual: JobImpressao) -> None:
+        """Executa os jobs da fila com prioridade maior que a de ``atual``."""
+
+        while True:
+            try:
+                item = self._fila.get_nowait()
+            except queue.Empty:
+                return
+            prioridade, _, job = item
+            if job is None or prioridade >= atual.prioridade:
+                # devolve o item sem alterar sua posição
+                self._fila.put(item)
+                self._fila.task_done()
+                return
+            logger.info("Job %s passa à frente do job %s", job.id, atual.id)
+            try:
+                self._processar(job)
+            finally:
+                self._fila.task_done()
+
+    def _processar(self, job: JobImpressao) -> None:
+        try:
+            if job.cancelado:
+                job.resultado = (False, ERRO_CANCELADA)
+            else:
+                if self._ao_iniciar is not None:
+                    self._ao_iniciar(job)
+                job.entre_documentos = lambda: self._atender_urgentes(job)
+                job.resultado = self._executor(job, self._progresso_de(job))
+        except Exception as exc:  # nunca derruba a thread da fila
+            logger.exception("Erro inesperado no job %s", job.id)
+            job.resultado = (False, {"code": -1, "message": str(exc)})
+        finally:
+            job.entre_documentos = None
+
+        ok, erro = job.resultado
+        try:
+            if ok:
+                if self._ao_concluir is not None:
+                    self._ao_concluir(job)
+            elif self._ao_falhar is not None:
+                self._ao_falhar(job, erro or {"code": -1, "message": "Falha"})
+        except Exception:
+            logger.exception("Erro ao notificar o resultado do job %s", job.id)
+        finally:
+            with self._lock:
+                if job in self._pendentes:
+                    self._pendentes.remove(job)
+                if not self._pendentes:
+                    self._vazia.set()
+
+    def _progresso_de(self, job: JobImpressao) -> Callable[[int, int], None]:
+        def progresso(enviadas: int, total: int) -> None:
+            if self._ao_progresso is not None:
+                self._ao_progresso(job, enviadas, total)
+
+        return progresso
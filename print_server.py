@@ -0,0 +1,408 @@
+"""Servidor local de impressão compartilhado por várias estações.
+
+Com ``python cli.py serve`` uma única instância do aplicativo atende as
+estações da rede por uma API HTTP/JSON simples:
+
+- ``POST /jobs`` envia uma saída (``saida``, ``categoria``, ``emissor``,
+  ``municipio``, ``volumes``) ou várias (``{"itens": [...]}``) e responde
+  ``202`` com o job; ``503`` se a fila estiver cheia.
+- ``GET /jobs`` lista os jobs recentes e ``GET /jobs/<id>`` informa o estado
+  de um deles: ``queued``, ``printing``, ``done`` ou ``failed``.
+- ``DELETE /jobs/<id>`` cancela o job, antes ou durante o envio.
+
+Os jobs aguardam em uma fila ``asyncio`` limitada e são impressos um de cada
+vez por uma única tarefa (o "escritor"), que também registra histórico e
+contadores; dentro do servidor as gravações nunca se sobrepõem. O andamento
+do job em impressão fica em um checkpoint próprio
+(``persistence.CHECKPOINT_SERVIDOR``), registrado na próxima inicialização se
+o servidor cair antes de gravar o histórico.
+
+O servidor não coordena as gravações com outros processos: a interface ou a
+CLI usadas na mesma pasta do aplicativo gravam histórico e contadores por
+conta própria. Para um único escritor, as estações devem enviar seus jobs
+para o servidor em vez de imprimir pela interface local.
+"""
+
+import asyncio
+import itertools
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any
+
+import printing
+from log import logger
+from manifest import ErroManifesto, ItemManifesto, registrar_enviadas, validar_item
+from persistence import (
+    CHECKPOINT_SERVIDOR,
+    carregar_checkpoint,
+    limpar_checkpoint,
+    salvar_checkpoint,
+)
+from printing import ERRO_CANCELADA, ErroImpressora
+
+STATUS_NA_FILA = "queued"
+STATUS_IMPRIMINDO = "printing"
+STATUS_CONCLUIDO = "done"
+STATUS_FALHOU = "failed"
+
+PORTA_PADRAO = 8765
+TAMANHO_FILA_PADRAO = 100
+# Jobs finalizados mantidos para consulta
+JOBS_RETIDOS = 500
+# Tamanho máximo aceito para o corpo de uma requisição
+CORPO_MAXIMO = 1_000_000
+# Cabeçalhos aceitos por requisição
+CABECALHOS_MAXIMOS = 100
+# Segundos para o cliente enviar a requisição completa
+TEMPO_LEITURA = 10.0
+
+MOTIVOS_HTTP = {
+    200: "OK",
+    202: "Accepted",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    408: "Request Timeout",
+    413: "Payload Too Large",
+    431: "Request Header Fields Too Large",
+    503: "Service Unavailable",
+}
+
+_ids = itertools.count(1)
+
+
+@dataclass(eq=False)
+class JobServidor:
+    """Job recebido pelo servidor."""
+
+    itens: list[ItemManifesto]
+    data_hora: str
+    id: int = field(default_factory=lambda: next(_ids))
+    status: str = STATUS_NA_FILA
+    enviadas: int = 0
+    erro: ErroImpressora | None = None
+    # falha ao gravar histórico/contadores; não altera o resultado da impressão
+    erro_registro: str | None = None
+    cancelamento: threading.Event = field(default_factory=threading.Event)
+
+    @property
+    def volumes(self) -> int:
+        return sum(item["volumes"] for item in self.itens)
+
+    @property
+    def finalizado(self) -> bool:
+        return self.status in (STATUS_CONCLUIDO, STATUS_FALHOU)
+
+    def resumo(self) -> dict[str, Any]:
+        """Estado do job como devolvido pela API."""
+
+        return {
+            "id": self.id,
+            "status": self.status,
+            "saidas": [item["saida"] for item in self.itens],
+            "volumes": self.volumes,
+            "enviadas": self.enviadas,
+            "data_hora": self.data_hora,
+            "erro": self.erro,
+            "erro_registro": self.erro_registro,
+        }
+
+
+class FilaCheia(Exception):
+    """A fila do servidor atingiu o tamanho máximo."""
+
+
+class ServidorImpressao:
+    """Recebe jobs pela rede e os imprime por um único escritor.
+
+    Args:
+        opcoes: Opções repassadas a :func:`printing.imprimir_etiqueta`
+            (``modo`` é ignorado nos jobs com várias saídas).
+        host: Endereço de escuta; o padrão aceita só conexões locais.
+        porta: Porta TCP (0 escolhe uma livre).
+        tamanho_fila: Jobs aguardando impressão antes de recusar novos.
+    """
+
+    def __init__(
+        self,
+        opcoes: dict[str, Any] | None = None,
+        host: str = "127.0.0.1",
+        porta: int = PORTA_PADRAO,
+        tamanho_fila: int = TAMANHO_FILA_PADRAO,
+    ) -> None:
+        self.opcoes = dict(opcoes or {})
+        self.host = host
+        self.porta = porta
+        self.tamanho_fila = tamanho_fila
+        self.jobs: OrderedDict[int, JobServidor] = OrderedDict()
+        self._fila: asyncio.Queue[JobServidor] | None = None
+        self._servidor: asyncio.Server | None = None
+        self._escritor: asyncio.Task[None] | None = None
+
+    async def iniciar(self) -> None:
+        """Registra um job interrompido, abre a porta e inicia o escritor."""
+
+        await asyncio.to_thread(self._recuperar_interrompido)
+        self._fila = asyncio.Queue(maxsize=self.tamanho_fila)
+        self._escritor = asyncio.create_task(self._escrever())
+        self._servidor = await asyncio.start_server(
+            self._atender, self.host, self.porta
+        )
+        self.porta = self._servidor.sockets[0].getsockname()[1]
+        logger.info("Servidor de impressão em %s:%s", self.host, self.porta)
+
+    async def parar(self) -> None:
+        """Fecha a porta e encerra o escritor (o job atual é cancelado)."""
+
+        if self._servidor is not None:
+            self._servidor.close()
+            await self._servidor.wait_closed()
+        for job in self.jobs.values():
+            if not job.finalizado:
+                job.cancelamento.set()
+        if self._escritor is not None:
+            self._escritor.cancel()
+            try:
+                await self._escritor
+            except asyncio.CancelledError:
+                pass
+
+    async def executar(self) -> None:
+        """Inicia o servidor e atende até ser interrompido."""
+
+        await self.iniciar()
+        assert self._servidor is not None
+        try:
+            await self._servidor.serve_forever()
+        finally:
+            await self.parar()
+
+    def enviar(self, itens: list[ItemManifesto]) -> JobServidor:
+        """Enfileira um job.
+
+        Raises:
+            FilaCheia: Se a fila estiver no limite.
+        """
+
+        assert self._fila is not None
+        job = JobServidor(itens, datetime.now().strftime("%d/%m/%Y %H:%M"))
+        try:
+            self._fila.put_nowait(job)
+        except asyncio.QueueFull:
+            raise FilaCheia("Fila de impressão cheia") from None
+        self.jobs[job.id] = job
+        self._descartar_antigos()
+        return job
+
+    def _descartar_antigos(self) -> None:
+        finalizados = [j.id for j in self.jobs.values() if j.finalizado]
+        for id_job in finalizados[: max(0, len(finalizados) - JOBS_RETIDOS)]:
+            del self.jobs[id_job]
+
+    def _recuperar_interrompido(self) -> None:
+        """Registra as etiquetas enviadas por um job que não chegou ao fim."""
+
+        checkpoint = carregar_checkpoint(CHECKPOINT_SERVIDOR)
+        if not checkpoint:
+            return
+        enviadas = int(checkpoint.get("enviadas") or 0)
+        try:
+            registrar_enviadas(
+                checkpoint["itens"],
+                enviadas,
+                checkpoint["data_hora"],
+                lotes=[int(item["volumes"]) for item in checkpoint["itens"]],
+            )
+        except Exception:
+            logger.exception("Erro ao registrar job interrompido do servidor")
+            return
+        limpar_checkpoint(nome=CHECKPOINT_SERVIDOR)
+        logger.warning(
+            "Job %s do servidor interrompido recuperado: %s etiquetas enviadas",
+            checkpoint.get("job"),
+            enviadas,
+        )
+
+    # -------------------- escritor --------------------
+
+    async def _escrever(self) -> None:
+        assert self._fila is not None
+        while True:
+            job = await self._fila.get()
+            try:
+                await self._processar(job)
+            except Exception as exc:  # nunca derruba o escritor
+                logger.exception("Erro inesperado no job %s", job.id)
+                job.status = STATUS_FALHOU
+                job.erro = {"code": -1, "message": str(exc)}
+            finally:
+                self._fila.task_done()
+
+    async def _processar(self, job: JobServidor) -> None:
+        if job.cancelamento.is_set():
+            job.status, job.erro = STATUS_FALHOU, ERRO_CANCELADA
+            return
+        job.status = STATUS_IMPRIMINDO
+        # um job anterior cujo registro falhou é registrado antes de o
+        # checkpoint passar para este
+        await asyncio.to_thread(self._recuperar_interrompido)
+        await asyncio.to_thread(self._gravar_checkpoint, job, 0)
+        ok, erro = await asyncio.to_thread(self._imprimir, job)
+        if ok:
+            job.enviadas = job.volumes
+        else:
+            impressas = (erro or {}).get("impressas", [])
+            job.enviadas = sum(fim - ini + 1 for ini, fim in impressas)
+        job.status = STATUS_CONCLUIDO if ok else STATUS_FALHOU
+        job.erro = erro
+        # a persistência é gravada só por este escritor, um job por vez
+        try:
+            await asyncio.to_thread(
+                registrar_enviadas,
+                job.itens,
+                job.enviadas,
+                job.data_hora,
+                [item["volumes"] for item in job.itens],
+            )
+        except Exception as exc:
+            # as etiquetas já saíram: o checkpoint fica para a próxima partida
+            logger.exception("Erro ao registrar o job %s do servidor", job.id)
+            job.erro_registro = str(exc)
+        else:
+            await asyncio.to_thread(limpar_checkpoint, job.id, CHECKPOINT_SERVIDOR)
+        logger.info("Job %s do servidor: %s", job.id, job.status)
+
+    def _gravar_checkpoint(self, job: JobServidor, enviadas: int) -> None:
+        salvar_checkpoint(
+            {
+                "job": job.id,
+                "itens": job.itens,
+                "volumes": job.volumes,
+                "data_hora": job.data_hora,
+                "enviadas": enviadas,
+            },
+            CHECKPOINT_SERVIDOR,
+        )
+
+    def _imprimir(self, job: JobServidor) -> tuple[bool, ErroImpressora | None]:
+        def progresso(enviadas: int, _total: int) -> None:
+            job.enviadas = enviadas
+
+        opcoes = {
+            **self.opcoes,
+            "cancelamento": job.cancelamento,
+            "progresso": progresso,
+            "ao_concluir_documento": lambda enviadas: self._gravar_checkpoint(
+                job, enviadas
+            ),
+        }
+        if len(job.itens) > 1:
+            opcoes.pop("modo", None)
+            return printing.imprimir_manifesto(job.itens, job.data_hora, **opcoes)
+        item = job.itens[0]
+        return printing.imprimir_etiqueta(
+            item["saida"],
+            item["categoria"],
+            item["emissor"],
+            item["municipio"],
+            item["volumes"],
+            job.data_hora,
+            **opcoes,
+        )
+
+    # -------------------- HTTP --------------------
+
+    async def _atender(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            # só a leitura aguarda o cliente; um cliente lento ou parado não
+            # pode prender a conexão indefinidamente
+            status, resposta = await asyncio.wait_for(
+                self._requisicao(reader), TEMPO_LEITURA
+            )
+        except TimeoutError:
+            status, resposta = 408, {"erro": "Tempo de leitura esgotado"}
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            status, resposta = 400, {"erro": "Requisição inválida"}
+        corpo = json.dumps(resposta, ensure_ascii=False).encode()
+        cabecalho = (
+            f"HTTP/1.1 {status} {MOTIVOS_HTTP[status]}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(corpo)}\r\n"
+            "Connection: close\r\n\r\n"
+        )
+        try:
+            writer.write(cabecalho.encode() + corpo)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _requisicao(
+        self, reader: asyncio.StreamReader
+    ) -> tuple[int, dict[str, Any]]:
+        linha = (await reader.readline()).decode("latin-1").split()
+        if len(linha) < 2:
+            return 400, {"erro": "Requisição inválida"}
+        metodo, caminho = linha[0].upper(), linha[1].rstrip("/")
+        tamanho = 0
+        for _ in range(CABECALHOS_MAXIMOS + 1):
+            cabecalho = (await reader.readline()).decode("latin-1").strip()
+            if not cabecalho:
+                break
+            nome, _, valor = cabecalho.partition(":")
+            if nome.strip().lower() == "content-length":
+                tamanho = int(valor)
+        else:
+            return 431, {"erro": "Cabeçalhos demais"}
+        if tamanho > CORPO_MAXIMO:
+            return 413, {"erro": "Requisição muito grande"}
+        corpo = await reader.readexactly(tamanho) if tamanho else b""
+
+        if caminho == "/jobs":
+            if metodo == "GET":
+                return 200, {"jobs": [j.resumo() for j in self.jobs.values()]}
+            if metodo == "POST":
+                return self._receber(corpo)
+            return 405, {"erro": "Método não permitido"}
+
+        prefixo, _, id_texto = caminho.rpartition("/")
+        if prefixo != "/jobs" or not id_texto.isdigit():
+            return 404, {"erro": "Recurso não encontrado"}
+        job = self.jobs.get(int(id_texto))
+        if job is None:
+            return 404, {"erro": "Job não encontrado"}
+        if metodo == "GET":
+            return 200, job.resumo()
+        if metodo == "DELETE":
+            job.cancelamento.set()
+            return 200, job.resumo()
+        return 405, {"erro": "Método não permitido"}
+
+    def _receber(self, corpo: bytes) -> tuple[int, dict[str, Any]]:
+        try:
+            dados = json.loads(corpo or b"null")
+            if not isinstance(dados, dict):
+                raise ErroManifesto("Envie um objeto JSON")
+            varias = "itens" in dados
+            brutos = dados["itens"] if varias else [dados]
+            if not isinstance(brutos, list) or not brutos:
+                raise ErroManifesto("itens deve ser uma lista não vazia")
+            if not all(isinstance(d, dict) for d in brutos):
+                raise ErroManifesto("Cada item deve ser um objeto JSON")
+            itens = [
+                validar_item(d, i if varias else 0)
+                for i, d in enumerate(brutos, start=1)
+            ]
+        except ValueError as e:
+            return 400, {"erro": str(e)}
+        try:
+            job = self.enviar(itens)
+        except FilaCheia as e:
+            return 503, {"erro": str(e)}
+        return 202, job.resumo()
@@ -0,0 +1,259 @@
+"""Divisão de lotes grandes entre várias impressoras.
+
+As impressoras do pool são definidas em ``settings.json`` pela chave
+``pool_impressoras`` (lista de destinos aceitos por
+:func:`transport.criar_transporte`). Um lote com pelo menos
+``pool_lote_minimo`` etiquetas é dividido em faixas consecutivas, uma por
+impressora livre, mantendo a numeração ``X DE Y`` do lote inteiro. Cada
+impressora é atendida por sua própria thread e começa pela sua faixa; se
+uma delas falhar, a parte ainda não enviada da faixa volta para as demais.
+Por isso as etiquetas enviadas formam faixas não contíguas.
+"""
+
+import threading
+from collections import deque
+from collections.abc import Callable
+from typing import Any
+
+import printing
+from log import logger
+from printing import ErroImpressora
+from transport import Transporte
+
+_ocupadas: set[str] = set()
+_ocupadas_lock = threading.Lock()
+
+
+def impressoras_livres(transportes: list[Transporte]) -> list[Transporte]:
+    """Filtra as impressoras que não estão imprimindo outro lote do pool.
+
+    Se todas estiverem ocupadas, retorna a lista completa.
+    """
+
+    with _ocupadas_lock:
+        livres = [t for t in transportes if t.nome not in _ocupadas]
+    return livres or list(transportes)
+
+
+def dividir_lote(inicio: int, volumes: int, partes: int) -> list[tuple[int, int]]:
+    """Divide ``volumes`` etiquetas em até ``partes`` faixas consecutivas.
+
+    Returns:
+        list[tuple[int, int]]: Pares ``(inicio_indice, quantidade)``.
+    """
+
+    partes = max(1, min(partes, volumes))
+    base, resto = divmod(volumes, partes)
+    faixas = []
+    for i in range(partes):
+        quantidade = base + (1 if i < resto else 0)
+        faixas.append((inicio, quantidade))
+        inicio += quantidade
+    return faixas
+
+
+def _juntar_faixas(faixas: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    """Ordena as faixas ``(primeira, ultima)`` unindo as contíguas."""
+
+    unidas: list[tuple[int, int]] = []
+    for ini, fim in sorted(faixas):
+        if unidas and ini <= unidas[-1][1] + 1:
+            unidas[-1] = (unidas[-1][0], max(fim, unidas[-1][1]))
+        else:
+            unidas.append((ini, fim))
+    return unidas
+
+
+def faixas_faltantes(
+    inicio: int, volumes: int, impressas: list[tuple[int, int]]
+) -> list[tuple[int, int]]:
+    """Retorna as faixas ``(primeira, ultima)`` do lote que não foram enviadas.
+
+    Args:
+        inicio: Posição da primeira etiqueta do lote.
+        volumes: Quantidade de etiquetas do lote.
+        impressas: Faixas já enviadas, em qualquer ordem.
+    """
+
+    faltantes = []
+    proxima = inicio
+    for ini, fim in _juntar_faixas(impressas):
+        if ini > proxima:
+            faltantes.append((proxima, ini - 1))
+        proxima = max(proxima, fim + 1)
+    if proxima < inicio + volumes:
+        faltantes.append((proxima, inicio + volumes - 1))
+    return faltantes
+
+
+def imprimir_em_pool(
+    saida: str,
+    categoria: str,
+    emissor: str,
+    municipio: str,
+    volumes: int,
+    data_hora: str,
+    transportes: list[Transporte],
+    inicio_indice: int = 1,
+    total_exibicao: int | None = None,
+    cancelamento: threading.Event | None = None,
+    progresso: Callable[[int, int], None] | None = None,
+    ao_concluir_documento: Callable[[list[tuple[int, int]]], None] | None = None,
+    **opcoes: Any,
+) -> tuple[bool, ErroImpressora | None]:
+    """Imprime o lote dividindo-o entre as impressoras livres de ``transportes``.
+
+    Os parâmetros seguem :func:`printing.imprimir_etiqueta`; ``progresso``
+    recebe o total de etiquetas enviadas por todas as impressoras e
+    ``ao_concluir_documento``, as faixas ``(primeira, ultima)`` já enviadas.
+    Em caso de falha, ``erro["impressas"]`` lista essas faixas, que podem não
+    ser contíguas.
+    """
+
+    if total_exibicao is None:
+        total_exibicao = volumes
+    livres = impressoras_livres(transportes)
+    faixas = dividir_lote(inicio_indice, volumes, len(livres))
+    # apenas os restos de faixas que falharam são disputados pelas impressoras
+    pendentes: deque[tuple[int, int]] = deque()
+    condicao = threading.Condition()
+    impressas: list[tuple[int, int]] = []
+    enviadas_por_faixa: dict[int, int] = {}
+    estado: dict[str, Any] = {
+        "em_andamento": len(faixas),
+        "erro": None,
+        "cancelado": False,
+    }
+
+    def faixas_enviadas() -> list[tuple[int, int]]:
+        em_curso = [(ini, ini + n - 1) for ini, n in enviadas_por_faixa.items() if n]
+        return _juntar_faixas(impressas + em_curso)
+
+    def total_enviado() -> int:
+        concluidas = sum(fim - ini + 1 for ini, fim in impressas)
+        return concluidas + sum(enviadas_por_faixa.values())
+
+    def proxima_faixa() -> tuple[int, int] | None:
+        with condicao:
+            while not pendentes and estado["em_andamento"]:
+                condicao.wait()
+            if not pendentes:
+                return None
+            estado["em_andamento"] += 1
+            return pendentes.popleft()
+
+    def trabalhar(transporte: Transporte, faixa: tuple[int, int] | None) -> None:
+        if faixa is None:
+            faixa = proxima_faixa()
+        while faixa is not None:
+            inicio, quantidade = faixa
+            with condicao:
+                enviadas_por_faixa[inicio] = 0
+
+            def progresso_faixa(
+                enviadas: int, _total: int, faixa: int = inicio
+            ) -> None:
+                with condicao:
+                    enviadas_por_faixa[faixa] = enviadas
+                    enviado = total_enviado()
+                if progresso is not None:
+                    progresso(enviado, volumes)
+
+            def documento_faixa(_enviadas: int) -> None:
+                if ao_concluir_documento is not None:
+                    with condicao:
+                        enviadas = faixas_enviadas()
+                    ao_concluir_documento(enviadas)
+
+            logger.info(
+                "Pool: %s imprime %s a %s",
+                transporte.nome,
+                inicio,
+                inicio + quantidade - 1,
+            )
+            try:
+                ok, erro = printing.imprimir_etiqueta(
+                    saida,
+                    categoria,
+                    emissor,
+                    municipio,
+                    quantidade,
+                    data_hora,
+                    inicio_indice=inicio,
+                    total_exibicao=total_exibicao,
+                    transporte=transporte,
+                    cancelamento=cancelamento,
+                    progresso=progresso_faixa,
+                    ao_concluir_documento=documento_faixa,
+                    **opcoes,
+                )
+            except Exception as exc:  # a faixa volta para o pool
+                logger.exception("Pool: erro inesperado em %s", transporte.nome)
+                with condicao:
+                    n = enviadas_por_faixa.get(inicio, 0)
+                ok = False
+                erro = {
+                    "code": -1,
+                    "message": str(exc),
+                    "impressas": [(inicio, inicio + n - 1)] if n else [],
+                }
+
+            with condicao:
+                estado["em_andamento"] -= 1
+                del enviadas_por_faixa[inicio]
+                if ok:
+                    impressas.append((inicio, inicio + quantidade - 1))
+                else:
+                    assert erro is not None
+                    enviadas_faixa = erro.get("impressas", [])
+                    impressas.extend(enviadas_faixa)
+                    enviadas = sum(fim - ini + 1 for ini, fim in enviadas_faixa)
+                    estado["erro"] = erro
+                    if cancelamento is not None and cancelamento.is_set():
+                        estado["cancelado"] = True
+                    elif enviadas < quantidade:
+                        # devolve o restante da faixa para as outras impressoras
+                        pendentes.append((inicio + enviadas, quantidade - enviadas))
+                        logger.warning(
+                            "Pool: %s falhou (%s); %s etiquetas redistribuídas",
+                            transporte.nome,
+                            erro["message"],
+                            quantidade - enviadas,
+                        )
+                condicao.notify_all()
+            if not ok:
+                return
+            faixa = proxima_faixa()
+
+    def executar(transporte: Transporte, faixa: tuple[int, int] | None) -> None:
+        with _ocupadas_lock:
+            _ocupadas.add(transporte.nome)
+        try:
+            trabalhar(transporte, faixa)
+        finally:
+            with _ocupadas_lock:
+                _ocupadas.discard(transporte.nome)
+            with condicao:
+                condicao.notify_all()
+
+    iniciais: list[tuple[int, int] | None] = [*faixas]
+    iniciais += [None] * (len(livres) - len(faixas))
+    threads = [
+        threading.Thread(
+            target=executar, args=(t, faixa), name=f"pool-{t.nome}", daemon=True
+        )
+        for t, faixa in zip(livres, iniciais)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # uma impressora com falha não impede o sucesso se as demais cobriram a faixa
+    if not pendentes and not estado["cancelado"]:
+        return True, None
+    erro_final: ErroImpressora = {
+        **(estado["erro"] or {"code": -1, "message": "Falha no pool"}),
+        "impressas": _juntar_faixas(impressas),
+    }
+    return False, erro_final
@@ -0,0 +1,127 @@
+"""Consulta do estado da impressora pelo comando TSPL ``<ESC>!?``.
+
+A impressora responde imediatamente com um byte cujos bits indicam cabeça ou
+tampa abertas, falta de papel ou ribbon, pausa e impressão em andamento. Só
+transportes com leitura (``TransporteBidirecional``) podem ser
+consultados; nos demais o estado é desconhecido e a impressão segue como
+antes. As leituras ficam em cache por alguns instantes para que o envio não
+consulte a impressora a cada etiqueta.
+"""
+
+import threading
+import time
+
+from log import logger
+from transport import Transporte, TransporteBidirecional
+
+COMANDO_STATUS = b"\x1b!?"
+
+STATUS_CABECA_ABERTA = 0x01
+STATUS_PAPEL_ATOLADO = 0x02
+STATUS_SEM_PAPEL = 0x04
+STATUS_SEM_RIBBON = 0x08
+STATUS_PAUSADA = 0x10
+STATUS_IMPRIMINDO = 0x20
+STATUS_TAMPA_ABERTA = 0x40
+STATUS_TEMPERATURA = 0x80
+
+MENSAGENS_STATUS: dict[int, str] = {
+    STATUS_CABECA_ABERTA: "cabeça de impressão aberta",
+    STATUS_PAPEL_ATOLADO: "papel atolado",
+    STATUS_SEM_PAPEL: "sem papel",
+    STATUS_SEM_RIBBON: "sem ribbon",
+    STATUS_TAMPA_ABERTA: "tampa aberta",
+    STATUS_TEMPERATURA: "temperatura fora da faixa",
+}
+
+# Estados que impedem a impressão e os que apenas pedem espera; imprimindo
+# não entra: a impressora recebe o próximo job enquanto imprime
+STATUS_ERRO = sum(MENSAGENS_STATUS)
+STATUS_ESPERA = STATUS_PAUSADA
+
+# Validade (s) de uma leitura do estado
+STATUS_TTL = 1.0
+
+
+class ImpressoraIndisponivel(Exception):
+    """A impressora informou um estado que impede a impressão."""
+
+    def __init__(self, status: int) -> None:
+        self.status = status
+        super().__init__(f"Impressora indisponível: {descrever_status(status)}")
+
+
+def descrever_status(status: int) -> str:
+    """Descreve os bits de erro presentes em ``status``."""
+
+    problemas = [msg for bit, msg in MENSAGENS_STATUS.items() if status & bit]
+    if problemas:
+        return ", ".join(problemas)
+    if status & STATUS_PAUSADA:
+        return "pausada"
+    if status & STATUS_IMPRIMINDO:
+        return "imprimindo"
+    return "pronta"
+
+
+class CacheStatus:
+    """Guarda a última leitura do estado de cada transporte.
+
+    Leituras que falham também ficam em cache pelo ``ttl``. Um transporte
+    que não responde ao comando (tempo esgotado ou resposta vazia) é marcado
+    como sem suporte e não é mais consultado até :meth:`esquecer`.
+
+    Args:
+        ttl: Tempo em segundos em que uma leitura é reaproveitada.
+    """
+
+    def __init__(self, ttl: float = STATUS_TTL) -> None:
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._leituras: dict[str, tuple[float, int | None]] = {}
+        self._sem_suporte: set[str] = set()
+
+    def consultar(self, transporte: Transporte, forcar: bool = False) -> int | None:
+        """Retorna o byte de estado ou ``None`` se não for possível lê-lo."""
+
+        if not isinstance(transporte, TransporteBidirecional):
+            return None
+        agora = time.monotonic()
+        with self._lock:
+            if transporte.nome in self._sem_suporte:
+                return None
+            leitura = self._leituras.get(transporte.nome)
+        if leitura is not None and not forcar and agora - leitura[0] < self.ttl:
+            return leitura[1]
+        status: int | None = None
+        try:
+            resposta = transporte.consultar(COMANDO_STATUS, 1)
+        except TimeoutError:
+            resposta = b""
+        except Exception as exc:
+            logger.warning("Falha ao consultar %s: %s", transporte.nome, exc)
+            resposta = None
+        with self._lock:
+            if resposta:
+                status = resposta[0]
+            elif resposta is not None:
+                logger.info(
+                    "%s não informa o estado; consultas desativadas", transporte.nome
+                )
+                self._sem_suporte.add(transporte.nome)
+            self._leituras[transporte.nome] = (agora, status)
+        return status
+
+    def esquecer(self, nome: str | None = None) -> None:
+        """Descarta as leituras de ``nome`` (ou de todos os transportes)."""
+
+        with self._lock:
+            if nome is None:
+                self._leituras.clear()
+                self._sem_suporte.clear()
+            else:
+                self._leituras.pop(nome, None)
+                self._sem_suporte.discard(nome)
+
+
+cache_status = CacheStatus()
@@ -1,14 +1,39 @@
 """Rotinas relacionadas à impressão das etiquetas."""
 
-from typing import TypedDict
+from collections.abc import Callable, Iterator, Mapping, Sequence
+from typing import Any, NotRequired, TypedDict, cast
 
+import hashlib
 import json
+import threading
 import time
-import win32print
+from dataclasses import dataclass
+from types import MappingProxyType
+
+try:
+    import win32print
+except ImportError:  # pragma: no cover - fora do Windows
+    win32print = None
 
-from utils import melhorar_logo, recurso_caminho
 from log import logger
 from persistence import carregar_config, salvar_config
+from printer_status import (
+    STATUS_ERRO,
+    STATUS_ESPERA,
+    ImpressoraIndisponivel,
+    cache_status,
+    descrever_status,
+)
+from resilience import (
+    CODIGO_CIRCUITO_ABERTO,
+    POLITICA_PADRAO,
+    SEM_RETENTATIVA,
+    Disjuntor,
+    PoliticaRetentativa,
+    disjuntor_de,
+)
+from transport import Transporte, TransporteWin32, obter_transporte
+from utils import bitmap_para_bmp, logo_em_cache, melhorar_logo, recurso_caminho
 
 DOTS_MM: int = 8  # ~203 dpi
 
@@ -87,62 +112,632 @@ LAYOUTS: dict[str, Layout] = {
     },
 }
 
-LARGURA_ETIQUETA_MM: int = 60
-ALTURA_ETIQUETA_MM: int = 80
-GAP_MM: int = 2
-LAYOUT_ATUAL: Layout = LAYOUTS["Padrão"]
 
+@dataclass(frozen=True)
+class ModeloTSPL:
+    """Etiqueta TSPL pré-compilada em bytes fixos e posições variáveis.
 
-def listar_templates() -> list[str]:
-    """Retorna a lista de nomes de templates disponíveis."""
+    ``corpo`` contém todos os comandos fixos; ``slots`` lista, em ordem, o
+    nome de cada campo variável e o deslocamento em ``corpo`` onde seu valor
+    deve ser inserido.
+    """
 
-    return list(TEMPLATES.keys())
+    corpo: bytes
+    slots: tuple[tuple[str, int], ...]
 
+    def preencher(self, valores: dict[str, bytes]) -> bytes:
+        """Insere os ``valores`` de todos os slots."""
 
-def aplicar_template(nome: str) -> None:
-    """Define qual template será utilizado nas impressões."""
+        partes = []
+        inicio = 0
+        for nome, pos in self.slots:
+            partes += (self.corpo[inicio:pos], valores[nome])
+            inicio = pos
+        partes.append(self.corpo[inicio:])
+        return b"".join(partes)
+
+    def dividir(self, slot: str, valores: dict[str, bytes]) -> tuple[bytes, bytes]:
+        """Preenche os demais slots e separa o corpo em volta de ``slot``.
+
+        Uma etiqueta é então ``antes + valor + depois``: apenas o valor de
+        ``slot`` precisa ser gerado para cada etiqueta.
+        """
+
+        corte = dict(self.slots)[slot]
+        antes = ModeloTSPL(
+            self.corpo[:corte], tuple((n, p) for n, p in self.slots if p < corte)
+        )
+        depois = ModeloTSPL(
+            self.corpo[corte:],
+            tuple((n, p - corte) for n, p in self.slots if p >= corte and n != slot),
+        )
+        return antes.preencher(valores), depois.preencher(valores)
+
+
+# Campos de texto variáveis de cada etiqueta, na ordem em que são impressos
+CAMPOS_VARIAVEIS: tuple[str, ...] = (
+    "saida",
+    "categoria",
+    "emissor",
+    "municipio",
+    "data",
+)
+
+
+def compilar_modelo(cabecalho: bytes, layout: Layout) -> ModeloTSPL:
+    """Compila o layout em um :class:`ModeloTSPL`.
+
+    Os textos dos ``CAMPOS_VARIAVEIS`` viram slots dentro das aspas dos seus
+    comandos ``TEXT``; ``numeracao`` é um slot para o comando completo, que
+    pode ser um ``TEXT`` ou os comandos do modo contador.
+    """
+
+    corpo = bytearray(cabecalho)
+    slots: list[tuple[str, int]] = []
+    corpo += _texto_layout("titulo", "CONIMS", layout).encode()
+    for chave in CAMPOS_VARIAVEIS:
+        abre, fecha = _texto_layout(chave, "\0", layout).encode().split(b"\0")
+        corpo += abre
+        slots.append((chave, len(corpo)))
+        corpo += fecha
+    corpo += _texto_layout("fracao", "[ ] Fracao", layout).encode()
+    corpo += _texto_layout("fragil", "[ ] Fragil", layout).encode()
+    slots.append(("numeracao", len(corpo)))
+    return ModeloTSPL(bytes(corpo), tuple(slots))
+
+
+@dataclass(frozen=True)
+class LabelTemplate:
+    """Template de etiqueta compilado e imutável.
+
+    Reúne as dimensões, o layout (somente leitura), o cabeçalho TSPL
+    (``SIZE``/``GAP``/``CLS``) e o :class:`ModeloTSPL` da etiqueta já em
+    bytes. Cada impressão recebe o seu template, de modo que jobs simultâneos
+    podem usar templates diferentes sem afetar uns aos outros.
+    Use :func:`obter_template` para obter a instância compartilhada.
+    """
+
+    nome: str
+    largura_mm: int
+    altura_mm: int
+    gap_mm: int
+    layout: Layout
+    cabecalho: bytes
+    modelo: ModeloTSPL
+    abre_numeracao: bytes  # comando ``TEXT`` da numeração até a aspa inicial
+
+    @property
+    def dots_x(self) -> int:
+        return self.largura_mm * DOTS_MM
+
+    @property
+    def dots_y(self) -> int:
+        return self.altura_mm * DOTS_MM
+
+    def posicao_logo(self, largura_bytes: int) -> tuple[int, int]:
+        """Posição ``(x, y)`` da logo, centralizada na largura da etiqueta."""
+
+        return (self.dots_x - largura_bytes * 8) // 2, self.layout["logo_y"]
+
+    def texto(self, chave: str, texto: str) -> str:
+        """Gera o comando ``TEXT`` do campo ``chave`` deste layout."""
+
+        return _texto_layout(chave, texto, self.layout)
+
+
+def _somente_leitura(layout: Layout) -> Layout:
+    """Protege o layout (e as posições de cada campo) contra alterações."""
+
+    campos = {
+        chave: MappingProxyType(dict(valor)) if isinstance(valor, dict) else valor
+        for chave, valor in layout.items()
+    }
+    return cast(Layout, MappingProxyType(campos))
+
+
+def compilar_template(nome: str) -> LabelTemplate:
+    """Compila o template ``nome`` (ou o primeiro, se não existir)."""
 
     modelo = TEMPLATES.get(nome)
     if not modelo:
         nome = list(TEMPLATES.keys())[0]
         modelo = TEMPLATES[nome]
-    global LARGURA_ETIQUETA_MM, ALTURA_ETIQUETA_MM, GAP_MM, LAYOUT_ATUAL
-    LARGURA_ETIQUETA_MM = int(modelo.get("largura_mm", 60))
-    ALTURA_ETIQUETA_MM = int(modelo.get("altura_mm", 80))
-    GAP_MM = int(modelo.get("gap_mm", 2))
-    LAYOUT_ATUAL = LAYOUTS.get(nome, LAYOUTS[list(LAYOUTS.keys())[0]])
+    largura = int(modelo.get("largura_mm", 60))
+    altura = int(modelo.get("altura_mm", 80))
+    gap = int(modelo.get("gap_mm", 2))
+    layout = _somente_leitura(LAYOUTS.get(nome, LAYOUTS[list(LAYOUTS.keys())[0]]))
+    cabecalho = f"SIZE {largura} mm,{altura} mm\nGAP {gap} mm,0 mm\nCLS\n".encode()
+    abre_numeracao = _texto_layout("numeracao", "\0", layout).encode()
+    return LabelTemplate(
+        nome=nome,
+        largura_mm=largura,
+        altura_mm=altura,
+        gap_mm=gap,
+        layout=layout,
+        cabecalho=cabecalho,
+        modelo=compilar_modelo(cabecalho, layout),
+        abre_numeracao=abre_numeracao.split(b"\0")[0],
+    )
+
+
+_templates_compilados: dict[str, LabelTemplate] = {}
+_templates_lock = threading.Lock()
+_nome_template_padrao = "Padrão"
+
+
+def obter_template(nome: str | None = None) -> LabelTemplate:
+    """Retorna o template compilado ``nome``, compilando-o uma única vez.
+
+    Sem ``nome`` retorna o template definido por :func:`aplicar_template`.
+    """
+
+    if nome is None:
+        nome = _nome_template_padrao
+    with _templates_lock:
+        template = _templates_compilados.get(nome)
+        if template is None:
+            template = compilar_template(nome)
+            _templates_compilados[nome] = template
+        return template
+
+
+def listar_templates() -> list[str]:
+    """Retorna a lista de nomes de templates disponíveis."""
+
+    return list(TEMPLATES.keys())
+
+
+def aplicar_template(nome: str) -> None:
+    """Define o template usado pelas impressões que não informam um."""
 
+    global _nome_template_padrao
+    _nome_template_padrao = obter_template(nome).nome
 
-# aplica template padrão ao importar módulo
-aplicar_template("Padrão")
+
+def _resolver_template(template: "LabelTemplate | str | None") -> LabelTemplate:
+    if isinstance(template, LabelTemplate):
+        return template
+    return obter_template(template)
 
 
 class ErroImpressora(TypedDict):
     code: int
     message: str
+    # faixas ``(primeira, última)`` da numeração que chegaram à impressora
+    impressas: NotRequired[list[tuple[int, int]]]
 
 
-def descobrir_impressora_padrao() -> str | None:
-    """Retorna o nome da impressora configurada ou a padrão do sistema."""
+ERRO_CANCELADA: ErroImpressora = {"code": 0, "message": "Impressão cancelada"}
+
+
+class ImpressaoCancelada(Exception):
+    """Sinaliza que o job foi cancelado pelo usuário durante o envio."""
+
+
+def _com_impressas(
+    erro: ErroImpressora, inicio: int, confirmadas: int
+) -> ErroImpressora:
+    """Acrescenta ao erro a faixa de etiquetas já enviadas antes da falha."""
+
+    impressas = [(inicio, inicio + confirmadas - 1)] if confirmadas else []
+    return {**erro, "impressas": impressas}
+
+
+def _verificar_cancelamento(cancelamento: threading.Event | None) -> None:
+    if cancelamento is not None and cancelamento.is_set():
+        raise ImpressaoCancelada
+
+
+def _aguardar(segundos: float, cancelamento: threading.Event | None) -> bool:
+    """Espera entre tentativas; retorna ``False`` se o job for cancelado."""
+
+    if cancelamento is None:
+        time.sleep(segundos)
+        return True
+    return not cancelamento.wait(segundos)
+
+
+# Espera máxima (s) enquanto a impressora está pausada ou ocupada, e o
+# intervalo entre consultas nesse período
+STATUS_ESPERA_MAX = 30.0
+STATUS_INTERVALO = 0.2
+
+
+def _aguardar_impressora(
+    transporte: Transporte,
+    cancelamento: threading.Event | None,
+    esperar: bool = True,
+) -> None:
+    """Consulta o estado da impressora antes de enviar dados.
 
+    Falta de papel ou ribbon, cabeça ou tampa abertas interrompem o envio
+    com :class:`ImpressoraIndisponivel`. Com ``esperar``, uma impressora
+    pausada é aguardada por até ``STATUS_ESPERA_MAX`` segundos; uma que
+    ainda imprime recebe o job na hora. Sem suporte a leitura no transporte,
+    nada é verificado.
+    """
+
+    status = cache_status.consultar(transporte)
+    limite = time.monotonic() + STATUS_ESPERA_MAX
+    while status is not None:
+        if status & STATUS_ERRO:
+            raise ImpressoraIndisponivel(status)
+        if not esperar or not status & STATUS_ESPERA:
+            return
+        if time.monotonic() >= limite:
+            logger.warning(
+                "%s continua %s; enviando assim mesmo",
+                transporte.nome,
+                descrever_status(status),
+            )
+            return
+        if not _aguardar(STATUS_INTERVALO, cancelamento):
+            raise ImpressaoCancelada()
+        status = cache_status.consultar(transporte, forcar=True)
+
+
+def _erro_circuito_aberto(disjuntor: Disjuntor) -> ErroImpressora:
+    segundos = disjuntor.segundos_para_sondagem()
+    return {
+        "code": CODIGO_CIRCUITO_ABERTO,
+        "message": (
+            f"Impressora {disjuntor.transporte.nome} offline: envio suspenso "
+            f"após falhas seguidas (nova verificação em {segundos:.0f} s)"
+        ),
+    }
+
+
+def _sondar_impressora(api: Any = None) -> str | None:
+    """Confirma a impressora configurada ou recorre à padrão do sistema.
+
+    Abre e fecha um handle (pela ``api`` informada ou por ``win32print``)
+    para testar a impressora salva em ``settings.json``; o arquivo só é
+    regravado quando o nome muda.
+    """
+
+    api = api or win32print
     try:
         config = carregar_config()
         nome = config.get("ultima_impressora")
         if nome:
             try:
-                handle = win32print.OpenPrinter(nome)
-                win32print.ClosePrinter(handle)
+                handle = api.OpenPrinter(nome)
+                api.ClosePrinter(handle)
                 return str(nome)
             except Exception:
                 pass
-        nome = win32print.GetDefaultPrinter()
-        config["ultima_impressora"] = nome
-        salvar_config(config)
+        nome = api.GetDefaultPrinter()
+        if config.get("ultima_impressora") != nome:
+            config["ultima_impressora"] = nome
+            salvar_config(config)
         return nome
     except Exception:  # pragma: no cover - ambientes sem win32
         return None
 
 
+# Tempo (s) em que a impressora resolvida é usada sem nova verificação
+RESOLUCAO_TTL = 300.0
+
+
+class ResolvedorImpressora:
+    """Mantém em memória a impressora e o transporte configurados.
+
+    A primeira chamada a :meth:`transporte` lê ``settings.json`` e sonda a
+    impressora; as seguintes devolvem o mesmo transporte (e, no spooler do
+    Windows, o mesmo handle aberto) sem acessar o disco. Expirado o ``ttl``,
+    o valor atual continua sendo usado enquanto uma thread o atualiza. Uma
+    falha de impressão ou a alteração das configurações descartam o cache
+    (veja :meth:`invalidar`).
+
+    Args:
+        ttl: Segundos em que a impressora resolvida é usada sem nova sondagem.
+        api: Módulo do spooler; padrão ``win32print``.
+    """
+
+    def __init__(self, ttl: float = RESOLUCAO_TTL, api: Any = None) -> None:
+        self.ttl = ttl
+        self.api = api if api is not None else win32print
+        self._lock = threading.Lock()
+        self._nome: str | None = None
+        self._transporte: Transporte | None = None
+        self._validade = 0.0
+        self._atualizando = False
+        self._geracao = 0
+
+    def transporte(self) -> Transporte | None:
+        """Retorna o transporte configurado, resolvendo-o se necessário."""
+
+        with self._lock:
+            transporte = self._transporte
+            if transporte is not None and time.monotonic() < self._validade:
+                return transporte
+            if transporte is not None and not self._atualizando:
+                self._atualizando = True
+                threading.Thread(
+                    target=self._atualizar, name="resolver-impressora", daemon=True
+                ).start()
+        if transporte is not None:
+            return transporte
+        return self._atualizar()
+
+    def impressora(self) -> str | None:
+        """Nome da impressora (ou destino) em uso."""
+
+        self.transporte()
+        return self._nome
+
+    def invalidar(self) -> None:
+        """Descarta a impressora resolvida; a próxima chamada a resolve de novo.
+
+        O handle do spooler descartado só é fechado quando o job que o usa,
+        se houver, terminar.
+        """
+
+        with self._lock:
+            transporte = self._transporte
+            self._nome = None
+            self._transporte = None
+            self._validade = 0.0
+            self._geracao += 1
+        if isinstance(transporte, TransporteWin32):
+            transporte.liberar()
+
+    def _atualizar(self) -> Transporte | None:
+        geracao = self._geracao
+        try:
+            destino = str(carregar_config().get("transporte") or "")
+            if destino and destino != "win32":
+                nome: str | None = destino
+                transporte: Transporte | None = obter_transporte(destino)
+            else:
+                nome = _sondar_impressora(self.api)
+                transporte = None
+                if nome is not None:
+                    with self._lock:
+                        atual = self._transporte
+                    # mantém o handle aberto quando a impressora não mudou
+                    if isinstance(atual, TransporteWin32) and atual.nome == nome:
+                        transporte = atual
+                    else:
+                        transporte = TransporteWin32(nome, self.api)
+            with self._lock:
+                if geracao != self._geracao:  # invalidado durante a sondagem
+                    return transporte
+                self._nome = nome
+                self._transporte = transporte
+                self._validade = time.monotonic() + self.ttl
+            return transporte
+        except Exception:
+            logger.exception("Erro ao resolver a impressora")
+            return None
+        finally:
+            with self._lock:
+                self._atualizando = False
+
+
+_resolvedor = ResolvedorImpressora()
+
+
+def descobrir_impressora_padrao() -> str | None:
+    """Retorna o nome da impressora configurada ou a padrão do sistema."""
+
+    return _resolvedor.impressora()
+
+
+def transporte_configurado() -> Transporte | None:
+    """Retorna o transporte definido em ``settings.json``.
+
+    Sem a chave ``transporte`` (ou com ``win32``) usa o spooler do Windows na
+    impressora padrão; retorna ``None`` se nenhuma impressora for encontrada.
+    O resultado fica em cache (veja :class:`ResolvedorImpressora`).
+    """
+
+    return _resolvedor.transporte()
+
+
+def invalidar_impressora() -> None:
+    """Força a nova resolução da impressora no próximo job."""
+
+    _resolvedor.invalidar()
+
+
+# Tamanho máximo de cada chamada a ``WritePrinter`` ao enviar um job. O
+# progresso (e a retomada após uma falha) é contado por escrita; o que uma
+# falha reenvia é limitado pelos documentos (``etiquetas_por_documento``)
+TAMANHO_ESCRITA_PADRAO = 256 * 1024
+
+
+class MontadorJob:
+    """Monta um job TSPL em um único buffer e o entrega em blocos grandes.
+
+    Os segmentos são guardados por referência (o bitmap da logo não é copiado
+    a cada etiqueta) e copiados uma única vez para um ``bytearray``
+    pré-alocado no momento do envio. O fim de cada etiqueta é registrado para
+    que os blocos sejam cortados entre etiquetas e o progresso possa ser
+    informado em etiquetas.
+    """
+
+    def __init__(self) -> None:
+        self._segmentos: list[bytes] = []
+        self._tamanho = 0
+        self._marcas: list[tuple[int, int]] = []  # (fim em bytes, etiquetas)
+        self.etiquetas = 0
+
+    def __len__(self) -> int:
+        return self._tamanho
+
+    def adicionar(self, *segmentos: bytes) -> None:
+        """Acrescenta segmentos ao final do job."""
+
+        for segmento in segmentos:
+            if segmento:
+                self._segmentos.append(segmento)
+                self._tamanho += len(segmento)
+
+    def adicionar_etiqueta(self, *segmentos: bytes, quantidade: int = 1) -> None:
+        """Acrescenta os segmentos de ``quantidade`` etiquetas e marca seu fim."""
+
+        self.adicionar(*segmentos)
+        self.etiquetas += quantidade
+        self._marcas.append((self._tamanho, self.etiquetas))
+
+    def estender(self, outro: "MontadorJob") -> None:
+        """Acrescenta todos os segmentos (e etiquetas) de outro job."""
+
+        self._segmentos.extend(outro._segmentos)
+        self._marcas.extend(
+            (self._tamanho + fim, self.etiquetas + qtd) for fim, qtd in outro._marcas
+        )
+        self._tamanho += outro._tamanho
+        self.etiquetas += outro.etiquetas
+
+    def montar(self) -> bytearray:
+        """Copia os segmentos para um buffer contíguo pré-alocado."""
+
+        buffer = bytearray(self._tamanho)
+        visao = memoryview(buffer)
+        pos = 0
+        for segmento in self._segmentos:
+            fim = pos + len(segmento)
+            visao[pos:fim] = segmento
+            pos = fim
+        return buffer
+
+    def blocos(
+        self, tamanho_bloco: int = TAMANHO_ESCRITA_PADRAO
+    ) -> Iterator[tuple[memoryview, int]]:
+        """Divide o job em fatias de até ``tamanho_bloco`` bytes.
+
+        As fatias terminam no fim de uma etiqueta sempre que possível; só uma
+        etiqueta maior que ``tamanho_bloco`` é partida. Cada item traz a
+        fatia e quantas etiquetas estarão completas após enviá-la.
+        """
+
+        visao = memoryview(self.montar())
+        limite = max(1, tamanho_bloco)
+        inicio = 0
+        corte, concluidas = 0, 0  # último fim de etiqueta ainda não enviado
+        for fim, etiquetas in [*self._marcas, (len(visao), self.etiquetas)]:
+            if fim - inicio > limite and corte > inicio:
+                yield visao[inicio:corte], concluidas
+                inicio = corte
+            while fim - inicio > limite:
+                yield visao[inicio : inicio + limite], concluidas
+                inicio += limite
+            corte, concluidas = fim, etiquetas
+        if corte > inicio:
+            yield visao[inicio:corte], concluidas
+
+
+# Arquivos já gravados na memória de cada impressora nesta sessão
+_RESIDENTES: dict[str, set[str]] = {}
+_residentes_lock = threading.Lock()
+
+
+def arquivos_residentes(impressora: str) -> set[str]:
+    """Retorna os arquivos que já foram enviados à memória da impressora."""
+
+    with _residentes_lock:
+        return set(_RESIDENTES.get(impressora, ()))
+
+
+def _marcar_residente(impressora: str, arquivo: str) -> None:
+    with _residentes_lock:
+        _RESIDENTES.setdefault(impressora, set()).add(arquivo)
+
+
+def esquecer_residentes(impressora: str | None = None) -> None:
+    """Descarta o registro de arquivos residentes.
+
+    Deve ser chamado quando a impressora pode ter perdido a memória
+    (falha de comunicação, reinício); o próximo job reenviará os arquivos.
+    """
+
+    with _residentes_lock:
+        if impressora is None:
+            _RESIDENTES.clear()
+        else:
+            _RESIDENTES.pop(impressora, None)
+
+
+def _nome_logo_residente(bitmap: bytes, largura_bytes: int, altura_px: int) -> str:
+    """Gera nome 8.3 estável para a logo a partir do seu conteúdo."""
+
+    digest = hashlib.sha1(f"{largura_bytes}x{altura_px}:".encode() + bitmap).hexdigest()
+    return f"L{digest[:7].upper()}.BMP"
+
+
+def _comando_download(arquivo: str, conteudo: bytes) -> bytes:
+    """Monta o comando ``DOWNLOAD`` que grava ``conteudo`` na impressora."""
+
+    return f'DOWNLOAD "{arquivo}",{len(conteudo)},'.encode() + conteudo + b"\n"
+
+
+MODOS_IMPRESSAO: tuple[str, ...] = ("padrao", "formulario", "contador")
+
+# Variáveis TSPL preenchidas a cada lote/etiqueta no modo ``formulario``
+VARIAVEIS_FORMULARIO: dict[str, str] = {
+    "saida": "SAI$",
+    "categoria": "CAT$",
+    "emissor": "EMI$",
+    "municipio": "MUN$",
+    "data": "DAT$",
+    "numeracao": "NUM$",
+}
+
+
+def _numeracao_contador(inicio: int, total: int, layout: Layout) -> str:
+    """Gera a numeração ``X DE Y`` usando o contador ``@1`` da impressora.
+
+    O contador começa em ``inicio`` e é incrementado a cada etiqueta da série
+    enviada com ``PRINT m,1``.
+    """
+
+    p = layout["numeracao"]
+    return (
+        "SET COUNTER @1 1\n"
+        f'@1="{inicio}"\n'
+        f'TEXT {p["x"]},{p["y"]},"{p["font"]}",0,{p["xm"]},{p["ym"]},'
+        f'@1+" DE {total}"\n'
+    )
+
+
+def compilar_formulario(
+    template: LabelTemplate, comando_logo: str
+) -> tuple[str, bytes]:
+    """Compila o template em um programa TSPL para gravar na impressora.
+
+    Os textos fixos e a logo residente ficam no programa; os campos variáveis
+    são lidos das variáveis em ``VARIAVEIS_FORMULARIO``. O nome do arquivo é
+    derivado do hash do próprio programa, logo qualquer mudança de layout,
+    template ou logo gera uma nova versão.
+
+    Args:
+        template (LabelTemplate): Template das etiquetas.
+        comando_logo (str): Comando ``PUTBMP`` da logo residente.
+
+    Returns:
+        tuple[str, bytes]: Nome do arquivo ``.BAS`` e comando ``DOWNLOAD``.
+    """
+
+    layout = template.layout
+    corpo = template.cabecalho.decode()
+    corpo += _texto_layout("titulo", "CONIMS", layout)
+    for chave, variavel in VARIAVEIS_FORMULARIO.items():
+        p = layout[chave]  # type: ignore[literal-required]
+        corpo += (
+            f'TEXT {p["x"]},{p["y"]},"{p["font"]}",0,{p["xm"]},{p["ym"]},{variavel}\n'
+        )
+    corpo += _texto_layout("fracao", "[ ] Fracao", layout)
+    corpo += _texto_layout("fragil", "[ ] Fragil", layout)
+    corpo += comando_logo
+    corpo += "PRINT 1\n"
+
+    digest = hashlib.sha1(corpo.encode()).hexdigest()
+    arquivo = f"F{digest[:7].upper()}.BAS"
+    return arquivo, f'DOWNLOAD "{arquivo}"\n{corpo}EOP\n'.encode()
+
+
 def _texto_layout(chave: str, texto: str, layout: Layout) -> str:
     """Gera comando ``TEXT`` baseado nas coordenadas do layout informado."""
 
@@ -153,6 +748,155 @@ def _texto_layout(chave: str, texto: str, layout: Layout) -> str:
     )
 
 
+def _carregar_logo(layout: Layout) -> tuple[bytes, int, int]:
+    """Obtém o bitmap da logo na largura do layout, usando o cache."""
+
+    logo_path = recurso_caminho("logo.png")
+    largura = layout.get("logo_largura", 240)
+    return logo_em_cache(
+        logo_path,
+        largura,
+        lambda: melhorar_logo(logo_path, largura_desejada=largura),
+    )
+
+
+def _enviar_documento(
+    transporte: Transporte,
+    arquivos: list[tuple[str, Callable[[], bytes]]],
+    cabecalho: bytes,
+    etiquetas: MontadorJob,
+    tamanho_escrita: int,
+    cancelamento: threading.Event | None,
+) -> Iterator[int]:
+    """Envia um documento com as etiquetas informadas.
+
+    Antes das etiquetas grava os ``arquivos`` que ainda não estão na memória
+    da impressora e o ``cabecalho`` do lote. Produz, após cada escrita, a
+    quantidade de etiquetas do documento já aceitas pelo transporte.
+    """
+
+    _aguardar_impressora(transporte, cancelamento)
+    transporte.iniciar_job("Etiqueta CONIMS")
+
+    job = MontadorJob()
+    residentes = arquivos_residentes(transporte.nome)
+    for arquivo, gerar_download in arquivos:
+        if arquivo not in residentes:
+            job.adicionar(gerar_download())
+            logger.info("%s gravado na impressora %s", arquivo, transporte.nome)
+    job.adicionar(cabecalho)
+    job.estender(etiquetas)
+
+    # -------- envia o job em poucas escritas grandes ----------
+    for bloco, enviadas in job.blocos(tamanho_escrita):
+        _verificar_cancelamento(cancelamento)
+        _aguardar_impressora(transporte, cancelamento, esperar=False)
+        transporte.escrever(bloco)
+        yield enviadas
+
+    transporte.finalizar_job()
+    for arquivo, _ in arquivos:
+        _marcar_residente(transporte.nome, arquivo)
+
+
+def _transmitir_lote(
+    transporte: Transporte,
+    arquivos: list[tuple[str, Callable[[], bytes]]],
+    cabecalho: bytes,
+    montar_etiquetas: Callable[[int, int], MontadorJob],
+    volumes: int,
+    inicio_indice: int,
+    tamanho_escrita: int,
+    cancelamento: threading.Event | None,
+    progresso: Callable[[int, int], None] | None,
+    etiquetas_por_documento: int,
+    ao_concluir_documento: Callable[[int], None] | None,
+    politica: PoliticaRetentativa,
+) -> tuple[bool, ErroImpressora | None]:
+    """Envia ``volumes`` etiquetas com novas tentativas e disjuntor.
+
+    ``montar_etiquetas(desde, ate)`` monta as etiquetas dos deslocamentos
+    ``desde`` até ``ate - 1`` do lote; ``inicio_indice`` é a posição da
+    primeira delas, usada em ``erro["impressas"]``. Os demais parâmetros
+    seguem :func:`imprimir_etiqueta`.
+    """
+
+    nome_imp = transporte.nome
+    por_documento = etiquetas_por_documento if etiquetas_por_documento > 0 else volumes
+
+    disjuntor = disjuntor_de(transporte)
+    if not disjuntor.permitir():
+        return False, _com_impressas(_erro_circuito_aberto(disjuntor), inicio_indice, 0)
+
+    # etiquetas já aceitas pelo transporte; novas tentativas retomam daqui
+    confirmadas = 0
+    for tentativa in range(1, politica.tentativas + 1):
+        logger.info("Tentativa %s de impressão", tentativa)
+        try:
+            if confirmadas:
+                logger.info(
+                    "Retomando a partir da etiqueta %s", inicio_indice + confirmadas
+                )
+            while True:
+                fim_documento = min(volumes, confirmadas + por_documento)
+                etiquetas = montar_etiquetas(confirmadas, fim_documento)
+                ja_confirmadas = confirmadas
+                for enviadas in _enviar_documento(
+                    transporte,
+                    arquivos,
+                    cabecalho,
+                    etiquetas,
+                    tamanho_escrita,
+                    cancelamento,
+                ):
+                    confirmadas = ja_confirmadas + enviadas
+                    if progresso is not None:
+                        progresso(confirmadas, volumes)
+                if ao_concluir_documento is not None:
+                    ao_concluir_documento(confirmadas)
+                if confirmadas >= volumes:
+                    break
+
+            disjuntor.registrar_sucesso()
+            logger.info("Impressão concluída na tentativa %s", tentativa)
+            return True, None
+        except ImpressaoCancelada:
+            transporte.abortar_job()
+            esquecer_residentes(nome_imp)
+            disjuntor.liberar_teste()
+            logger.info("Impressão cancelada na tentativa %s", tentativa)
+            return False, _com_impressas(ERRO_CANCELADA, inicio_indice, confirmadas)
+        except ImpressoraIndisponivel as e:
+            # nova tentativa não resolve falta de papel ou ribbon
+            transporte.abortar_job()
+            disjuntor.liberar_teste()
+            logger.warning("%s (%s de %s enviadas)", e, confirmadas, volumes)
+            erro: ErroImpressora = {"code": e.status, "message": str(e)}
+            return False, _com_impressas(erro, inicio_indice, confirmadas)
+        except Exception as e:  # captura erros do transporte
+            transporte.abortar_job()
+            esquecer_residentes(nome_imp)
+            invalidar_impressora()
+            disjuntor.registrar_falha()
+            codigo = getattr(e, "winerror", -1)
+            mensagem = getattr(e, "strerror", str(e))
+            logger.warning(
+                "Falha na tentativa %s de impressão: %s - %s (%s de %s enviadas)",
+                tentativa,
+                codigo,
+                mensagem,
+                confirmadas,
+                volumes,
+            )
+            erro = _com_impressas(
+                {"code": codigo, "message": mensagem}, inicio_indice, confirmadas
+            )
+            if tentativa == politica.tentativas or not disjuntor.permitir():
+                return False, erro
+            if not _aguardar(politica.atraso(tentativa), cancelamento):
+                return False, _com_impressas(ERRO_CANCELADA, inicio_indice, confirmadas)
+
+
 def imprimir_etiqueta(
     saida: str,
     categoria: str,
@@ -165,110 +909,344 @@ def imprimir_etiqueta(
     inicio_indice: int = 1,
     total_exibicao: int | None = None,
     repetir_em_falha: bool = False,
+    logo_residente: bool = False,
+    modo: str = "padrao",
+    tamanho_escrita: int = TAMANHO_ESCRITA_PADRAO,
+    transporte: Transporte | None = None,
+    cancelamento: threading.Event | None = None,
+    progresso: Callable[[int, int], None] | None = None,
+    etiquetas_por_documento: int = 0,
+    ao_concluir_documento: Callable[[int], None] | None = None,
+    politica: PoliticaRetentativa | None = None,
+    template: LabelTemplate | str | None = None,
 ) -> tuple[bool, ErroImpressora | None]:
     """Monta e envia comandos TSPL para a impressora padrão.
 
+    ``template`` (objeto ou nome) define dimensões e layout das etiquetas;
+    sem ele é usado o definido por :func:`aplicar_template`.
+
+    Com ``logo_residente`` a logo é gravada uma única vez na memória da
+    impressora (``DOWNLOAD``) e cada etiqueta apenas a referencia com
+    ``PUTBMP``; jobs seguintes na mesma impressora não a reenviam.
+
+    ``modo`` define como as etiquetas são enviadas (ver ``MODOS_IMPRESSAO``):
+    ``padrao`` envia o bloco completo de cada etiqueta; ``formulario`` grava
+    o layout como programa na impressora e envia apenas os campos variáveis
+    (implica ``logo_residente``); ``contador`` envia um único bloco e usa o
+    contador da impressora (``SET COUNTER``/``PRINT m,n``) para numerar a
+    série. Impressoras sem suporte a contadores devem usar ``padrao``.
+
+    O job inteiro é montado em um único buffer e enviado em escritas de até
+    ``tamanho_escrita`` bytes (normalmente uma por documento), pelo
+    ``transporte`` informado ou, na falta dele, pelo configurado (ver
+    :mod:`transport`). ``progresso(enviadas, volumes)`` é chamado após cada
+    escrita e o job é
+    interrompido entre escritas (ou durante a espera entre tentativas) quando
+    ``cancelamento`` for sinalizado.
+
+    As etiquetas aceitas pelo transporte são contabilizadas: uma nova
+    tentativa retoma da primeira etiqueta não enviada, mantendo a numeração
+    ``X DE Y`` original. Em caso de falha, ``erro["impressas"]`` informa as
+    faixas da numeração que já foram enviadas.
+
+    Com ``etiquetas_por_documento`` maior que zero o lote é transmitido em
+    vários documentos desse tamanho (um job do spooler cada), e
+    ``ao_concluir_documento(confirmadas)`` é chamado após o fechamento de cada
+    um, ponto seguro para gravar um checkpoint do lote. Como cada documento
+    costuma ir em uma única escrita, uma falha reenvia no máximo as etiquetas
+    de um documento.
+
+    ``politica`` define as novas tentativas; sem ela, ``repetir_em_falha``
+    escolhe entre :data:`resilience.POLITICA_PADRAO` e uma única tentativa.
+    Enquanto o disjuntor da impressora estiver aberto o job é recusado sem
+    nenhum envio (código :data:`resilience.CODIGO_CIRCUITO_ABERTO`).
+
     Retorna ``(True, None)`` em caso de sucesso ou ``(False, erro)`` quando
     ocorrer algum problema, contendo código e mensagem da falha.
     """
 
-    layout = LAYOUT_ATUAL
+    if modo not in MODOS_IMPRESSAO:
+        return False, {"code": 0, "message": f"Modo de impressão inválido: {modo}"}
+    if modo == "formulario":
+        logo_residente = True
 
-    # -------- prepara logo --------
-    logo_path = recurso_caminho("logo.png")
-    bitmap, largura_bytes, altura_px = melhorar_logo(
-        logo_path, largura_desejada=layout.get("logo_largura", 240)
-    )
+    tpl = _resolver_template(template)
+    layout = tpl.layout
 
-    dots_x = LARGURA_ETIQUETA_MM * DOTS_MM
-    dots_y = ALTURA_ETIQUETA_MM * DOTS_MM
-    x_logo = (dots_x - (largura_bytes * 8)) // 2  # centraliza logo
+    # -------- prepara logo --------
+    bitmap, largura_bytes, altura_px = _carregar_logo(layout)
+    x_logo, _ = tpl.posicao_logo(largura_bytes)
 
-    if layout["logo_y"] + altura_px > dots_y:
+    if layout["logo_y"] + altura_px > tpl.dots_y:
         return False, {"code": 0, "message": "Logo fora da área do template"}
 
     # Total exibido no rodapé
     if total_exibicao is None:
         total_exibicao = volumes
 
-    nome_imp = descobrir_impressora_padrao()
-    if nome_imp is None:
+    if transporte is None:
+        transporte = transporte_configurado()
+    if transporte is None:
         return False, {"code": 0, "message": "Nenhuma impressora padrão encontrada"}
 
-    max_tentativas = 3 if repetir_em_falha else 1
-    for tentativa in range(1, max_tentativas + 1):
-        logger.info("Tentativa %s de impressão", tentativa)
-        try:
-            h_prn = win32print.OpenPrinter(nome_imp)
-            win32print.StartDocPrinter(h_prn, 1, ("Etiqueta CONIMS", None, "RAW"))
-            win32print.StartPagePrinter(h_prn)
-
-            def t(chave: str, texto: str) -> str:
-                return _texto_layout(chave, texto, layout)
-
-            # -------- monta e imprime etiquetas ----------
-            for offset in range(volumes):
-                numero_atual = inicio_indice + offset  # ex.: 7,8,9,10
-                cmd = (
-                    f"SIZE {LARGURA_ETIQUETA_MM} mm,{ALTURA_ETIQUETA_MM} mm\n"
-                    f"GAP {GAP_MM} mm,0 mm\n"
-                    "CLS\n"
-                )
-                cmd += t("titulo", "CONIMS")
-                cmd += t("saida", f"Saida: {saida}")
-                cmd += t("categoria", f"Categoria: {categoria}")
-                cmd += t("emissor", f"Emissor: {emissor}")
-                cmd += t("municipio", f"Municipio: {municipio}")
-                cmd += t("data", f"Impresso em: {data_hora}")
-                cmd += t("fracao", "[ ] Fracao")
-                cmd += t("fragil", "[ ] Fragil")
-                cmd += t("numeracao", f"{numero_atual} DE {total_exibicao}")
-                cmd += (
-                    f"BITMAP {x_logo},{layout['logo_y']},{largura_bytes},{altura_px},0,"
-                )
-                corpo = cmd.encode() + bitmap + b"\nPRINT 1\n"
-                win32print.WritePrinter(h_prn, corpo)
+    # arquivos que precisam estar na memória da impressora antes das etiquetas
+    arquivos: list[tuple[str, Callable[[], bytes]]] = []
+    if logo_residente:
+        arquivo_logo = _nome_logo_residente(bitmap, largura_bytes, altura_px)
+        comando_logo = f'PUTBMP {x_logo},{layout["logo_y"]},"{arquivo_logo}"\n'
+        arquivos.append(
+            (
+                arquivo_logo,
+                lambda: _comando_download(
+                    arquivo_logo, bitmap_para_bmp(bitmap, largura_bytes, altura_px)
+                ),
+            )
+        )
+    else:
+        comando_logo = (
+            f"BITMAP {x_logo},{layout['logo_y']},{largura_bytes},{altura_px},0,"
+        )
 
-            win32print.EndPagePrinter(h_prn)
-            win32print.EndDocPrinter(h_prn)
-            win32print.ClosePrinter(h_prn)
-            logger.info("Impressão concluída na tentativa %s", tentativa)
-            return True, None
-        except Exception as e:  # captura erros do win32print
-            codigo = getattr(e, "winerror", -1)
-            mensagem = getattr(e, "strerror", str(e))
-            logger.warning(
-                "Falha na tentativa %s de impressão: %s - %s",
-                tentativa,
-                codigo,
-                mensagem,
+    campos = {
+        "saida": f"Saida: {saida}",
+        "categoria": f"Categoria: {categoria}",
+        "emissor": f"Emissor: {emissor}",
+        "municipio": f"Municipio: {municipio}",
+        "data": f"Impresso em: {data_hora}",
+    }
+    cabecalho_lote = b""
+    if modo == "formulario":
+        arquivo_form, programa = compilar_formulario(tpl, comando_logo)
+        arquivos.append((arquivo_form, lambda: programa))
+        cabecalho_lote = "".join(
+            f'{VARIAVEIS_FORMULARIO[chave]}="{texto}"\n'
+            for chave, texto in campos.items()
+        ).encode()
+
+    # partes fixas do lote: só a numeração muda de uma etiqueta para outra
+    antes_numeracao, depois_numeracao = tpl.modelo.dividir(
+        "numeracao", {chave: texto.encode() for chave, texto in campos.items()}
+    )
+    depois_numeracao += comando_logo.encode()
+    fecha_numeracao = f' DE {total_exibicao}"\n'.encode()
+    print_um = b"PRINT 1\n"
+
+    def montar_bloco(*numeracao: bytes, comando_print: bytes) -> tuple[bytes, ...]:
+        """Gera o bloco completo de uma etiqueta (ou série, no modo contador).
+
+        Os trechos fixos e o bitmap da logo entram como segmentos
+        compartilhados, sem serem copiados.
+        """
+
+        if logo_residente:
+            return antes_numeracao, *numeracao, depois_numeracao, comando_print
+        return (
+            antes_numeracao,
+            *numeracao,
+            depois_numeracao,
+            bitmap,
+            b"\n" + comando_print,
+        )
+
+    def montar_etiqueta(numero_atual: int) -> tuple[bytes, ...]:
+        """Gera os segmentos de uma etiqueta conforme o modo escolhido."""
+
+        if modo == "formulario":
+            comando = (
+                f'{VARIAVEIS_FORMULARIO["numeracao"]}='
+                f'"{numero_atual} DE {total_exibicao}"\n'
+                f'RUN "{arquivo_form}"\n'
             )
-            if tentativa == max_tentativas:
-                return False, {"code": codigo, "message": mensagem}
-            atraso = 0.5 * (2 ** (tentativa - 1))
-            time.sleep(atraso)
+            return (comando.encode(),)
+        return montar_bloco(
+            tpl.abre_numeracao,
+            str(numero_atual).encode(),
+            fecha_numeracao,
+            comando_print=print_um,
+        )
+
+    # segmentos de cada etiqueta, montados uma única vez para todas as tentativas
+    rotulos: list[tuple[bytes, ...]] = []
+    if modo != "contador":
+        rotulos = [montar_etiqueta(inicio_indice + o) for o in range(volumes)]
+
+    def montar_etiquetas(desde: int, ate: int) -> MontadorJob:
+        """Monta as etiquetas dos deslocamentos ``desde`` até ``ate - 1``."""
+
+        etiquetas = MontadorJob()
+        if modo == "contador":
+            # um único bloco: a impressora incrementa o contador a cada etiqueta
+            quantidade = ate - desde
+            etiquetas.adicionar_etiqueta(
+                *montar_bloco(
+                    _numeracao_contador(
+                        inicio_indice + desde, total_exibicao, layout
+                    ).encode(),
+                    comando_print=f"PRINT {quantidade},1\n".encode(),
+                ),
+                quantidade=quantidade,
+            )
+        else:
+            for segmentos in rotulos[desde:ate]:
+                etiquetas.adicionar_etiqueta(*segmentos)
+        return etiquetas
+
+    if politica is None:
+        politica = POLITICA_PADRAO if repetir_em_falha else SEM_RETENTATIVA
+    return _transmitir_lote(
+        transporte,
+        arquivos,
+        cabecalho_lote,
+        montar_etiquetas,
+        volumes,
+        inicio_indice=inicio_indice,
+        tamanho_escrita=tamanho_escrita,
+        cancelamento=cancelamento,
+        progresso=progresso,
+        etiquetas_por_documento=etiquetas_por_documento,
+        ao_concluir_documento=ao_concluir_documento,
+        politica=politica,
+    )
+
+
+def imprimir_manifesto(
+    itens: Sequence[Mapping[str, Any]],
+    data_hora: str,
+    logo_residente: bool = False,
+    tamanho_escrita: int = TAMANHO_ESCRITA_PADRAO,
+    transporte: Transporte | None = None,
+    cancelamento: threading.Event | None = None,
+    progresso: Callable[[int, int], None] | None = None,
+    etiquetas_por_documento: int = 0,
+    ao_concluir_documento: Callable[[int], None] | None = None,
+    politica: PoliticaRetentativa | None = None,
+    template: LabelTemplate | str | None = None,
+) -> tuple[bool, ErroImpressora | None]:
+    """Imprime as etiquetas de várias saídas como um único job.
+
+    Cada item de ``itens`` tem as chaves ``saida``, ``categoria``,
+    ``emissor``, ``municipio`` e ``volumes`` (veja :mod:`manifest`) e recebe
+    a numeração ``1 DE volumes`` a ``volumes DE volumes``. A impressora é
+    resolvida uma única vez e a logo é preparada uma vez para todas as
+    saídas; as etiquetas seguem em sequência, em documentos de
+    ``etiquetas_por_documento`` etiquetas (ou em um só).
+
+    Os demais parâmetros seguem :func:`imprimir_etiqueta` no modo
+    ``padrao``. ``progresso`` e ``ao_concluir_documento`` recebem o total de
+    etiquetas enviadas do manifesto inteiro e, em caso de falha,
+    ``erro["impressas"]`` informa as posições (a partir de 1) das etiquetas
+    já enviadas dentro do manifesto.
+    """
+
+    tpl = _resolver_template(template)
+    layout = tpl.layout
+
+    bitmap, largura_bytes, altura_px = _carregar_logo(layout)
+    x_logo, _ = tpl.posicao_logo(largura_bytes)
+    if layout["logo_y"] + altura_px > tpl.dots_y:
+        return False, {"code": 0, "message": "Logo fora da área do template"}
+
+    if transporte is None:
+        transporte = transporte_configurado()
+    if transporte is None:
+        return False, {"code": 0, "message": "Nenhuma impressora padrão encontrada"}
+
+    arquivos: list[tuple[str, Callable[[], bytes]]] = []
+    if logo_residente:
+        arquivo_logo = _nome_logo_residente(bitmap, largura_bytes, altura_px)
+        comando_logo = f'PUTBMP {x_logo},{layout["logo_y"]},"{arquivo_logo}"\n'
+        arquivos.append(
+            (
+                arquivo_logo,
+                lambda: _comando_download(
+                    arquivo_logo, bitmap_para_bmp(bitmap, largura_bytes, altura_px)
+                ),
+            )
+        )
+        print_um = b"PRINT 1\n"
+    else:
+        comando_logo = (
+            f"BITMAP {x_logo},{layout['logo_y']},{largura_bytes},{altura_px},0,"
+        )
+        # o bitmap entra entre o comando e a quebra de linha
+        print_um = b"\nPRINT 1\n"
+
+    # segmentos de todas as etiquetas, na ordem do manifesto
+    rotulos: list[tuple[bytes, ...]] = []
+    for item in itens:
+        volumes = int(item["volumes"])
+        antes_numeracao, depois_numeracao = tpl.modelo.dividir(
+            "numeracao",
+            {
+                "saida": f"Saida: {item['saida']}".encode(),
+                "categoria": f"Categoria: {item['categoria']}".encode(),
+                "emissor": f"Emissor: {item['emissor']}".encode(),
+                "municipio": f"Municipio: {item['municipio']}".encode(),
+                "data": f"Impresso em: {data_hora}".encode(),
+            },
+        )
+        depois_numeracao += comando_logo.encode()
+        fecha_numeracao = f' DE {volumes}"\n'.encode()
+        for numero in range(1, volumes + 1):
+            segmentos = (
+                antes_numeracao,
+                tpl.abre_numeracao,
+                str(numero).encode(),
+                fecha_numeracao,
+                depois_numeracao,
+            )
+            if not logo_residente:
+                segmentos += (bitmap,)
+            rotulos.append(segmentos + (print_um,))
+
+    if not rotulos:
+        return True, None
+
+    def montar_etiquetas(desde: int, ate: int) -> MontadorJob:
+        etiquetas = MontadorJob()
+        for segmentos in rotulos[desde:ate]:
+            etiquetas.adicionar_etiqueta(*segmentos)
+        return etiquetas
+
+    return _transmitir_lote(
+        transporte,
+        arquivos,
+        b"",
+        montar_etiquetas,
+        len(rotulos),
+        inicio_indice=1,
+        tamanho_escrita=tamanho_escrita,
+        cancelamento=cancelamento,
+        progresso=progresso,
+        etiquetas_por_documento=etiquetas_por_documento,
+        ao_concluir_documento=ao_concluir_documento,
+        politica=politica or SEM_RETENTATIVA,
+    )
 
 
 def imprimir_pagina_teste(
     repetir_em_falha: bool = False,
+    transporte: Transporte | None = None,
+    cancelamento: threading.Event | None = None,
+    politica: PoliticaRetentativa | None = None,
+    template: LabelTemplate | str | None = None,
 ) -> tuple[bool, ErroImpressora | None]:
     """Imprime uma página de teste padrão.
 
     A etiqueta contém o logo, campos fictícios, numeração ``1 DE 1`` e uma
     régua horizontal de calibração. O layout utilizado é o mesmo da
-    impressão normal das etiquetas.
+    impressão normal das etiquetas. Novas tentativas e disjuntor seguem
+    :func:`imprimir_etiqueta`.
     """
 
-    layout = LAYOUT_ATUAL
+    tpl = _resolver_template(template)
+    layout = tpl.layout
 
-    logo_path = recurso_caminho("logo.png")
-    bitmap, largura_bytes, altura_px = melhorar_logo(
-        logo_path, largura_desejada=layout.get("logo_largura", 240)
-    )
+    bitmap, largura_bytes, altura_px = _carregar_logo(layout)
 
-    dots_x = LARGURA_ETIQUETA_MM * DOTS_MM
-    dots_y = ALTURA_ETIQUETA_MM * DOTS_MM
-    x_logo = (dots_x - (largura_bytes * 8)) // 2
+    dots_x = tpl.dots_x
+    dots_y = tpl.dots_y
+    x_logo, _ = tpl.posicao_logo(largura_bytes)
 
     # valida posições do layout
     for chave in (
@@ -295,24 +1273,25 @@ def imprimir_pagina_teste(
     if ruler_len <= 0 or ruler_start + ruler_len > dots_x or ruler_y + 4 > dots_y:
         return False, {"code": 0, "message": "Régua fora da área do template"}
 
-    nome_imp = descobrir_impressora_padrao()
-    if nome_imp is None:
+    if transporte is None:
+        transporte = transporte_configurado()
+    if transporte is None:
         return False, {"code": 0, "message": "Nenhuma impressora padrão encontrada"}
 
-    max_tentativas = 3 if repetir_em_falha else 1
-    for tentativa in range(1, max_tentativas + 1):
+    if politica is None:
+        politica = POLITICA_PADRAO if repetir_em_falha else SEM_RETENTATIVA
+    disjuntor = disjuntor_de(transporte)
+    if not disjuntor.permitir():
+        return False, _erro_circuito_aberto(disjuntor)
+
+    for tentativa in range(1, politica.tentativas + 1):
         logger.info("Tentativa %s de impressão", tentativa)
         try:
-            h_prn = win32print.OpenPrinter(nome_imp)
-            win32print.StartDocPrinter(h_prn, 1, ("Etiqueta CONIMS", None, "RAW"))
-            win32print.StartPagePrinter(h_prn)
+            _aguardar_impressora(transporte, cancelamento)
+            transporte.iniciar_job("Etiqueta CONIMS")
 
             # --- monta pagina de teste ---
-            cmd = (
-                f"SIZE {LARGURA_ETIQUETA_MM} mm,{ALTURA_ETIQUETA_MM} mm\n"
-                f"GAP {GAP_MM} mm,0 mm\n"
-                "CLS\n"
-            )
+            cmd = tpl.cabecalho.decode()
             cmd += _texto_layout("titulo", "CONIMS", layout)
             cmd += _texto_layout("saida", "Saida: 000", layout)
             cmd += _texto_layout("categoria", "Categoria: TESTE", layout)
@@ -332,15 +1311,30 @@ def imprimir_pagina_teste(
                 y = ruler_y - altura
                 barras += f"BAR {x},{y},2,{altura}\n"
 
-            corpo = cmd.encode() + bitmap + f"\n{barras}PRINT 1\n".encode()
-            win32print.WritePrinter(h_prn, corpo)
+            job = MontadorJob()
+            job.adicionar(cmd.encode(), bitmap, f"\n{barras}PRINT 1\n".encode())
+            for bloco, _ in job.blocos():
+                _verificar_cancelamento(cancelamento)
+                transporte.escrever(bloco)
 
-            win32print.EndPagePrinter(h_prn)
-            win32print.EndDocPrinter(h_prn)
-            win32print.ClosePrinter(h_prn)
+            transporte.finalizar_job()
+            disjuntor.registrar_sucesso()
             logger.info("Impressão concluída na tentativa %s", tentativa)
             return True, None
-        except Exception as e:  # captura erros do win32print
+        except ImpressaoCancelada:
+            transporte.abortar_job()
+            disjuntor.liberar_teste()
+            logger.info("Impressão cancelada na tentativa %s", tentativa)
+            return False, ERRO_CANCELADA
+        except ImpressoraIndisponivel as e:
+            transporte.abortar_job()
+            disjuntor.liberar_teste()
+            logger.warning("%s", e)
+            return False, {"code": e.status, "message": str(e)}
+        except Exception as e:  # captura erros do transporte
+            transporte.abortar_job()
+            invalidar_impressora()
+            disjuntor.registrar_falha()
             codigo = getattr(e, "winerror", -1)
             mensagem = getattr(e, "strerror", str(e))
             logger.warning(
@@ -349,7 +1343,7 @@ def imprimir_pagina_teste(
                 codigo,
                 mensagem,
             )
-            if tentativa == max_tentativas:
+            if tentativa == politica.tentativas or not disjuntor.permitir():
                 return False, {"code": codigo, "message": mensagem}
-            atraso = 0.5 * (2 ** (tentativa - 1))
-            time.sleep(atraso)
+            if not _aguardar(politica.atraso(tentativa), cancelamento):
+                return False, ERRO_CANCELADA
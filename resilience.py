@@ -0,0 +1,224 @@
+"""Política de novas tentativas e disjuntor por impressora.
+
+:class:`PoliticaRetentativa` define quantas vezes um job é tentado e o
+intervalo entre as tentativas (exponencial, com variação aleatória). O
+:class:`Disjuntor` de cada impressora abre após falhas consecutivas e passa
+a recusar jobs imediatamente; depois de ``tempo_aberto`` segundos uma
+sondagem barata decide se a impressora volta a receber jobs: o estado
+informado pela impressora, quando o transporte permite lê-lo, ou
+:meth:`transport.Transporte.sondar`. Meio-aberto, o disjuntor libera um único
+job de teste, que o fecha ou o reabre.
+"""
+
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from log import logger
+from printer_status import STATUS_ERRO, cache_status
+from transport import Transporte
+
+# Código de erro dos jobs recusados pelo disjuntor aberto
+CODIGO_CIRCUITO_ABERTO = -2
+
+
+@dataclass(frozen=True)
+class PoliticaRetentativa:
+    """Quantidade de tentativas e espera entre elas.
+
+    A espera antes da tentativa ``n + 1`` é
+    ``atraso_inicial * fator ** (n - 1)``, limitada a ``atraso_maximo`` e
+    variando aleatoriamente em até ``jitter`` (fração) para mais ou menos.
+    """
+
+    tentativas: int = 3
+    atraso_inicial: float = 0.5
+    fator: float = 2.0
+    atraso_maximo: float = 8.0
+    jitter: float = 0.0
+
+    def atraso(self, tentativa: int) -> float:
+        """Espera (s) após a falha da ``tentativa`` (a partir de 1)."""
+
+        atraso = self.atraso_inicial * self.fator ** (tentativa - 1)
+        atraso = min(atraso, self.atraso_maximo)
+        if self.jitter:
+            atraso *= 1 + random.uniform(-self.jitter, self.jitter)
+        return max(0.0, atraso)
+
+    @classmethod
+    def de_config(cls, dados: dict[str, Any] | None) -> "PoliticaRetentativa":
+        """Cria a política a partir da chave ``retentativa`` de ``settings.json``."""
+
+        campos = cls.__dataclass_fields__
+        return cls(**{k: v for k, v in (dados or {}).items() if k in campos})
+
+
+SEM_RETENTATIVA = PoliticaRetentativa(tentativas=1)
+POLITICA_PADRAO = PoliticaRetentativa()
+
+
+FECHADO = "fechado"
+ABERTO = "aberto"
+MEIO_ABERTO = "meio-aberto"
+
+
+class Disjuntor:
+    """Disjuntor de uma impressora.
+
+    Args:
+        transporte: Transporte usado nas sondagens.
+        falhas_para_abrir: Falhas consecutivas que abrem o disjuntor.
+        tempo_aberto: Segundos até a sondagem que pode fechá-lo de novo.
+    """
+
+    def __init__(
+        self,
+        transporte: Transporte,
+        falhas_para_abrir: int = 3,
+        tempo_aberto: float = 30.0,
+    ) -> None:
+        self.transporte = transporte
+        self.falhas_para_abrir = falhas_para_abrir
+        self.tempo_aberto = tempo_aberto
+        self.estado = FECHADO
+        self.falhas = 0
+        self._reabre_em = 0.0
+        self._em_teste = False  # job de teste do meio-aberto em andamento
+        self._lock = threading.Lock()
+        self._timer: threading.Timer | None = None
+
+    def permitir(self) -> bool:
+        """Indica se um job pode ser enviado agora.
+
+        Meio-aberto, só o primeiro job é permitido até que ele registre
+        sucesso ou falha (ou devolva a vaga com :meth:`liberar_teste`).
+        """
+
+        with self._lock:
+            if self.estado == MEIO_ABERTO:
+                if self._em_teste:
+                    return False
+                self._em_teste = True
+            return self.estado != ABERTO
+
+    def liberar_teste(self) -> None:
+        """Devolve a vaga do job de teste que terminou sem sucesso nem falha.
+
+        Chamado quando o job é cancelado ou a impressora informa um estado
+        que impede a impressão; o próximo job faz o teste.
+        """
+
+        with self._lock:
+            self._em_teste = False
+
+    def segundos_para_sondagem(self) -> float:
+        """Tempo restante até a próxima sondagem (0 se não estiver aberto)."""
+
+        with self._lock:
+            if self.estado != ABERTO:
+                return 0.0
+            return max(0.0, self._reabre_em - time.monotonic())
+
+    def registrar_sucesso(self) -> None:
+        with self._lock:
+            if self.estado != FECHADO:
+                logger.info("Disjuntor de %s fechado", self.transporte.nome)
+            self.estado = FECHADO
+            self.falhas = 0
+            self._em_teste = False
+
+    def registrar_falha(self) -> None:
+        with self._lock:
+            self.falhas += 1
+            self._em_teste = False
+            if self.estado == MEIO_ABERTO or self.falhas >= self.falhas_para_abrir:
+                self._abrir()
+
+    def _abrir(self) -> None:
+        if self.estado != ABERTO:
+            logger.warning(
+                "Disjuntor de %s aberto após %s falhas",
+                self.transporte.nome,
+                self.falhas,
+            )
+        self.estado = ABERTO
+        self._reabre_em = time.monotonic() + self.tempo_aberto
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(self.tempo_aberto, self._sondar)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _disponivel(self) -> bool:
+        # abrir o spooler ou a conexão não prova que a impressora responde:
+        # o estado lido dela, quando possível, é mais confiável
+        status = cache_status.consultar(self.transporte, forcar=True)
+        if status is not None:
+            return not status & STATUS_ERRO
+        return self.transporte.sondar()
+
+    def _sondar(self) -> None:
+        try:
+            disponivel = self._disponivel()
+        except Exception:
+            disponivel = False
+        with self._lock:
+            if self.estado != ABERTO:
+                return
+            if disponivel:
+                # o próximo job confirma (fecha) ou reabre o disjuntor
+                self.estado = MEIO_ABERTO
+                logger.info("Disjuntor de %s meio-aberto", self.transporte.nome)
+            else:
+                self._abrir()
+
+    def cancelar_sondagem(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+
+_disjuntores: dict[str, Disjuntor] = {}
+_disjuntores_lock = threading.Lock()
+_parametros_disjuntor: dict[str, float] = {"falhas_para_abrir": 3, "tempo_aberto": 30.0}
+
+
+def disjuntor_de(transporte: Transporte) -> Disjuntor:
+    """Retorna o disjuntor da impressora de ``transporte``."""
+
+    with _disjuntores_lock:
+        disjuntor = _disjuntores.get(transporte.nome)
+        if disjuntor is None:
+            disjuntor = Disjuntor(
+                transporte,
+                int(_parametros_disjuntor["falhas_para_abrir"]),
+                _parametros_disjuntor["tempo_aberto"],
+            )
+            _disjuntores[transporte.nome] = disjuntor
+        else:
+            disjuntor.transporte = transporte
+        return disjuntor
+
+
+def configurar_disjuntores(falhas_para_abrir: int, tempo_aberto: float) -> None:
+    """Define os parâmetros dos disjuntores, inclusive dos já criados."""
+
+    with _disjuntores_lock:
+        _parametros_disjuntor["falhas_para_abrir"] = falhas_para_abrir
+        _parametros_disjuntor["tempo_aberto"] = tempo_aberto
+        for disjuntor in _disjuntores.values():
+            disjuntor.falhas_para_abrir = falhas_para_abrir
+            disjuntor.tempo_aberto = tempo_aberto
+
+
+def esquecer_disjuntores() -> None:
+    """Descarta todos os disjuntores (e suas sondagens agendadas)."""
+
+    with _disjuntores_lock:
+        for disjuntor in _disjuntores.values():
+            disjuntor.cancelar_sondagem()
+        _disjuntores.clear()
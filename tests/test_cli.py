@@ -0,0 +1,107 @@
+import os
+import subprocess
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+
+def test_cli_nao_importa_qt():
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    codigo = "import sys, cli; assert 'PyQt5' not in sys.modules, 'PyQt5'"
+    subprocess.run([sys.executable, "-c", codigo], cwd=raiz, check=True)
+
+
+def test_cli_print_reprint_e_report(monkeypatch, tmp_path, capsys):
+    import cli
+    import persistence
+    import printing
+
+    monkeypatch.setattr(
+        persistence, "recurso_caminho", lambda p: os.path.join(tmp_path, p)
+    )
+    monkeypatch.setattr(
+        printing, "melhorar_logo", lambda p, largura_desejada=240: (b"A", 1, 1)
+    )
+    monkeypatch.setattr(printing, "recurso_caminho", lambda p: "fake")
+    saida = tmp_path / "impressora.prn"
+    destino = ["--impressora", f"arquivo:{saida}"]
+
+    assert (
+        cli.main(
+            ["print", *destino, "--saida", "7", "--categoria", "C"]
+            + ["--emissor", "E", "--municipio", "M", "--volumes", "3"]
+        )
+        == 0
+    )
+    assert saida.read_bytes().count(b"PRINT 1") == 3
+    assert persistence.carregar_ultima_impressao()["volumes"] == 3
+    assert persistence.carregar_contagem()[0] == 3
+
+    assert cli.main(["reprint", *destino, "--intervalo", "2-3"]) == 0
+    assert saida.read_bytes().count(b"PRINT 1") == 5
+    assert b"3 DE 3" in saida.read_bytes()
+    # reimpressões não entram nos contadores
+    assert persistence.carregar_contagem()[0] == 3
+
+    # as faltantes do lote de 5 são o último registro: a numeração segue o lote
+    persistence.registrar_impressao(
+        "9", "C", "E", "M", 2, "01/02/2024 10:00", recentes=False, lote=5
+    )
+    assert persistence.carregar_ultima_impressao()["lote"] == 5
+    assert cli.main(["reprint", *destino, "--intervalo", "4-5"]) == 0
+    assert b"5 DE 5" in saida.read_bytes()
+
+    assert cli.main(["print", *destino, "--saida", "8"]) == 2
+    assert "categoria" in capsys.readouterr().err
+
+
+def test_cli_reprint_de_lote_interrompido(monkeypatch, tmp_path, capsys):
+    import cli
+    import persistence
+    import printing
+
+    monkeypatch.setattr(
+        persistence, "recurso_caminho", lambda p: os.path.join(tmp_path, p)
+    )
+    monkeypatch.setattr(
+        printing, "melhorar_logo", lambda p, largura_desejada=240: (b"A", 1, 1)
+    )
+    monkeypatch.setattr(printing, "recurso_caminho", lambda p: "fake")
+    saida = tmp_path / "impressora.prn"
+    destino = ["--impressora", f"arquivo:{saida}"]
+    imprimir = printing.imprimir_etiqueta
+
+    def interromper(*args, **kwargs):
+        # a impressora falha depois das duas primeiras etiquetas
+        return False, {"code": 5, "message": "Offline", "impressas": [(1, 2)]}
+
+    monkeypatch.setattr(printing, "imprimir_etiqueta", interromper)
+    assert (
+        cli.main(
+            ["print", *destino, "--saida", "7", "--categoria", "C"]
+            + ["--emissor", "E", "--municipio", "M", "--volumes", "5"]
+        )
+        == 1
+    )
+    ultima = persistence.carregar_ultima_impressao()
+    assert (ultima["volumes"], ultima["lote"]) == (2, 5)
+
+    monkeypatch.setattr(printing, "imprimir_etiqueta", imprimir)
+    assert cli.main(["reprint", *destino, "--intervalo", "3-5"]) == 0
+    conteudo = saida.read_bytes()
+    assert b"3 DE 5" in conteudo and b"5 DE 5" in conteudo
+    assert "de 5 reimpressas" in capsys.readouterr().out
+
+
+def test_cli_report(monkeypatch, tmp_path, capsys):
+    import cli
+    import persistence
+
+    monkeypatch.setattr(
+        persistence, "recurso_caminho", lambda p: os.path.join(tmp_path, p)
+    )
+    assert cli.main(["report", "--mes", "2024-02"]) == 1
+
+    persistence.salvar_historico("1", "C", "E", "M", 2, "01/02/2024 10:00:00")
+    assert cli.main(["report", "--mes", "2024-02"]) == 0
+    assert capsys.readouterr().out.strip().endswith("relatorio_2024-02.csv")
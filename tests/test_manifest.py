@@ -0,0 +1,56 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+
+def test_carregar_manifesto_csv_e_json(tmp_path):
+    from manifest import carregar_manifesto
+
+    csv_path = tmp_path / "manifesto.csv"
+    csv_path.write_text(
+        "Saída;Categoria;Emissor;Município;Volumes\n"
+        "101;Medicamentos;Ana;Aracruz;2\n"
+        "\n"
+        " 102 ;Insumos;Bia;Serra;1\n",
+        encoding="utf-8-sig",
+    )
+    itens = carregar_manifesto(str(csv_path))
+    assert [i["saida"] for i in itens] == ["101", "102"]
+    assert itens[0] == {
+        "saida": "101",
+        "categoria": "Medicamentos",
+        "emissor": "Ana",
+        "municipio": "Aracruz",
+        "volumes": 2,
+    }
+
+    json_path = tmp_path / "manifesto.json"
+    json_path.write_text(json.dumps([dict(i) for i in itens]), encoding="utf-8")
+    assert carregar_manifesto(str(json_path)) == itens
+
+
+def test_carregar_manifesto_invalido(tmp_path):
+    from manifest import ErroManifesto, carregar_manifesto
+
+    caminho = tmp_path / "manifesto.csv"
+    caminho.write_text(
+        "saida,categoria,emissor,municipio,volumes\n" "1,C,E,M,1\n" "2,C,E,M,zero\n"
+    )
+    with pytest.raises(ErroManifesto, match="Linha 3"):
+        carregar_manifesto(str(caminho))
+
+
+def test_distribuir_enviadas():
+    from manifest import distribuir_enviadas
+
+    campos = ("saida", "categoria", "emissor", "municipio", "volumes")
+    itens = [
+        dict(zip(campos, ("1", "C", "E", "M", 2))),
+        dict(zip(campos, ("2", "C", "E", "M", 3))),
+    ]
+    assert distribuir_enviadas(itens, 3) == [(itens[0], 2), (itens[1], 1)]
+    assert distribuir_enviadas(itens, 0) == []
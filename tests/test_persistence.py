@@ -50,6 +50,7 @@ def test_salvar_historico_e_registrar(monkeypatch, tmp_path):
         "Emissor",
         "Município",
         "Volumes",
+        "Lote",
     ]
     assert rows[1] == ["data", "s", "c", "e", "m", "3"]
 
@@ -92,3 +93,290 @@ def test_atualizar_recentes(monkeypatch, tmp_path):
         persistence.atualizar_recentes(f"c{i}", f"e{i}", f"m{i}")
     dados = persistence.carregar_recentes()
     assert len(dados["categoria"]) == 20
+
+
+def test_checkpoint(monkeypatch, tmp_path):
+    persistence = _patch_paths(monkeypatch, tmp_path)
+    assert persistence.carregar_checkpoint() is None
+    persistence.salvar_checkpoint({"saida": "S", "enviadas": 4})
+    persistence.salvar_checkpoint({"saida": "S", "enviadas": 8})
+    assert persistence.carregar_checkpoint() == {"saida": "S", "enviadas": 8}
+    assert not (tmp_path / "checkpoint.json.tmp").exists()
+    persistence.limpar_checkpoint()
+    assert persistence.carregar_checkpoint() is None
+
+
+def test_limpar_checkpoint_apenas_do_job(monkeypatch, tmp_path):
+    persistence = _patch_paths(monkeypatch, tmp_path)
+    # o job 2 já gravou seu checkpoint quando a interface conclui o job 1
+    persistence.salvar_checkpoint({"job": 2, "saida": "S2", "enviadas": 0})
+    persistence.limpar_checkpoint(1)
+    assert persistence.carregar_checkpoint()["job"] == 2
+    persistence.limpar_checkpoint(2)
+    assert persistence.carregar_checkpoint() is None
+
+
+def test_registrar_impressoes_em_lote(monkeypatch, tmp_path):
+    persistence = _patch_paths(monkeypatch, tmp_path)
+    persistence.salvar_contagem(10, 4)
+    registros = [
+        {
+            "saida": str(n),
+            "categoria": "C",
+            "emissor": "E",
+            "municipio": m,
+            "volumes": n,
+            "data_hora": "01/02/2024 10:00",
+        }
+        for n, m in ((1, "A"), (2, "B"), (3, "A"))
+    ]
+    assert persistence.registrar_impressoes(registros) == (16, 10)
+
+    with open(tmp_path / "historico_impressoes.csv", encoding="utf-8-sig") as arquivo:
+        linhas = list(csv.reader(arquivo, delimiter=";"))
+    assert len(linhas) == 4
+    assert linhas[3] == ["01/02/2024 10:00", "3", "C", "E", "A", "3"]
+    assert sum(persistence.carregar_historico_mensal().values()) == 6
+    recentes = persistence.carregar_recentes()
+    assert recentes["municipio"] == {"A": 2, "B": 1}
+    assert recentes["categoria"] == {"C": 3}
+
+
+def test_armazenamento_sqlite_e_importacao(monkeypatch, tmp_path):
+    import sqlite3
+
+    import persistence_sqlite
+
+    persistence = _patch_paths(monkeypatch, tmp_path)
+    persistence.salvar_historico("1", "C", "E", "M", 2, "05/02/2024 10:00:00")
+    persistence.salvar_historico("2", "D", "E", "N", 3, "06/03/2024 11:00")
+    persistence.salvar_contagem(5, 3)
+    persistence.registrar_contagem_mensal("02-2024", 2)
+    persistence.atualizar_recentes("C", "E", "M")
+    recentes = persistence.carregar_recentes()
+
+    assert persistence.importar_para_sqlite() == 2
+    monkeypatch.setattr(persistence, "_armazenamento", "sqlite")
+    with sqlite3.connect(tmp_path / "historico.db") as banco:
+        assert banco.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    with persistence_sqlite.conectar(str(tmp_path / "historico.db")) as banco:
+        assert banco.execute("PRAGMA synchronous").fetchone()[0] == 2  # FULL
+
+    assert persistence.carregar_contagem() == (5, 3)
+    assert persistence.carregar_historico_mensal() == {"02-2024": 2}
+    assert persistence.carregar_recentes() == recentes
+    assert persistence.carregar_ultima_impressao("1")["volumes"] == 2
+
+    total = persistence.registrar_impressoes(
+        [
+            {
+                "saida": "3",
+                "categoria": "C",
+                "emissor": "F",
+                "municipio": "M",
+                "volumes": 4,
+                "data_hora": "07/02/2024 09:00",
+                "lote": 10,
+            }
+        ]
+    )
+    assert total == (9, 7)
+    assert persistence.carregar_ultima_impressao()["saida"] == "3"
+    assert persistence.carregar_ultima_impressao()["lote"] == 10
+    assert persistence.carregar_ultima_impressao("1")["lote"] == 2
+    assert persistence.carregar_recentes()["municipio"] == {"M": 2}
+
+    caminho = persistence.gerar_relatorio_mensal("2024-02")
+    with open(caminho, encoding="utf-8-sig") as arquivo:
+        linhas = list(csv.reader(arquivo, delimiter=";"))
+    assert linhas[1:] == [["C", "M", "E", "2"], ["C", "M", "F", "4"]]
+    # os arquivos originais não são alterados no modo SQLite
+    with open(tmp_path / "historico_impressoes.csv", encoding="utf-8-sig") as f:
+        assert len(f.readlines()) == 3
+
+
+def test_registrar_impressao_recupera_transacao_interrompida(monkeypatch, tmp_path):
+    persistence = _patch_paths(monkeypatch, tmp_path)
+    persistence.salvar_contagem(10, 4)
+    total = persistence.registrar_impressao("1", "C", "E", "M", 2, "01/02/2024 10:00")
+    assert total == (12, 6)
+
+    aplicar = persistence._aplicar_transacao
+
+    def cair(transacao):
+        raise OSError("queda")
+
+    # o aplicativo cai logo depois de gravar o diário
+    monkeypatch.setattr(persistence, "_aplicar_transacao", cair)
+    try:
+        persistence.registrar_impressao("2", "D", "E", "M", 3, "01/02/2024 11:00")
+    except OSError:
+        pass
+    assert (tmp_path / "transacao.json").exists()
+    monkeypatch.setattr(persistence, "_aplicar_transacao", aplicar)
+
+    assert persistence.carregar_contagem() == (15, 9)
+    assert not (tmp_path / "transacao.json").exists()
+    with open(tmp_path / "historico_impressoes.csv", encoding="utf-8-sig") as arquivo:
+        linhas = list(csv.reader(arquivo, delimiter=";"))
+    assert [linha[1] for linha in linhas[1:]] == ["1", "2"]
+    assert sum(persistence.carregar_historico_mensal().values()) == 5
+    assert persistence.carregar_recentes()["municipio"] == {"M": 2}
+
+
+def test_transacao_sincroniza_arquivos_antes_do_diario(monkeypatch, tmp_path):
+    persistence = _patch_paths(monkeypatch, tmp_path)
+    eventos = []
+    fsync, remover = os.fsync, os.remove
+
+    def sincronizar(fd):
+        eventos.append("fsync")
+        fsync(fd)
+
+    def remover_arquivo(caminho):
+        eventos.append(os.path.basename(caminho))
+        remover(caminho)
+
+    monkeypatch.setattr(persistence.os, "fsync", sincronizar)
+    monkeypatch.setattr(persistence.os, "remove", remover_arquivo)
+    persistence.registrar_impressao("1", "C", "E", "M", 2, "01/02/2024 10:00")
+
+    # diário, histórico e cada JSON sincronizados antes de remover o diário
+    assert eventos[-1] == "transacao.json"
+    assert eventos[:-1] == ["fsync"] * len(eventos[:-1]) and len(eventos) > 3
+
+
+def test_carregar_contagem_corrompida(monkeypatch, tmp_path):
+    from datetime import datetime
+
+    persistence = _patch_paths(monkeypatch, tmp_path)
+    mes = datetime.now().strftime("%m-%Y")
+    persistence.registrar_impressao("1", "C", "E", "M", 2, "01/02/2024 10:00")
+    persistence.registrar_contagem_mensal("01-2020", 5)
+    # arquivo truncado por uma queda de energia
+    with open(tmp_path / "contagem.json", "w", encoding="utf-8") as arquivo:
+        arquivo.write('{"total_geral": 1')
+
+    assert persistence.carregar_contagem() == (7, 2)
+    with open(tmp_path / "contagem.json", encoding="utf-8") as arquivo:
+        assert json.load(arquivo)["mes_atual"] == mes
+
+    # corrompido de novo, agora a próxima impressão é que o encontra
+    with open(tmp_path / "contagem.json", "w", encoding="utf-8") as arquivo:
+        arquivo.write('{"total_geral": 7, "tot')
+    total = persistence.registrar_impressao("2", "C", "E", "M", 3, "01/02/2024 11:00")
+    assert total == (10, 5)
+    assert persistence.carregar_contagem() == (10, 5)
+    assert persistence.carregar_ultima_impressao()["saida"] == "2"
+
+
+def test_resumos_mensais_e_reconstrucao(monkeypatch, tmp_path):
+    import shutil
+
+    persistence = _patch_paths(monkeypatch, tmp_path)
+    persistence.salvar_historico("1", "C", "E", "M", 2, "05/02/2024 10:00:00")
+    persistence.registrar_impressao("2", "C", "E", "M", 3, "06/02/2024 11:00")
+    persistence.salvar_historico("3", "D", "F", "N", 1, "01/03/2024 08:00")
+    with open(tmp_path / "resumos" / "2024-02.json", encoding="utf-8") as arquivo:
+        assert json.load(arquivo) == [["C", "M", "E", 5]]
+
+    # linha acrescentada à mão: só aparece depois de reconstruir
+    with open(tmp_path / "historico_impressoes.csv", "a", encoding="utf-8") as arquivo:
+        arquivo.write("07/02/2024 09:00;4;D;F;N;7\n")
+    assert persistence.reconstruir_resumos() == 2
+    esperado = [["C", "M", "E", "5"], ["D", "N", "F", "7"]]
+    for _ in range(2):
+        caminho = persistence.gerar_relatorio_mensal("2024-02")
+        with open(caminho, encoding="utf-8-sig") as arquivo:
+            assert list(csv.reader(arquivo, delimiter=";"))[1:] == esperado
+        # sem a pasta, os resumos são refeitos automaticamente
+        shutil.rmtree(tmp_path / "resumos")
+
+
+def test_reconstruir_resumos_ignora_linhas_invalidas(monkeypatch, tmp_path):
+    persistence = _patch_paths(monkeypatch, tmp_path)
+    persistence.salvar_historico("1", "C", "E", "M", 2, "05/02/2024 10:00")
+    # linhas editadas à mão: volumes vazio e município salvo em Latin-1
+    with open(tmp_path / "historico_impressoes.csv", "ab") as arquivo:
+        arquivo.write(b"08/02/2024 10:00;9;C;E;M;\n")
+        arquivo.write("09/02/2024 10:00;10;C;E;São;4\n".encode("latin-1"))
+
+    assert persistence.reconstruir_resumos() == 1
+    with open(tmp_path / "resumos" / "2024-02.json", encoding="utf-8") as arquivo:
+        assert json.load(arquivo) == [["C", "M", "E", 2], ["C", "S\ufffdo", "E", 4]]
+
+    def falhar():
+        raise OSError("sem espaço")
+
+    # a reconstrução que falha não impede o registro da impressão
+    monkeypatch.setattr(persistence, "reconstruir_resumos", falhar)
+    (tmp_path / "resumos" / "2024-02.json").unlink()
+    (tmp_path / "resumos").rmdir()
+    assert persistence.registrar_impressao("2", "C", "E", "M", 3, "10/02/2024 10:00")
+    assert persistence.carregar_ultima_impressao()["saida"] == "2"
+
+
+def test_indice_do_historico(monkeypatch, tmp_path):
+    persistence = _patch_paths(monkeypatch, tmp_path)
+    persistence.salvar_historico("1", "C", "E", "M", 2, "31/01/2024 10:00")
+    persistence.salvar_historico("2", "C", "E", "M", 3, "05/02/2024 10:00")
+    persistence.registrar_impressao("3", "D", "F", "N", 1, "05/02/2024 11:00")
+    with open(tmp_path / "indice_historico.json", encoding="utf-8") as arquivo:
+        indice = json.load(arquivo)
+    historico = tmp_path / "historico_impressoes.csv"
+    assert indice["tamanho"] == historico.stat().st_size
+    inicio, fim = indice["meses"]["2024-02"]
+    assert indice["dias"]["2024-02-05"] == [inicio, fim]
+    with open(historico, "rb") as arquivo:
+        arquivo.seek(inicio)
+        linhas = arquivo.read(fim - inicio).decode().splitlines()
+    assert [linha.split(";")[1] for linha in linhas] == ["2", "3"]
+
+    # linha acrescentada por fora: só o final do arquivo é indexado de novo
+    with open(historico, "a", encoding="utf-8") as arquivo:
+        arquivo.write("06/02/2024 09:00;4;C;E;M;7\n")
+    assert persistence.carregar_ultima_impressao()["saida"] == "4"
+    assert persistence.carregar_ultima_impressao("1")["volumes"] == 2
+    assert persistence.carregar_ultima_impressao("9") is None
+    persistence.salvar_historico("5", "C", "E", "M", 1, "06/02/2024 10:00")
+    with open(tmp_path / "indice_historico.json", encoding="utf-8") as arquivo:
+        indice = json.load(arquivo)
+    assert indice["meses"]["2024-02"][0] == inicio
+    assert indice["tamanho"] == historico.stat().st_size
+    # janeiro fica só na faixa do mês: o índice não cresce com o histórico
+    assert indice["mes_dias"] == "2024-02"
+    assert sorted(indice["dias"]) == ["2024-02-05", "2024-02-06"]
+    assert sorted(indice["meses"]) == ["2024-01", "2024-02"]
+
+
+def test_data_hora_do_historico_nos_dois_formatos(monkeypatch, tmp_path):
+    persistence = _patch_paths(monkeypatch, tmp_path)
+    assert persistence._dia_registro("05/02/2024 10:00") == "2024-02-05"
+    assert persistence._dia_registro("05/02/2024 10:00:59") == "2024-02-05"
+    for invalida in ("2024-02-05 10:00", "5/2/2024 10:00", "05/02/2024", ""):
+        assert persistence._mes_registro(invalida) is None
+
+    with open(tmp_path / "historico_impressoes.csv", "w", encoding="utf-8") as arquivo:
+        arquivo.write("Data e Hora;Saída;Categoria;Emissor;Município;Volumes\n")
+        arquivo.write("05/02/2024 10:00:00;1;C;E;M;2\n")
+        arquivo.write("data inválida;2;C;E;M;4\n")
+        arquivo.write("06/02/2024 10:00;3;C;E;M;3\n")
+    assert persistence.reconstruir_resumos() == 1
+    with open(tmp_path / "resumos" / "2024-02.json", encoding="utf-8") as arquivo:
+        assert json.load(arquivo) == [["C", "M", "E", 5]]
+
+
+def test_importar_para_sqlite_ignora_linhas_invalidas(monkeypatch, tmp_path):
+    persistence = _patch_paths(monkeypatch, tmp_path)
+    persistence.salvar_historico("1", "C", "E", "M", 2, "05/02/2024 10:00")
+    with open(tmp_path / "historico_impressoes.csv", "a", encoding="utf-8") as arquivo:
+        arquivo.write("08/02/2024 10:00;9;C;E;M;\n")
+        arquivo.write("09/02/2024 10:00;10;C;E;M;dois\n")
+        arquivo.write("10/02/2024 10:00;11;C\n")
+        arquivo.write("11/02/2024 10:00;12;C;E;M;2;5\n")
+
+    assert persistence.importar_para_sqlite() == 2
+    monkeypatch.setattr(persistence, "_armazenamento", "sqlite")
+    ultima = persistence.carregar_ultima_impressao()
+    assert (ultima["saida"], ultima["lote"]) == ("12", 5)
+    assert persistence.carregar_ultima_impressao("9") is None
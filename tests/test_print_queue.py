@@ -0,0 +1,193 @@
+import os
+import sys
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+
+def test_fila_processa_em_segundo_plano_e_notifica():
+    from print_queue import FilaImpressao, JobImpressao
+
+    liberar = threading.Event()
+    eventos = []
+
+    def executor(job, progresso):
+        liberar.wait(5)
+        progresso(job.volumes, job.volumes)
+        return True, None
+
+    fila = FilaImpressao(
+        ao_iniciar=lambda j: eventos.append(("inicio", j.id)),
+        ao_progresso=lambda j, n, t: eventos.append(("progresso", j.id, n, t)),
+        ao_concluir=lambda j: eventos.append(("fim", j.id)),
+        executor=executor,
+    )
+    job = fila.enviar(JobImpressao(saida="1", volumes=3))
+
+    # enviar não bloqueia enquanto o job está sendo impresso
+    assert fila.ocupada()
+    liberar.set()
+    assert fila.aguardar(5)
+    assert eventos == [
+        ("inicio", job.id),
+        ("progresso", job.id, 3, 3),
+        ("fim", job.id),
+    ]
+    assert job.resultado == (True, None)
+    fila.parar(5)
+
+
+def test_fila_cancelamento():
+    from print_queue import FilaImpressao, JobImpressao
+
+    em_execucao = threading.Event()
+    falhas = []
+
+    def executor(job, progresso):
+        em_execucao.set()
+        job.cancelamento.wait(5)
+        return False, {"code": 0, "message": "Impressão cancelada"}
+
+    fila = FilaImpressao(
+        ao_falhar=lambda j, erro: falhas.append((j.id, erro["message"])),
+        executor=executor,
+    )
+    atual = fila.enviar(JobImpressao(saida="1"))
+    seguinte = fila.enviar(JobImpressao(saida="2"))
+    assert em_execucao.wait(5)
+    fila.cancelar_todos()
+    assert fila.aguardar(5)
+
+    assert [j for j, _ in falhas] == [atual.id, seguinte.id]
+    assert all(msg == "Impressão cancelada" for _, msg in falhas)
+    fila.parar(5)
+
+
+def test_cancelamento_durante_espera_entre_tentativas(monkeypatch):
+    import printing
+
+    class Falha(printing.Transporte):
+        nome = "falha"
+
+        def iniciar_job(self, titulo):
+            raise OSError("offline")
+
+        def escrever(self, dados):
+            pass
+
+    monkeypatch.setattr(
+        printing, "melhorar_logo", lambda p, largura_desejada=240: (b"A", 1, 1)
+    )
+    monkeypatch.setattr(printing, "recurso_caminho", lambda p: "fake")
+    cancelamento = threading.Event()
+    threading.Timer(0.05, cancelamento.set).start()
+
+    ok, erro = printing.imprimir_etiqueta(
+        "S",
+        "C",
+        "E",
+        "M",
+        1,
+        "2024-01-01",
+        repetir_em_falha=True,
+        transporte=Falha(),
+        cancelamento=cancelamento,
+    )
+    assert not ok
+    assert erro["message"] == printing.ERRO_CANCELADA["message"]
+    assert erro["impressas"] == []
+
+
+def test_fila_prioridade_entre_documentos():
+    from print_queue import PRIORIDADE_URGENTE, FilaImpressao, JobImpressao
+
+    iniciado = threading.Event()
+    documento = threading.Event()
+    ordem = []
+
+    def executor(job, progresso):
+        ordem.append(("inicio", job.saida))
+        if job.saida == "lote":
+            iniciado.set()
+            # primeiro documento do lote; os demais jobs já estão na fila
+            assert documento.wait(5)
+            job.entre_documentos()
+        ordem.append(("fim", job.saida))
+        return True, None
+
+    fila = FilaImpressao(executor=executor)
+    fila.enviar(JobImpressao(saida="lote", volumes=500))
+    assert iniciado.wait(5)
+    fila.enviar(JobImpressao(saida="normal"))
+    fila.enviar(JobImpressao(saida="reimpressao", prioridade=PRIORIDADE_URGENTE))
+    documento.set()
+    assert fila.aguardar(5)
+    assert ordem == [
+        ("inicio", "lote"),
+        ("inicio", "reimpressao"),
+        ("fim", "reimpressao"),
+        ("fim", "lote"),
+        ("inicio", "normal"),
+        ("fim", "normal"),
+    ]
+    fila.parar(5)
+
+
+def test_fila_prioridade_entre_documentos_do_pool(monkeypatch):
+    import print_queue
+    import printing
+    from print_queue import PRIORIDADE_URGENTE, FilaImpressao, JobImpressao
+
+    iniciado = threading.Event()
+    urgente_na_fila = threading.Event()
+    ordem = []
+
+    def pool(*args, transportes, ao_concluir_documento, **opcoes):
+        ordem.append("pool: 1 a 10")
+        iniciado.set()
+        assert urgente_na_fila.wait(5)
+        # uma das impressoras fecha o primeiro documento do lote
+        ao_concluir_documento([(1, 10)])
+        ordem.append("pool: 11 a 20")
+        return True, None
+
+    def etiqueta(saida, *args, **opcoes):
+        ordem.append(f"etiqueta {saida}")
+        return True, None
+
+    monkeypatch.setattr(print_queue, "obter_transporte", lambda destino: destino)
+    monkeypatch.setattr(print_queue, "imprimir_em_pool", pool)
+    monkeypatch.setattr(printing, "imprimir_etiqueta", etiqueta)
+    fila = FilaImpressao()
+    fila.enviar(JobImpressao(saida="lote", volumes=20, pool=["a", "b"]))
+    assert iniciado.wait(5)
+    fila.enviar(JobImpressao(saida="reimpressao", prioridade=PRIORIDADE_URGENTE))
+    urgente_na_fila.set()
+    assert fila.aguardar(5)
+    assert ordem == ["pool: 1 a 10", "etiqueta reimpressao", "pool: 11 a 20"]
+    fila.parar(5)
+
+
+def test_fila_descarta_job_duplicado():
+    from print_queue import FilaImpressao, JobImpressao
+
+    executados = []
+
+    def executor(job, progresso):
+        executados.append(job.id)
+        return True, None
+
+    fila = FilaImpressao(executor=executor)
+    primeiro = fila.enviar(JobImpressao(saida="1", volumes=2, acao="nova"))
+    assert fila.enviar(JobImpressao(saida="1", volumes=2, acao="nova")) is primeiro
+    outro = fila.enviar(JobImpressao(saida="1", volumes=3, acao="nova"))
+    assert outro is not primeiro
+    assert fila.aguardar(5)
+    assert executados == [primeiro.id, outro.id]
+
+    sem_janela = FilaImpressao(executor=executor, janela_coalescencia=0)
+    a = sem_janela.enviar(JobImpressao(saida="1"))
+    assert sem_janela.enviar(JobImpressao(saida="1")) is not a
+    assert sem_janela.aguardar(5)
+    fila.parar(5)
+    sem_janela.parar(5)
@@ -0,0 +1,210 @@
+import asyncio
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+
+async def _http(porta, metodo, caminho, dados=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", porta)
+    corpo = json.dumps(dados).encode() if dados is not None else b""
+    writer.write(
+        f"{metodo} {caminho} HTTP/1.1\r\nContent-Length: {len(corpo)}\r\n\r\n".encode()
+        + corpo
+    )
+    await writer.drain()
+    resposta = await reader.read()
+    writer.close()
+    cabecalho, _, corpo = resposta.partition(b"\r\n\r\n")
+    return int(cabecalho.split()[1]), json.loads(corpo)
+
+
+def test_servidor_fila_e_status(monkeypatch, tmp_path):
+    import persistence
+    import printing
+    from print_server import ServidorImpressao
+    from transport import TransporteMemoria
+
+    monkeypatch.setattr(
+        persistence, "recurso_caminho", lambda p: os.path.join(tmp_path, p)
+    )
+    monkeypatch.setattr(
+        printing, "melhorar_logo", lambda p, largura_desejada=240: (b"A", 1, 1)
+    )
+    monkeypatch.setattr(printing, "recurso_caminho", lambda p: "fake")
+    memoria = TransporteMemoria("servidor")
+    item = {"saida": "1", "categoria": "C", "emissor": "E", "municipio": "M"}
+
+    async def cenario():
+        servidor = ServidorImpressao({"transporte": memoria}, porta=0, tamanho_fila=2)
+        await servidor.iniciar()
+        porta = servidor.porta
+        try:
+            status, job = await _http(porta, "POST", "/jobs", {**item, "volumes": 2})
+            assert status == 202 and job["status"] == "queued"
+            status, varios = await _http(
+                porta,
+                "POST",
+                "/jobs",
+                {
+                    "itens": [
+                        {**item, "volumes": 1},
+                        {**item, "saida": "2", "volumes": 3},
+                    ]
+                },
+            )
+            assert status == 202
+
+            status, erro = await _http(porta, "POST", "/jobs", {**item, "volumes": 0})
+            assert status == 400 and "volumes" in erro["erro"]
+            assert (await _http(porta, "GET", "/jobs/999"))[0] == 404
+
+            for _ in range(200):
+                _, estado = await _http(porta, "GET", f"/jobs/{varios['id']}")
+                if estado["status"] == "done":
+                    break
+                await asyncio.sleep(0.01)
+            assert estado["status"] == "done" and estado["enviadas"] == 4
+            _, primeiro = await _http(porta, "GET", f"/jobs/{job['id']}")
+            assert primeiro["status"] == "done"
+        finally:
+            await servidor.parar()
+
+    asyncio.run(cenario())
+    assert len(memoria.jobs) == 2
+    assert persistence.carregar_contagem()[0] == 6
+    assert persistence.carregar_ultima_impressao()["saida"] == "2"
+
+
+def test_servidor_recusa_com_fila_cheia(monkeypatch, tmp_path):
+    import persistence
+    from print_server import FilaCheia, ServidorImpressao
+
+    monkeypatch.setattr(
+        persistence, "recurso_caminho", lambda p: os.path.join(tmp_path, p)
+    )
+
+    item = {"saida": "1", "categoria": "C", "emissor": "E", "municipio": "M"}
+
+    async def cenario():
+        servidor = ServidorImpressao(porta=0, tamanho_fila=1)
+        await servidor.iniciar()
+        try:
+            # o escritor ainda não retirou o primeiro job da fila
+            servidor.enviar([{**item, "volumes": 1}])
+            try:
+                servidor.enviar([{**item, "volumes": 1}])
+            except FilaCheia:
+                return True
+            return False
+        finally:
+            for job in servidor.jobs.values():
+                job.cancelamento.set()
+            await servidor.parar()
+
+    assert asyncio.run(cenario())
+
+
+def test_servidor_separa_erro_de_registro_e_recupera_checkpoint(monkeypatch, tmp_path):
+    import persistence
+    import print_server
+    import printing
+    from print_server import ServidorImpressao
+    from transport import TransporteMemoria
+
+    monkeypatch.setattr(
+        persistence, "recurso_caminho", lambda p: os.path.join(tmp_path, p)
+    )
+    monkeypatch.setattr(
+        printing, "melhorar_logo", lambda p, largura_desejada=240: (b"A", 1, 1)
+    )
+    monkeypatch.setattr(printing, "recurso_caminho", lambda p: "fake")
+    registrar = print_server.registrar_enviadas
+
+    def falhar(*args):
+        raise OSError("disco cheio")
+
+    monkeypatch.setattr(print_server, "registrar_enviadas", falhar)
+    memoria = TransporteMemoria("servidor")
+    item = {"saida": "7", "categoria": "C", "emissor": "E", "municipio": "M"}
+
+    async def cenario():
+        servidor = ServidorImpressao({"transporte": memoria}, porta=0)
+        await servidor.iniciar()
+        try:
+            job = servidor.enviar([{**item, "volumes": 3}])
+            for _ in range(200):
+                if job.finalizado:
+                    break
+                await asyncio.sleep(0.01)
+            return job.resumo()
+        finally:
+            await servidor.parar()
+
+    resumo = asyncio.run(cenario())
+    # as etiquetas saíram: só o registro falhou
+    assert resumo["status"] == "done" and resumo["erro"] is None
+    assert resumo["erro_registro"] == "disco cheio"
+    # o checkpoint da interface não é tocado pelo servidor
+    assert persistence.carregar_checkpoint() is None
+    checkpoint = persistence.carregar_checkpoint(persistence.CHECKPOINT_SERVIDOR)
+    assert checkpoint["enviadas"] == 3
+
+    monkeypatch.setattr(print_server, "registrar_enviadas", registrar)
+
+    async def reiniciar():
+        servidor = ServidorImpressao({"transporte": memoria}, porta=0)
+        await servidor.iniciar()
+        try:
+            recuperadas = persistence.carregar_contagem()[0]
+            job = servidor.enviar([{**item, "volumes": 1}])
+            # a interface na mesma máquina tem um job com o mesmo número
+            persistence.salvar_checkpoint({"job": job.id, "saida": "interface"})
+            for _ in range(200):
+                if job.finalizado:
+                    break
+                await asyncio.sleep(0.01)
+            return recuperadas
+        finally:
+            await servidor.parar()
+
+    assert asyncio.run(reiniciar()) == 3
+    assert persistence.carregar_contagem()[0] == 4
+    assert persistence.carregar_checkpoint(persistence.CHECKPOINT_SERVIDOR) is None
+    assert persistence.carregar_checkpoint()["saida"] == "interface"
+
+
+def test_servidor_limita_leitura_da_requisicao(monkeypatch, tmp_path):
+    import persistence
+    import print_server
+    from print_server import ServidorImpressao
+
+    monkeypatch.setattr(
+        persistence, "recurso_caminho", lambda p: os.path.join(tmp_path, p)
+    )
+    monkeypatch.setattr(print_server, "TEMPO_LEITURA", 0.2)
+
+    async def bruta(porta, dados):
+        reader, writer = await asyncio.open_connection("127.0.0.1", porta)
+        writer.write(dados)
+        await writer.drain()
+        resposta = await reader.read()
+        writer.close()
+        return int(resposta.split()[1])
+
+    async def cenario():
+        servidor = ServidorImpressao(porta=0)
+        await servidor.iniciar()
+        try:
+            # cliente que para no meio dos cabeçalhos
+            lento = await bruta(servidor.porta, b"GET /jobs HTTP/1.1\r\nHost: x")
+            cabecalhos = b"".join(b"X-%d: 1\r\n" % i for i in range(101))
+            demais = await bruta(
+                servidor.porta, b"GET /jobs HTTP/1.1\r\n" + cabecalhos + b"\r\n"
+            )
+            return lento, demais
+        finally:
+            await servidor.parar()
+
+    assert asyncio.run(cenario()) == (408, 431)
@@ -0,0 +1,129 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+
+class Quebrada:
+    """Transporte que falha depois de aceitar ``limite`` jobs."""
+
+    def __init__(self, nome, limite):
+        self.nome = nome
+        self.limite = limite
+        self.jobs = []
+        self._atual = bytearray()
+
+    def iniciar_job(self, titulo):
+        if self.limite == 0:
+            raise OSError("offline")
+        self.limite -= 1
+        self._atual = bytearray()
+
+    def escrever(self, dados):
+        self._atual += dados
+
+    def finalizar_job(self):
+        self.jobs.append(bytes(self._atual))
+
+    def abortar_job(self):
+        if self._atual:
+            self.jobs.append(bytes(self._atual))
+        self._atual = bytearray()
+
+
+def _numeros(jobs):
+    texto = b"".join(jobs).decode("latin1")
+    return sorted(n for n in range(1, 21) if f'"{n} DE 20"' in texto)
+
+
+def test_dividir_lote():
+    from printer_pool import dividir_lote
+
+    assert dividir_lote(1, 10, 3) == [(1, 4), (5, 3), (8, 3)]
+    assert dividir_lote(6, 2, 4) == [(6, 1), (7, 1)]
+
+
+def test_faixas_faltantes():
+    from printer_pool import faixas_faltantes
+
+    assert faixas_faltantes(1, 20, [(11, 13), (1, 10)]) == [(14, 20)]
+    assert faixas_faltantes(1, 20, [(1, 2), (11, 13)]) == [(3, 10), (14, 20)]
+    assert faixas_faltantes(1, 5, []) == [(1, 5)]
+    assert faixas_faltantes(1, 5, [(1, 5)]) == []
+
+
+def test_pool_divide_e_redistribui_em_falha(monkeypatch):
+    import printing
+    from printer_pool import imprimir_em_pool
+    from transport import TransporteMemoria
+
+    monkeypatch.setattr(
+        printing, "melhorar_logo", lambda p, largura_desejada=240: (b"A", 1, 1)
+    )
+    monkeypatch.setattr(printing, "recurso_caminho", lambda p: "fake")
+    argumentos = ("S", "C", "E", "M", 20, "2024-01-01")
+
+    a, b = TransporteMemoria("a"), TransporteMemoria("b")
+    progresso = []
+    ok, erro = imprimir_em_pool(
+        *argumentos, transportes=[a, b], progresso=lambda n, t: progresso.append(n)
+    )
+    assert ok and erro is None
+    assert _numeros(a.jobs) == list(range(1, 11))
+    assert _numeros(b.jobs) == list(range(11, 21))
+    assert max(progresso) == 20
+
+    # "b" cai após 3 etiquetas; o restante da sua faixa vai para "a"
+    a = TransporteMemoria("a")
+    quebrada = Quebrada("b", limite=3)
+    ok, erro = imprimir_em_pool(
+        *argumentos, transportes=[a, quebrada], etiquetas_por_documento=1
+    )
+    assert ok and erro is None
+    assert _numeros(quebrada.jobs) == [11, 12, 13]
+    assert _numeros(a.jobs) == list(range(1, 11)) + list(range(14, 21))
+
+    # sem impressora restante, informa as faixas enviadas
+    ok, erro = imprimir_em_pool(
+        *argumentos,
+        transportes=[Quebrada("x", limite=2), Quebrada("y", limite=0)],
+        etiquetas_por_documento=1,
+    )
+    assert not ok
+    assert erro["impressas"] == [(1, 2)]
+
+
+def test_pool_informa_faixas_enviadas_por_documento(monkeypatch):
+    import printing
+    from printer_pool import faixas_faltantes, imprimir_em_pool
+    from transport import TransporteMemoria
+
+    monkeypatch.setattr(
+        printing, "melhorar_logo", lambda p, largura_desejada=240: (b"A", 1, 1)
+    )
+    monkeypatch.setattr(printing, "recurso_caminho", lambda p: "fake")
+    argumentos = ("S", "C", "E", "M", 20, "2024-01-01")
+
+    # "y" cai na segunda etiqueta e só "x" trabalha: as faixas enviadas
+    # ficam separadas, e a contagem não basta para achar as faltantes
+    documentos = []
+    ok, erro = imprimir_em_pool(
+        *argumentos,
+        transportes=[Quebrada("x", limite=2), Quebrada("y", limite=1)],
+        etiquetas_por_documento=1,
+        ao_concluir_documento=documentos.append,
+    )
+    assert not ok
+    assert erro["impressas"] == [(1, 2), (11, 11)]
+    assert documentos[-1] == [(1, 2), (11, 11)]
+    assert faixas_faltantes(1, 20, erro["impressas"]) == [(3, 10), (12, 20)]
+
+    # cada impressora começa pela própria faixa
+    a, b = TransporteMemoria("a"), TransporteMemoria("b")
+    for _ in range(5):
+        a.jobs.clear()
+        b.jobs.clear()
+        ok, _ = imprimir_em_pool(*argumentos, transportes=[a, b])
+        assert ok
+        assert _numeros(a.jobs) == list(range(1, 11))
+        assert _numeros(b.jobs) == list(range(11, 21))
@@ -1,5 +1,6 @@
 import os
 import sys
+import time
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
@@ -21,7 +22,8 @@ class FakeWin32:
         pass
 
     def WritePrinter(self, h, data):
-        self.written.append(data)
+        self.written.append(bytes(data))
+        return len(data)
 
     def EndPagePrinter(self, h):
         pass
@@ -71,8 +73,9 @@ def test_reimpressao_faltantes(monkeypatch):
         total_exibicao=total,
     )
 
-    assert len(fake.written) == faltantes
+    assert len(fake.written) == 1
     textos = [data.decode("latin1") for data in fake.written]
+    assert textos[0].count("PRINT 1") == faltantes
     assert any("8 DE 10" in t for t in textos)
     assert any("9 DE 10" in t for t in textos)
     assert any("10 DE 10" in t for t in textos)
@@ -106,8 +109,9 @@ def test_reimpressao_intervalo(monkeypatch):
         total_exibicao=total,
     )
 
-    assert len(fake_win32.written) == volumes
+    assert len(fake_win32.written) == 1
     textos = [data.decode("latin1") for data in fake_win32.written]
+    assert textos[0].count("PRINT 1") == volumes
     assert any("5 DE 10" in t for t in textos)
     assert any("8 DE 10" in t for t in textos)
     assert all("4 DE 10" not in t for t in textos)
@@ -130,12 +134,10 @@ def test_imprimir_pagina_teste(monkeypatch):
     assert len(fake_win32.written) == 1
     texto = fake_win32.written[0].decode("latin1")
     assert "1 DE 1" in texto
-    dots_y = printing.ALTURA_ETIQUETA_MM * printing.DOTS_MM
-    ruler_start = printing.LAYOUT_ATUAL["titulo"]["x"]
-    ruler_len = min(
-        50 * printing.DOTS_MM,
-        printing.LARGURA_ETIQUETA_MM * printing.DOTS_MM - ruler_start,
-    )
+    tpl = printing.obter_template()
+    dots_y = tpl.dots_y
+    ruler_start = tpl.layout["titulo"]["x"]
+    ruler_len = min(50 * printing.DOTS_MM, tpl.dots_x - ruler_start)
     ruler_len -= ruler_len % (10 * printing.DOTS_MM)
     expected = f"BAR {ruler_start},{dots_y - 40},{ruler_len},4"
     assert expected in texto
@@ -189,8 +191,8 @@ def test_panoramico_coordenadas(monkeypatch):
     printing.imprimir_etiqueta("S", "C", "E", "M", 1, "2024-01-01")
     texto = fake_win32.written[-1].decode("latin1")
     assert "SIZE 100 mm,30 mm" in texto
-    max_x = printing.LARGURA_ETIQUETA_MM * printing.DOTS_MM
-    max_y = printing.ALTURA_ETIQUETA_MM * printing.DOTS_MM
+    max_x = printing.obter_template().dots_x
+    max_y = printing.obter_template().dots_y
     for linha in texto.splitlines():
         m = re.match(r"TEXT (\d+),(\d+)", linha)
         if m:
@@ -222,12 +224,10 @@ def test_panoramico_pagina_teste(monkeypatch):
     texto = fake_win32.written[-1].decode("latin1")
     assert "SIZE 100 mm,30 mm" in texto
     assert ",15,120,0," in texto
-    dots_y = printing.ALTURA_ETIQUETA_MM * printing.DOTS_MM
-    ruler_start = printing.LAYOUT_ATUAL["titulo"]["x"]
-    ruler_len = min(
-        50 * printing.DOTS_MM,
-        printing.LARGURA_ETIQUETA_MM * printing.DOTS_MM - ruler_start,
-    )
+    tpl = printing.obter_template()
+    dots_y = tpl.dots_y
+    ruler_start = tpl.layout["titulo"]["x"]
+    ruler_len = min(50 * printing.DOTS_MM, tpl.dots_x - ruler_start)
     ruler_len -= ruler_len % (10 * printing.DOTS_MM)
     expected = f"BAR {ruler_start},{dots_y - 40},{ruler_len},4"
     assert expected in texto
@@ -256,7 +256,7 @@ def test_retry_exponencial_logging(monkeypatch, caplog):
             pass
 
         def WritePrinter(self, h, data):
-            pass
+            return len(data)
 
         def EndPagePrinter(self, h):
             pass
@@ -268,7 +268,9 @@ def test_retry_exponencial_logging(monkeypatch, caplog):
             pass
 
     fake = FailingWin32()
-    monkeypatch.setattr(printing, "win32print", fake)
+    monkeypatch.setattr(
+        printing, "_resolvedor", printing.ResolvedorImpressora(api=fake)
+    )
     monkeypatch.setattr(
         printing, "melhorar_logo", lambda p, largura_desejada=240: (b"A", 1, 1)
     )
@@ -284,3 +286,465 @@ def test_retry_exponencial_logging(monkeypatch, caplog):
     assert fake.calls == 3
     tentativas = [r for r in caplog.records if "Tentativa" in r.message]
     assert len(tentativas) == 3
+
+    # as três falhas seguidas abriram o disjuntor da impressora
+    import resilience
+
+    ok, erro = printing.imprimir_etiqueta("S", "C", "E", "M", 1, "2024-01-01")
+    assert erro["code"] == resilience.CODIGO_CIRCUITO_ABERTO
+    assert fake.calls == 3
+    resilience.esquecer_disjuntores()
+
+
+def test_logo_residente_enviada_uma_vez(monkeypatch):
+    import printing
+
+    fake_win32.written.clear()
+    printing.esquecer_residentes()
+    monkeypatch.setattr(
+        printing, "melhorar_logo", lambda p, largura_desejada=240: (b"\xff" * 30, 30, 1)
+    )
+    monkeypatch.setattr(printing, "recurso_caminho", lambda p: "fake")
+
+    ok, _ = printing.imprimir_etiqueta(
+        "S", "C", "E", "M", 3, "2024-01-01", logo_residente=True
+    )
+    assert ok
+    texto = b"".join(fake_win32.written).decode("latin1")
+    assert texto.count("DOWNLOAD") == 1
+    assert texto.startswith('DOWNLOAD "L')
+    assert texto.count("PUTBMP") == 3
+    assert "BITMAP" not in texto
+
+    fake_win32.written.clear()
+    printing.imprimir_etiqueta("S", "C", "E", "M", 2, "2024-01-01", logo_residente=True)
+    assert all(b"DOWNLOAD" not in data for data in fake_win32.written)
+
+    printing.esquecer_residentes("dummy")
+    fake_win32.written.clear()
+    printing.imprimir_etiqueta("S", "C", "E", "M", 1, "2024-01-01", logo_residente=True)
+    assert fake_win32.written[0].startswith(b"DOWNLOAD")
+
+
+def test_modo_formulario_envia_apenas_variaveis(monkeypatch):
+    import printing
+
+    fake_win32.written.clear()
+    printing.esquecer_residentes()
+    monkeypatch.setattr(
+        printing, "melhorar_logo", lambda p, largura_desejada=240: (b"\xff" * 30, 30, 1)
+    )
+    monkeypatch.setattr(printing, "recurso_caminho", lambda p: "fake")
+
+    ok, _ = printing.imprimir_etiqueta(
+        "S1", "Cat", "Emi", "Mun", 3, "2024-01-01", modo="formulario"
+    )
+    assert ok
+    assert len(fake_win32.written) == 1
+    texto = fake_win32.written[0].decode("latin1")
+    preparacao, etiquetas = texto.split("EOP\n")
+    assert 'DOWNLOAD "L' in preparacao
+    assert ".BAS" in preparacao
+    assert 'SAI$="Saida: S1"' in etiquetas
+    assert etiquetas.count("RUN") == 3
+    assert 'NUM$="2 DE 3"' in etiquetas
+    assert "TEXT" not in etiquetas and "SIZE" not in etiquetas
+
+    # mesmo layout: formulário não é regravado
+    fake_win32.written.clear()
+    printing.imprimir_etiqueta("S2", "C", "E", "M", 1, "2024-01-01", modo="formulario")
+    assert b"DOWNLOAD" not in fake_win32.written[0]
+
+    # outro layout gera nova versão do formulário
+    printing.aplicar_template("Compacto")
+    fake_win32.written.clear()
+    printing.imprimir_etiqueta("S2", "C", "E", "M", 1, "2024-01-01", modo="formulario")
+    assert b'DOWNLOAD "F' in fake_win32.written[0]
+    printing.aplicar_template("Padrão")
+
+
+def test_modo_contador_um_bloco(monkeypatch):
+    import printing
+
+    fake_win32.written.clear()
+    monkeypatch.setattr(
+        printing, "melhorar_logo", lambda p, largura_desejada=240: (b"A", 1, 1)
+    )
+    monkeypatch.setattr(printing, "recurso_caminho", lambda p: "fake")
+
+    ok, _ = printing.imprimir_etiqueta(
+        "S1",
+        "Cat",
+        "Emissor",
+        "Mun",
+        4,
+        "2024-01-01",
+        inicio_indice=7,
+        total_exibicao=10,
+        modo="contador",
+    )
+
+    assert ok
+    assert len(fake_win32.written) == 1
+    texto = fake_win32.written[0].decode("latin1")
+    assert texto.count("SIZE") == 1
+    assert '@1="7"' in texto
+    assert '@1+" DE 10"' in texto
+    assert texto.endswith("PRINT 4,1\n")
+
+
+def test_nova_tentativa_reenvia_etiquetas(monkeypatch):
+    import printing
+
+    class FalhaNaPrimeiraEtiqueta(FakeWin32):
+        def __init__(self):
+            super().__init__()
+            self.falhas = 1
+
+        def WritePrinter(self, h, data):
+            if self.falhas and b"PRINT" in bytes(data):
+                self.falhas -= 1
+                raise RuntimeError("boom")
+            return super().WritePrinter(h, data)
+
+    fake = FalhaNaPrimeiraEtiqueta()
+    monkeypatch.setattr(
+        printing, "_resolvedor", printing.ResolvedorImpressora(api=fake)
+    )
+    monkeypatch.setattr(
+        printing, "melhorar_logo", lambda p, largura_desejada=240: (b"A", 1, 1)
+    )
+    monkeypatch.setattr(printing, "recurso_caminho", lambda p: "fake")
+    monkeypatch.setattr(printing.time, "sleep", lambda s: None)
+
+    ok, _ = printing.imprimir_etiqueta(
+        "S", "C", "E", "M", 2, "2024-01-01", 0, 0, repetir_em_falha=True
+    )
+
+    assert ok
+    assert sum(b.count(b"PRINT 1\n") for b in fake.written) == 2
+
+
+def test_job_em_escritas_de_tamanho_configuravel(monkeypatch):
+    import printing
+
+    fake_win32.written.clear()
+    monkeypatch.setattr(
+        printing, "melhorar_logo", lambda p, largura_desejada=240: (b"Z" * 100, 10, 10)
+    )
+    monkeypatch.setattr(printing, "recurso_caminho", lambda p: "fake")
+
+    printing.imprimir_etiqueta("S", "C", "E", "M", 50, "2024-01-01")
+    completo = fake_win32.written[0]
+    assert len(fake_win32.written) == 1
+    assert completo.count(b"Z" * 100) == 50
+
+    # em documentos de 10 etiquetas: uma escrita por documento
+    fake_win32.written.clear()
+    printing.imprimir_etiqueta(
+        "S", "C", "E", "M", 50, "2024-01-01", etiquetas_por_documento=10
+    )
+    assert len(fake_win32.written) == 5
+    assert all(data.count(b"PRINT 1\n") == 10 for data in fake_win32.written)
+
+    fake_win32.written.clear()
+    printing.imprimir_etiqueta(
+        "S", "C", "E", "M", 50, "2024-01-01", tamanho_escrita=1200
+    )
+    assert len(fake_win32.written) > 1
+    assert all(len(data) <= 1200 for data in fake_win32.written)
+    # cortes sempre entre etiquetas
+    assert all(data.endswith(b"PRINT 1\n") for data in fake_win32.written)
+    assert b"".join(fake_win32.written) == completo
+
+
+def test_retry_retoma_da_primeira_etiqueta_nao_enviada(monkeypatch):
+    import printing
+    from transport import TransporteMemoria
+
+    class FalhaNaTerceiraEscrita(TransporteMemoria):
+        escritas = 0
+
+        def escrever(self, dados):
+            FalhaNaTerceiraEscrita.escritas += 1
+            if FalhaNaTerceiraEscrita.escritas == 3:
+                raise OSError("cabo desconectado")
+            super().escrever(dados)
+
+    monkeypatch.setattr(
+        printing, "melhorar_logo", lambda p, largura_desejada=240: (b"A", 1, 1)
+    )
+    monkeypatch.setattr(printing, "recurso_caminho", lambda p: "fake")
+    monkeypatch.setattr(printing.time, "sleep", lambda s: None)
+    argumentos = ("S", "C", "E", "M", 5, "2024-01-01")
+    referencia = TransporteMemoria()
+    printing.imprimir_etiqueta(
+        *argumentos, inicio_indice=6, total_exibicao=10, transporte=referencia
+    )
+    uma_etiqueta = len(referencia.jobs[0]) // 5 + 1  # uma escrita por etiqueta
+    transporte = FalhaNaTerceiraEscrita()
+    progresso = []
+
+    ok, erro = printing.imprimir_etiqueta(
+        *argumentos,
+        inicio_indice=6,
+        total_exibicao=10,
+        repetir_em_falha=True,
+        tamanho_escrita=uma_etiqueta,
+        transporte=transporte,
+        progresso=lambda n, t: progresso.append(n),
+    )
+
+    assert ok and erro is None
+    texto = b"".join(transporte.jobs).decode("latin1")
+    for numero in range(6, 11):
+        assert texto.count(f'"{numero} DE 10"') == 1
+    assert len(transporte.jobs) == 2
+    assert b'"8 DE 10"' in transporte.jobs[1]
+    assert progresso == [1, 2, 3, 4, 5]
+
+    # sem nova tentativa a falha informa exatamente o que foi enviado
+    FalhaNaTerceiraEscrita.escritas = 0
+    ok, erro = printing.imprimir_etiqueta(
+        *argumentos,
+        inicio_indice=6,
+        total_exibicao=10,
+        tamanho_escrita=uma_etiqueta,
+        transporte=FalhaNaTerceiraEscrita(),
+    )
+    assert not ok
+    assert erro["impressas"] == [(6, 7)]
+
+
+def test_lote_em_documentos_com_checkpoint(monkeypatch):
+    import printing
+    from transport import TransporteMemoria
+
+    printing.esquecer_residentes()
+    monkeypatch.setattr(
+        printing, "melhorar_logo", lambda p, largura_desejada=240: (b"\xff" * 30, 30, 1)
+    )
+    monkeypatch.setattr(printing, "recurso_caminho", lambda p: "fake")
+    transporte = TransporteMemoria()
+    documentos = []
+
+    ok, _ = printing.imprimir_etiqueta(
+        "S",
+        "C",
+        "E",
+        "M",
+        10,
+        "2024-01-01",
+        logo_residente=True,
+        transporte=transporte,
+        etiquetas_por_documento=4,
+        ao_concluir_documento=documentos.append,
+    )
+
+    assert ok
+    assert documentos == [4, 8, 10]
+    assert len(transporte.jobs) == 3
+    assert [job.count(b"PRINT 1") for job in transporte.jobs] == [4, 4, 2]
+    assert b"DOWNLOAD" in transporte.jobs[0]
+    assert all(b"DOWNLOAD" not in job for job in transporte.jobs[1:])
+    assert b'"9 DE 10"' in transporte.jobs[2]
+
+
+def test_resolvedor_impressora_cache(monkeypatch):
+    import printing
+
+    sondagens = []
+
+    def sondar(api=None):
+        sondagens.append(1)
+        return "dummy"
+
+    monkeypatch.setattr(printing, "_sondar_impressora", sondar)
+    monkeypatch.setattr(printing, "carregar_config", lambda: {"transporte": ""})
+    resolvedor = printing.ResolvedorImpressora(ttl=60)
+
+    transporte = resolvedor.transporte()
+    assert transporte is not None and transporte.nome == "dummy"
+    assert resolvedor.transporte() is transporte
+    assert len(sondagens) == 1
+
+    # expirado: devolve o atual e atualiza em segundo plano, mantendo o handle
+    resolvedor._validade = 0
+    assert resolvedor.transporte() is transporte
+    for _ in range(100):
+        if not resolvedor._atualizando:
+            break
+        time.sleep(0.01)
+    assert len(sondagens) == 2
+    assert resolvedor.transporte() is transporte
+
+    resolvedor.invalidar()
+    assert resolvedor.transporte() is not transporte
+    assert len(sondagens) == 3
+
+
+def test_estado_da_impressora_antes_do_envio(monkeypatch):
+    import printing
+    from printer_status import cache_status
+    from transport import TransporteMemoria
+
+    monkeypatch.setattr(
+        printing, "melhorar_logo", lambda p, largura_desejada=240: (b"A", 1, 1)
+    )
+    monkeypatch.setattr(printing, "recurso_caminho", lambda p: "fake")
+    monkeypatch.setattr(printing.time, "sleep", lambda s: None)
+    cache_status.esquecer()
+
+    # imprimindo: recebe o job sem esperar
+    imprimindo = TransporteMemoria("imprimindo", respostas=[b"\x20"])
+    ok, _ = printing.imprimir_etiqueta(
+        "S", "C", "E", "M", 2, "2024-01-01", transporte=imprimindo
+    )
+    assert ok
+    assert imprimindo.consultas == 1
+
+    # pausada e depois pronta: aguarda e imprime
+    ocupada = TransporteMemoria("ocupada", respostas=[b"\x10", b"\x10", b"\x00"])
+    ok, _ = printing.imprimir_etiqueta(
+        "S", "C", "E", "M", 2, "2024-01-01", transporte=ocupada
+    )
+    assert ok
+    assert ocupada.consultas == 3
+    assert len(ocupada.jobs) == 1
+
+    # sem resposta ao comando: não é mais consultada
+    class Muda(TransporteMemoria):
+        def consultar(self, comando, tamanho=1):
+            self.consultas += 1
+            raise TimeoutError("sem resposta")
+
+    muda = Muda("muda")
+    for _ in range(2):
+        ok, _ = printing.imprimir_etiqueta(
+            "S", "C", "E", "M", 2, "2024-01-01", transporte=muda
+        )
+        assert ok
+    assert muda.consultas == 1
+    assert len(muda.jobs) == 2
+
+    # sem papel: falha imediata, sem novas tentativas nem envio
+    sem_papel = TransporteMemoria("sem-papel", respostas=[b"\x04"])
+    ok, erro = printing.imprimir_etiqueta(
+        "S", "C", "E", "M", 2, "2024-01-01", repetir_em_falha=True, transporte=sem_papel
+    )
+    assert not ok
+    assert "sem papel" in erro["message"]
+    assert erro["impressas"] == []
+    assert sem_papel.jobs == []
+    assert sem_papel.consultas == 1
+
+
+def test_template_explicito_por_job(monkeypatch):
+    import dataclasses
+
+    import pytest
+
+    import printing
+    from transport import TransporteMemoria
+
+    monkeypatch.setattr(
+        printing, "melhorar_logo", lambda p, largura_desejada=240: (b"A", 1, 1)
+    )
+    monkeypatch.setattr(printing, "recurso_caminho", lambda p: "fake")
+
+    compacto = printing.obter_template("Compacto")
+    assert printing.obter_template("Compacto") is compacto
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        compacto.gap_mm = 3  # type: ignore[misc]
+    # o layout é compartilhado pelo cache: nem ele nem seus campos mudam
+    with pytest.raises(TypeError):
+        compacto.layout["logo_y"] = 0  # type: ignore[index]
+    with pytest.raises(TypeError):
+        compacto.layout["saida"]["x"] = 0  # type: ignore[index]
+
+    memoria = TransporteMemoria("templates")
+    argumentos = ("S", "C", "E", "M", 1, "2024-01-01")
+    printing.imprimir_etiqueta(*argumentos, template=compacto, transporte=memoria)
+    printing.imprimir_etiqueta(*argumentos, template="Panoramico", transporte=memoria)
+    printing.imprimir_etiqueta(*argumentos, transporte=memoria)
+
+    assert b"SIZE 50 mm,60 mm" in memoria.jobs[0]
+    assert b"SIZE 100 mm,30 mm" in memoria.jobs[1]
+    assert b"SIZE 60 mm,80 mm" in memoria.jobs[2]
+
+
+def test_modelo_compilado_equivale_ao_texto():
+    import printing
+
+    tpl = printing.obter_template("Padrão")
+    campos = {
+        "saida": "Saida: 1",
+        "categoria": "Categoria: C",
+        "emissor": "Emissor: E",
+        "municipio": "Municipio: M",
+        "data": "Impresso em: 01/02/2024 10:00",
+    }
+    numeracao = printing._texto_layout("numeracao", "3 DE 9", tpl.layout)
+    esperado = tpl.cabecalho.decode() + printing._texto_layout(
+        "titulo", "CONIMS", tpl.layout
+    )
+    for chave, texto in campos.items():
+        esperado += printing._texto_layout(chave, texto, tpl.layout)
+    esperado += printing._texto_layout("fracao", "[ ] Fracao", tpl.layout)
+    esperado += printing._texto_layout("fragil", "[ ] Fragil", tpl.layout)
+    esperado += numeracao
+
+    valores = {chave: texto.encode() for chave, texto in campos.items()}
+    valores["numeracao"] = numeracao.encode()
+    assert tpl.modelo.preencher(valores) == esperado.encode()
+
+    antes, depois = tpl.modelo.dividir("numeracao", valores)
+    assert antes + numeracao.encode() + depois == esperado.encode()
+    assert numeracao.encode().startswith(tpl.abre_numeracao)
+
+
+def test_manifesto_em_um_unico_job(monkeypatch):
+    import printing
+    from transport import TransporteMemoria
+
+    monkeypatch.setattr(
+        printing, "melhorar_logo", lambda p, largura_desejada=240: (b"A", 1, 1)
+    )
+    monkeypatch.setattr(printing, "recurso_caminho", lambda p: "fake")
+    campos = ("saida", "categoria", "emissor", "municipio", "volumes")
+    itens = [
+        dict(zip(campos, ("1", "C", "E", "M", 2))),
+        dict(zip(campos, ("2", "D", "F", "N", 3))),
+    ]
+
+    separado = TransporteMemoria("separado")
+    for item in itens:
+        ok, _ = printing.imprimir_etiqueta(
+            item["saida"],
+            item["categoria"],
+            item["emissor"],
+            item["municipio"],
+            item["volumes"],
+            "2024-01-01",
+            transporte=separado,
+        )
+        assert ok
+
+    memoria = TransporteMemoria("manifesto")
+    progresso = []
+    ok, erro = printing.imprimir_manifesto(
+        itens,
+        "2024-01-01",
+        transporte=memoria,
+        progresso=lambda n, t: progresso.append((n, t)),
+    )
+    assert ok and erro is None
+    assert memoria.jobs == [b"".join(separado.jobs)]
+    assert progresso[-1] == (5, 5)
+
+    memoria = TransporteMemoria("documentos")
+    ok, _ = printing.imprimir_manifesto(
+        itens, "2024-01-01", transporte=memoria, etiquetas_por_documento=2
+    )
+    assert ok
+    assert len(memoria.jobs) == 3
@@ -0,0 +1,82 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from resilience import (  # noqa: E402
+    ABERTO,
+    FECHADO,
+    MEIO_ABERTO,
+    Disjuntor,
+    PoliticaRetentativa,
+)
+from transport import Transporte, TransporteMemoria  # noqa: E402
+
+
+def test_politica_retentativa():
+    politica = PoliticaRetentativa(atraso_inicial=0.5, fator=2, atraso_maximo=1.5)
+    assert [politica.atraso(n) for n in (1, 2, 3)] == [0.5, 1.0, 1.5]
+
+    com_jitter = PoliticaRetentativa(atraso_inicial=1, jitter=0.2)
+    assert all(0.8 <= com_jitter.atraso(1) <= 1.2 for _ in range(50))
+
+    config = PoliticaRetentativa.de_config({"tentativas": 5, "desconhecido": 1})
+    assert config.tentativas == 5
+
+
+def test_disjuntor_abre_sonda_e_fecha():
+    # o estado lido da impressora decide a sondagem: sem papel mantém aberto
+    transporte = TransporteMemoria("offline", respostas=[b"\x04"])
+    disjuntor = Disjuntor(transporte, falhas_para_abrir=2, tempo_aberto=0.05)
+
+    disjuntor.registrar_falha()
+    assert disjuntor.permitir()
+    disjuntor.registrar_falha()
+    assert disjuntor.estado == ABERTO
+    assert not disjuntor.permitir()
+
+    time.sleep(0.1)
+    assert disjuntor.estado == ABERTO
+    transporte.respostas = [b"\x00"]
+    for _ in range(100):
+        if disjuntor.estado == MEIO_ABERTO:
+            break
+        time.sleep(0.01)
+    assert disjuntor.estado == MEIO_ABERTO
+
+    # meio-aberto: um único job de teste por vez
+    assert disjuntor.permitir()
+    assert not disjuntor.permitir()
+    disjuntor.liberar_teste()  # o teste foi cancelado
+    assert disjuntor.permitir()
+
+    disjuntor.registrar_sucesso()
+    assert disjuntor.estado == FECHADO
+    assert disjuntor.permitir() and disjuntor.permitir()
+    disjuntor.cancelar_sondagem()
+
+
+def test_disjuntor_sonda_sem_leitura_de_estado():
+    class SemLeitura(Transporte):
+        nome = "sem-leitura"
+        disponivel = False
+
+        def escrever(self, dados):
+            pass
+
+        def sondar(self):
+            return self.disponivel
+
+    transporte = SemLeitura()
+    disjuntor = Disjuntor(transporte, falhas_para_abrir=1, tempo_aberto=0.05)
+    disjuntor.registrar_falha()
+    time.sleep(0.1)
+    assert disjuntor.estado == ABERTO
+    transporte.disponivel = True
+    for _ in range(100):
+        if disjuntor.estado == MEIO_ABERTO:
+            break
+        time.sleep(0.01)
+    assert disjuntor.estado == MEIO_ABERTO
+    disjuntor.cancelar_sondagem()
@@ -0,0 +1,240 @@
+import os
+import socket
+import sys
+import threading
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import transport
+
+
+def test_transporte_tcp_reutiliza_conexao():
+    srv = socket.socket()
+    srv.bind(("127.0.0.1", 0))
+    srv.listen()
+    recebido = bytearray()
+
+    def receber():
+        conn, _ = srv.accept()
+        with conn:
+            while dados := conn.recv(65536):
+                recebido.extend(dados)
+
+    servidor = threading.Thread(target=receber, daemon=True)
+    servidor.start()
+
+    tcp = transport.criar_transporte(f"tcp://127.0.0.1:{srv.getsockname()[1]}")
+    for dados in (b"JOB1\n", b"JOB2\n"):
+        tcp.iniciar_job("t")
+        tcp.escrever(dados)
+        tcp.finalizar_job()
+    tcp.fechar()
+    servidor.join(timeout=5)
+    srv.close()
+
+    assert tcp.conexoes == 1
+    assert bytes(recebido) == b"JOB1\nJOB2\n"
+
+
+def test_transporte_arquivo_e_memoria(tmp_path):
+    destino = tmp_path / "lp0"
+    arquivo = transport.criar_transporte(f"arquivo:{destino}")
+    for dados in (b"A", b"B"):
+        arquivo.iniciar_job("t")
+        arquivo.escrever(memoryview(dados))
+        arquivo.finalizar_job()
+    assert destino.read_bytes() == b"AB"
+
+    memoria = transport.obter_transporte("memoria")
+    assert transport.obter_transporte("memoria") is memoria
+    memoria.iniciar_job("t")
+    memoria.escrever(b"X")
+    memoria.abortar_job()
+    memoria.iniciar_job("t")
+    memoria.escrever(b"Y")
+    memoria.finalizar_job()
+    assert memoria.jobs == [b"X", b"Y"]
+    transport.fechar_transportes()
+
+
+def test_imprimir_etiqueta_com_transporte(monkeypatch):
+    import printing
+
+    monkeypatch.setattr(
+        printing, "melhorar_logo", lambda p, largura_desejada=240: (b"A", 1, 1)
+    )
+    monkeypatch.setattr(printing, "recurso_caminho", lambda p: "fake")
+    memoria = transport.TransporteMemoria()
+
+    ok, erro = printing.imprimir_etiqueta(
+        "S", "C", "E", "M", 2, "2024-01-01", transporte=memoria
+    )
+    assert ok and erro is None
+    assert len(memoria.jobs) == 1
+    assert b"2 DE 2" in memoria.jobs[0]
+
+    ok, _ = printing.imprimir_pagina_teste(transporte=memoria)
+    assert ok
+    assert b"BAR" in memoria.jobs[1]
+
+
+def test_transporte_tcp_reconecta_quando_impressora_fecha():
+    srv = socket.socket()
+    srv.bind(("127.0.0.1", 0))
+    srv.listen()
+    recebido = []
+    fechada = threading.Event()
+
+    def receber():
+        for _ in range(2):
+            conn, _ = srv.accept()
+            with conn:
+                recebido.append(conn.recv(65536))
+            fechada.set()
+
+    servidor = threading.Thread(target=receber, daemon=True)
+    servidor.start()
+
+    tcp = transport.criar_transporte(f"tcp://127.0.0.1:{srv.getsockname()[1]}")
+    tcp.iniciar_job("t")
+    tcp.escrever(b"JOB1")
+    tcp.finalizar_job()
+    assert fechada.wait(5)
+    tcp.iniciar_job("t")
+    tcp.escrever(b"JOB2")
+    tcp.finalizar_job()
+    servidor.join(timeout=5)
+    tcp.fechar()
+    srv.close()
+
+    assert tcp.conexoes == 2
+    assert recebido == [b"JOB1", b"JOB2"]
+
+
+def test_win32_repete_escrita_parcial():
+    class Spooler:
+        def __init__(self):
+            self.recebido = bytearray()
+
+        def WritePrinter(self, h, dados):
+            self.recebido += bytes(dados[:3])
+            return min(3, len(dados))
+
+    spooler = Spooler()
+    win32 = transport.TransporteWin32("zebra", api=spooler)
+    win32.escrever(b"ABCDEFGH")
+    assert bytes(spooler.recebido) == b"ABCDEFGH"
+
+    spooler.WritePrinter = lambda h, dados: 0
+    with pytest.raises(OSError):
+        win32.escrever(b"X")
+
+
+def test_validar_destino():
+    for valido in ("", "win32", "win32:Zebra", "tcp://10.0.0.5", "memoria"):
+        transport.validar_destino(valido)
+    for invalido in ("tcp://", "tcp://10.0.0.5:abc", "arquivo:", "tcp:/x"):
+        with pytest.raises(ValueError):
+            transport.validar_destino(invalido)
+    with pytest.raises(ValueError):
+        transport.validar_destino("win32", aceitar_padrao=False)
+
+
+def test_memoria_responde_pronta():
+    memoria = transport.TransporteMemoria()
+    assert memoria.consultar(b"\x1b!?") == b"\x00"
+    assert memoria.consultas == 1
+
+
+def test_win32_liberar_espera_o_fim_do_job():
+    class Spooler:
+        def __init__(self):
+            self.fechados = 0
+
+        def OpenPrinter(self, nome):
+            return object()
+
+        def StartDocPrinter(self, h, nivel, info):
+            pass
+
+        def StartPagePrinter(self, h):
+            pass
+
+        def WritePrinter(self, h, dados):
+            return len(dados)
+
+        def EndPagePrinter(self, h):
+            pass
+
+        def EndDocPrinter(self, h):
+            pass
+
+        def ClosePrinter(self, h):
+            self.fechados += 1
+
+    spooler = Spooler()
+    win32 = transport.TransporteWin32("zebra", api=spooler)
+    win32.iniciar_job("t")
+    win32.liberar()  # configurações salvas durante a impressão
+    win32.escrever(b"X")
+    assert spooler.fechados == 0
+    win32.finalizar_job()
+    assert spooler.fechados == 1
+
+    win32.iniciar_job("t")
+    win32.finalizar_job()
+    win32.liberar()
+    assert spooler.fechados == 2
+
+
+def test_transporte_tcp_mantem_conexao_sem_resposta_de_estado():
+    srv = socket.socket()
+    srv.bind(("127.0.0.1", 0))
+    srv.listen()
+    recebido = bytearray()
+
+    def receber():
+        conn, _ = srv.accept()
+        with conn:
+            while dados := conn.recv(65536):
+                recebido.extend(dados)
+
+    servidor = threading.Thread(target=receber, daemon=True)
+    servidor.start()
+
+    tcp = transport.TransporteTCP("127.0.0.1", srv.getsockname()[1], timeout=0.1)
+    with pytest.raises(TimeoutError):
+        tcp.consultar(b"\x1b!?")
+    tcp.iniciar_job("t")
+    tcp.escrever(b"JOB")
+    tcp.finalizar_job()
+    tcp.fechar()
+    servidor.join(timeout=5)
+    srv.close()
+
+    assert tcp.conexoes == 1
+    assert bytes(recebido) == b"\x1b!?JOB"
+
+
+def test_win32_sondar_usa_estado_do_spooler():
+    class Spooler:
+        info = {"Status": 0, "Attributes": 0}
+
+        def OpenPrinter(self, nome):
+            return object()
+
+        def GetPrinter(self, h, nivel):
+            return self.info
+
+        def ClosePrinter(self, h):
+            pass
+
+    spooler = Spooler()
+    win32 = transport.TransporteWin32("zebra", api=spooler)
+    assert win32.sondar()
+    spooler.info = {"Status": 0x80, "Attributes": 0}  # PRINTER_STATUS_OFFLINE
+    assert not win32.sondar()
+    spooler.info = {"Status": 0, "Attributes": 0x400}  # trabalhar offline
+    assert not win32.sondar()
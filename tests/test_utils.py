@@ -23,6 +23,88 @@ def test_melhorar_logo_shape(tmp_path):
     assert len(bitmap) == largura_bytes * altura
 
 
+def _empacotar_pixel_a_pixel(imagem, largura_em_bytes):
+    pixels = imagem.load()
+    dados = bytearray()
+    for y in range(imagem.height):
+        for x_byte in range(largura_em_bytes):
+            byte = 0
+            for b in range(8):
+                x = x_byte * 8 + b
+                if x < imagem.width and pixels[x, y] == 0:
+                    byte |= 1 << (7 - b)
+            dados.append(byte)
+    return bytes(dados)
+
+
+def test_empacotar_bitmap_identico_ao_loop():
+    import random
+
+    rnd = random.Random(42)
+    for largura in (1, 7, 8, 13, 120, 237, 240):
+        img = Image.new("L", (largura, 11))
+        img.putdata([rnd.randrange(256) for _ in range(largura * 11)])
+        img = img.convert("1")
+        for largura_bytes in {largura // 8, (largura + 7) // 8, largura // 8 + 2}:
+            assert utils.empacotar_bitmap(img, largura_bytes) == (
+                _empacotar_pixel_a_pixel(img, largura_bytes)
+            )
+
+
+def test_bitmap_para_bmp(tmp_path):
+    import io
+
+    img = Image.new("L", (12, 5), color=255)
+    img.putpixel((0, 0), 0)
+    img.putpixel((9, 4), 0)
+    img = img.convert("1")
+    bitmap = utils.empacotar_bitmap(img, 2)
+
+    bmp = Image.open(io.BytesIO(utils.bitmap_para_bmp(bitmap, 2, 5))).convert("L")
+    assert bmp.size == (16, 5)
+    assert bmp.getpixel((0, 0)) == 0
+    assert bmp.getpixel((9, 4)) == 0
+    assert bmp.getpixel((1, 0)) == 255
+    assert bmp.getpixel((15, 4)) == 255
+
+
+def test_logo_em_cache_memoria_disco_e_invalidacao(tmp_path, monkeypatch):
+    monkeypatch.setattr(utils, "_install_dir", lambda: str(tmp_path))
+    utils.limpar_cache_logo()
+    img_path = tmp_path / "logo.png"
+    Image.new("L", (16, 16), color=0).save(img_path)
+
+    chamadas = []
+
+    def gerar():
+        chamadas.append(1)
+        return utils.melhorar_logo(str(img_path), largura_desejada=16)
+
+    primeiro = utils.logo_em_cache(str(img_path), 16, gerar)
+    assert utils.logo_em_cache(str(img_path), 16, gerar) == primeiro
+    assert len(chamadas) == 1
+
+    # novo processo: memória vazia, mas o disco ainda tem o bitmap
+    utils.limpar_cache_logo()
+    assert utils.logo_em_cache(str(img_path), 16, gerar) == primeiro
+    assert len(chamadas) == 1
+    assert len(list((tmp_path / "_cache" / "logo").glob("*.bin"))) == 1
+
+    # alterar a imagem invalida a entrada
+    Image.new("L", (16, 16), color=255).save(img_path)
+    os.utime(img_path, ns=(1, 1))
+    novo = utils.logo_em_cache(str(img_path), 16, gerar)
+    assert len(chamadas) == 2
+    assert novo != primeiro
+
+    for largura in range(24, 24 + 8 * utils.LOGO_CACHE_DISCO_MAX, 8):
+        utils.logo_em_cache(str(img_path), largura)
+    arquivos = list((tmp_path / "_cache" / "logo").glob("*.bin"))
+    assert len(arquivos) == utils.LOGO_CACHE_DISCO_MAX
+    assert len(utils._logo_memoria) == utils.LOGO_CACHE_MEMORIA_MAX
+    utils.limpar_cache_logo()
+
+
 def test_backup_limite(tmp_path, monkeypatch, caplog):
     monkeypatch.setattr(utils, "_base_dir", lambda: str(tmp_path))
 
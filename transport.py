@@ -0,0 +1,409 @@
+"""Meios de envio dos jobs TSPL até a impressora.
+
+Cada transporte recebe bytes prontos e os entrega a um destino: spooler do
+Windows, socket TCP (porta 9100), arquivo/dispositivo local ou memória. O
+destino é configurado em ``settings.json`` pela chave ``transporte``:
+
+- ``""`` ou ``win32``: spooler do Windows (impressora padrão);
+- ``win32:NOME``: spooler do Windows na impressora ``NOME``;
+- ``tcp://host[:porta]``: socket RAW, conexão mantida entre jobs;
+- ``arquivo:caminho``: arquivo ou dispositivo local (ex.: ``/dev/usb/lp0``);
+- ``memoria``: captura em memória, útil para testes e benchmarks.
+"""
+
+import socket
+import threading
+from abc import ABC, abstractmethod
+from typing import Any
+
+PORTA_RAW_PADRAO = 9100
+
+# PRINTER_ATTRIBUTE_WORK_OFFLINE e os bits de PRINTER_STATUS_* (erro, papel
+# atolado ou em falta, offline, indisponível, intervenção, porta aberta) que
+# impedem a impressão
+WIN32_ATRIBUTO_OFFLINE = 0x400
+WIN32_STATUS_INDISPONIVEL = 0x2 | 0x8 | 0x10 | 0x80 | 0x1000 | 0x100000 | 0x400000
+
+
+class Transporte(ABC):
+    """Interface comum dos transportes de impressão."""
+
+    nome: str = ""
+
+    def iniciar_job(self, titulo: str) -> None:
+        """Prepara o envio de um novo job."""
+
+    @abstractmethod
+    def escrever(self, dados: bytes | memoryview) -> None:
+        """Envia um bloco de dados do job atual."""
+
+    def finalizar_job(self) -> None:
+        """Conclui o job atual."""
+
+    def abortar_job(self) -> None:
+        """Encerra o job atual após uma falha.
+
+        O que já foi escrito deve seguir para a impressora, pois as novas
+        tentativas retomam apenas as etiquetas que não foram enviadas.
+        """
+
+    def fechar(self) -> None:
+        """Encerra conexões mantidas entre jobs."""
+
+    def sondar(self) -> bool:
+        """Verificação barata de que o destino está acessível."""
+
+        return True
+
+
+class TransporteBidirecional(Transporte):
+    """Transporte que também lê respostas da impressora."""
+
+    @abstractmethod
+    def consultar(self, comando: bytes, tamanho: int = 1) -> bytes:
+        """Envia um comando imediato e lê até ``tamanho`` bytes de resposta."""
+
+
+class TransporteWin32(Transporte):
+    """Envio RAW pelo spooler do Windows (``win32print``).
+
+    O handle da impressora é aberto no primeiro job e mantido entre os
+    seguintes; só é fechado após uma falha, em :meth:`fechar` ou, sem
+    interromper o job em andamento, em :meth:`liberar`.
+    """
+
+    def __init__(self, impressora: str, api: Any = None) -> None:
+        if api is None:
+            import win32print as api
+        self.nome = impressora
+        self._api = api
+        self._handle: Any = None
+        self._lock = threading.Lock()
+        self._em_job = False
+        self._fechar_ao_terminar = False
+
+    def iniciar_job(self, titulo: str) -> None:
+        with self._lock:
+            self._em_job = True
+            if self._handle is None:
+                self._handle = self._api.OpenPrinter(self.nome)
+        self._api.StartDocPrinter(self._handle, 1, (titulo, None, "RAW"))
+        self._api.StartPagePrinter(self._handle)
+
+    def escrever(self, dados: bytes | memoryview) -> None:
+        restante = memoryview(dados)
+        while restante:
+            # o spooler pode aceitar só parte do buffer
+            escritos = self._api.WritePrinter(self._handle, restante)
+            if not escritos:
+                raise OSError(f"{self.nome} não aceitou os dados enviados")
+            restante = restante[escritos:]
+
+    def finalizar_job(self) -> None:
+        try:
+            self._api.EndPagePrinter(self._handle)
+            self._api.EndDocPrinter(self._handle)
+        finally:
+            self._terminar_job()
+
+    def abortar_job(self) -> None:
+        if self._handle is None:
+            self._terminar_job()
+            return
+        # encerra o documento para que as etiquetas já enviadas sejam impressas
+        for etapa in (
+            self._api.EndPagePrinter,
+            self._api.EndDocPrinter,
+            self._api.ClosePrinter,
+        ):
+            try:
+                etapa(self._handle)
+            except Exception:
+                pass
+        self._handle = None
+        self._terminar_job()
+
+    def _terminar_job(self) -> None:
+        with self._lock:
+            self._em_job = False
+            fechar, self._fechar_ao_terminar = self._fechar_ao_terminar, False
+        if fechar:
+            self.fechar()
+
+    def liberar(self) -> None:
+        """Fecha o handle agora ou, com um job em andamento, ao fim dele."""
+
+        with self._lock:
+            if self._em_job:
+                self._fechar_ao_terminar = True
+                return
+            self._fechar_handle()
+
+    def sondar(self) -> bool:
+        # OpenPrinter funciona mesmo com a impressora desligada; o estado
+        # mantido pelo spooler (PRINTER_INFO_2) indica se ela está offline
+        try:
+            handle = self._api.OpenPrinter(self.nome)
+            try:
+                info = self._api.GetPrinter(handle, 2)
+            finally:
+                self._api.ClosePrinter(handle)
+        except Exception:
+            return False
+        if info.get("Attributes", 0) & WIN32_ATRIBUTO_OFFLINE:
+            return False
+        return not info.get("Status", 0) & WIN32_STATUS_INDISPONIVEL
+
+    def fechar(self) -> None:
+        with self._lock:
+            self._fechar_handle()
+
+    def _fechar_handle(self) -> None:
+        if self._handle is not None:
+            try:
+                self._api.ClosePrinter(self._handle)
+            except Exception:
+                pass
+            self._handle = None
+
+
+class TransporteTCP(TransporteBidirecional):
+    """Envio RAW por socket TCP, reaproveitando a conexão entre jobs."""
+
+    def __init__(
+        self, host: str, porta: int = PORTA_RAW_PADRAO, timeout: float = 5.0
+    ) -> None:
+        self.nome = f"tcp://{host}:{porta}"
+        self.host = host
+        self.porta = porta
+        self.timeout = timeout
+        self._sock: socket.socket | None = None
+        self.conexoes = 0  # quantidade de conexões abertas (diagnóstico)
+
+    def _conectar(self) -> socket.socket:
+        if self._sock is None:
+            self._sock = socket.create_connection(
+                (self.host, self.porta), timeout=self.timeout
+            )
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.conexoes += 1
+        return self._sock
+
+    def _descartar_se_fechada(self) -> None:
+        """Fecha a conexão mantida se a impressora já a encerrou."""
+
+        if self._sock is None:
+            return
+        try:
+            self._sock.setblocking(False)
+            try:
+                ativa = bool(self._sock.recv(1, socket.MSG_PEEK))
+            finally:
+                self._sock.settimeout(self.timeout)
+        except BlockingIOError:
+            ativa = True  # nada a ler: a conexão continua aberta
+        except OSError:
+            ativa = False
+        if not ativa:
+            self.fechar()
+
+    def iniciar_job(self, titulo: str) -> None:
+        self._descartar_se_fechada()
+        self._conectar()
+
+    def escrever(self, dados: bytes | memoryview) -> None:
+        self._conectar().sendall(dados)
+
+    def abortar_job(self) -> None:
+        # conexão em estado desconhecido: a próxima tentativa reconecta
+        self.fechar()
+
+    def sondar(self) -> bool:
+        self._descartar_se_fechada()
+        try:
+            self._conectar()
+        except OSError:
+            return False
+        return True
+
+    def consultar(self, comando: bytes, tamanho: int = 1) -> bytes:
+        self._descartar_se_fechada()
+        sock = self._conectar()
+        sock.sendall(comando)
+        try:
+            return sock.recv(tamanho)
+        except TimeoutError:
+            # impressora sem resposta ao comando: a conexão segue utilizável
+            raise
+        except OSError:
+            self.fechar()
+            raise
+
+    def fechar(self) -> None:
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
+
+
+class TransporteArquivo(Transporte):
+    """Grava os jobs em um arquivo ou dispositivo local."""
+
+    def __init__(self, caminho: str) -> None:
+        self.nome = f"arquivo:{caminho}"
+        self.caminho = caminho
+        self._arquivo: Any = None
+
+    def iniciar_job(self, titulo: str) -> None:
+        self._arquivo = open(self.caminho, "ab")
+
+    def escrever(self, dados: bytes | memoryview) -> None:
+        self._arquivo.write(dados)
+
+    def finalizar_job(self) -> None:
+        self._arquivo.close()
+        self._arquivo = None
+
+    def abortar_job(self) -> None:
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+
+class TransporteMemoria(TransporteBidirecional):
+    """Captura os jobs em memória, sem impressora.
+
+    :meth:`consultar` devolve as ``respostas`` em ordem, repetindo a última;
+    sem ``respostas`` a impressora simulada está sempre pronta (``0x00``).
+    """
+
+    def __init__(self, nome: str = "memoria", respostas: list[bytes] | None = None):
+        self.nome = nome
+        self.jobs: list[bytes] = []
+        self._atual: bytearray | None = None
+        self.respostas = list(respostas or [b"\x00"])
+        self.consultas = 0
+
+    def iniciar_job(self, titulo: str) -> None:
+        self._atual = bytearray()
+
+    def escrever(self, dados: bytes | memoryview) -> None:
+        if self._atual is None:
+            raise RuntimeError("Nenhum job iniciado")
+        self._atual += dados
+
+    def finalizar_job(self) -> None:
+        if self._atual is not None:
+            self.jobs.append(bytes(self._atual))
+        self._atual = None
+
+    def abortar_job(self) -> None:
+        # o que já foi escrito "chegou" à impressora
+        if self._atual:
+            self.jobs.append(bytes(self._atual))
+        self._atual = None
+
+    def consultar(self, comando: bytes, tamanho: int = 1) -> bytes:
+        self.consultas += 1
+        if len(self.respostas) > 1:
+            return self.respostas.pop(0)[:tamanho]
+        return self.respostas[0][:tamanho]
+
+
+_transportes: dict[str, Transporte] = {}
+_transportes_lock = threading.Lock()
+
+
+def _interpretar_destino(destino: str) -> tuple[str, str, int]:
+    """Separa ``destino`` em tipo, endereço e porta.
+
+    Raises:
+        ValueError: Se o destino não for reconhecido ou estiver incompleto.
+    """
+
+    if destino in ("", "win32"):
+        return "win32", "", 0
+    if destino.startswith("tcp://"):
+        endereco = destino[len("tcp://") :].rstrip("/")
+        host, _, porta = endereco.rpartition(":")
+        if not host:
+            host, porta = endereco, ""
+        if not host:
+            raise ValueError("Informe o endereço: tcp://host[:porta]")
+        if porta and not porta.isdigit():
+            raise ValueError(f"Porta inválida: {porta}")
+        numero = int(porta) if porta else PORTA_RAW_PADRAO
+        if not 0 < numero < 65536:
+            raise ValueError(f"Porta inválida: {porta}")
+        return "tcp", host, numero
+    for tipo in ("win32", "arquivo"):
+        if destino.startswith(f"{tipo}:"):
+            alvo = destino[len(tipo) + 1 :]
+            if not alvo:
+                raise ValueError(f"Informe o destino após '{tipo}:'")
+            return tipo, alvo, 0
+    if destino == "memoria":
+        return "memoria", "", 0
+    raise ValueError(f"Transporte desconhecido: {destino}")
+
+
+def validar_destino(destino: str, aceitar_padrao: bool = True) -> None:
+    """Confere a sintaxe de ``destino`` sem abrir conexões.
+
+    Args:
+        destino: Texto digitado pelo usuário.
+        aceitar_padrao: Se vazio e ``win32`` (a impressora padrão do Windows)
+            são aceitos; o pool exige impressoras nomeadas.
+
+    Raises:
+        ValueError: Com a mensagem a exibir ao usuário.
+    """
+
+    tipo, endereco, _ = _interpretar_destino(destino)
+    if tipo == "win32" and not endereco and not aceitar_padrao:
+        raise ValueError("Informe a impressora: win32:<nome>")
+
+
+def criar_transporte(destino: str) -> Transporte:
+    """Cria o transporte descrito por ``destino`` (ver docstring do módulo).
+
+    Raises:
+        ValueError: Se o destino não for reconhecido ou não indicar uma
+            impressora (``""`` e ``win32`` são resolvidos por
+            :func:`printing.transporte_configurado`).
+    """
+
+    tipo, endereco, porta = _interpretar_destino(destino)
+    if tipo == "tcp":
+        return TransporteTCP(endereco, porta)
+    if tipo == "win32" and endereco:
+        return TransporteWin32(endereco)
+    if tipo == "arquivo":
+        return TransporteArquivo(endereco)
+    if tipo == "memoria":
+        return TransporteMemoria()
+    raise ValueError(f"Transporte sem impressora definida: {destino!r}")
+
+
+def obter_transporte(destino: str) -> Transporte:
+    """Retorna o transporte de ``destino``, reutilizando instâncias existentes.
+
+    Assim a conexão TCP é aberta uma vez e mantida entre os jobs.
+    """
+
+    with _transportes_lock:
+        transporte = _transportes.get(destino)
+        if transporte is None:
+            transporte = criar_transporte(destino)
+            _transportes[destino] = transporte
+        return transporte
+
+
+def fechar_transportes() -> None:
+    """Encerra e descarta todos os transportes mantidos em cache."""
+
+    with _transportes_lock:
+        for transporte in _transportes.values():
+            transporte.fechar()
+        _transportes.clear()
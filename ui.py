@@ -2,9 +2,9 @@
 
 import os
 from datetime import datetime
-from typing import Any, TypedDict
+from typing import Any, TypedDict, cast
 
-from PyQt5.QtCore import QDateTime, Qt, QTime, QTimer, QUrl
+from PyQt5.QtCore import QDateTime, QObject, Qt, QTime, QTimer, QUrl, pyqtSignal
 from PyQt5.QtGui import (
     QCloseEvent,
     QColor,
@@ -19,6 +19,7 @@ from PyQt5.QtWidgets import (
     QComboBox,
     QDialog,
     QDialogButtonBox,
+    QFileDialog,
     QFormLayout,
     QFrame,
     QGridLayout,
@@ -38,25 +39,42 @@ from PyQt5.QtWidgets import (
 )
 
 from log import LOG_FILE, logger
+from manifest import (
+    ErroManifesto,
+    ItemManifesto,
+    carregar_manifesto,
+    registrar_enviadas,
+)
 from persistence import (
-    atualizar_recentes,
+    carregar_checkpoint,
     carregar_config,
     carregar_contagem,
     carregar_historico_mensal,
     carregar_recentes_listas,
+    configurar_armazenamento,
+    exportar_historico,
     gerar_relatorio_mensal,
-    registrar_contagem_mensal,
+    limpar_checkpoint,
+    registrar_impressao,
     salvar_config,
-    salvar_contagem,
-    salvar_historico,
 )
+from print_queue import PRIORIDADE_URGENTE, FilaImpressao, JobImpressao
+from printer_pool import faixas_faltantes
 from printing import (
+    MODOS_IMPRESSAO,
+    ErroImpressora,
     aplicar_template,
     descobrir_impressora_padrao,
-    imprimir_etiqueta,
-    imprimir_pagina_teste,
+    invalidar_impressora,
     listar_templates,
 )
+from resilience import (
+    CODIGO_CIRCUITO_ABERTO,
+    SEM_RETENTATIVA,
+    PoliticaRetentativa,
+    configurar_disjuntores,
+)
+from transport import validar_destino
 from utils import backup_automatico, normalize_text, recurso_caminho
 
 CATEGORIAS_PADRAO = [
@@ -140,6 +158,16 @@ class ConfigDialog(QDialog):
         self.printer_edit = QLineEdit(settings.get("ultima_impressora", ""))
         form.addRow("Impressora:", self.printer_edit)
 
+        self.transporte_edit = QLineEdit(settings.get("transporte", ""))
+        self.transporte_edit.setPlaceholderText(
+            "win32 | tcp://host:9100 | arquivo:/dev/usb/lp0"
+        )
+        form.addRow("Transporte:", self.transporte_edit)
+
+        self.pool_edit = QLineEdit(", ".join(settings.get("pool_impressoras") or []))
+        self.pool_edit.setPlaceholderText("win32:Zebra1, tcp://10.0.0.5:9100")
+        form.addRow("Pool de impressoras:", self.pool_edit)
+
         self.template_combo = QComboBox()
         self.template_combo.addItems(listar_templates())
         idx = self.template_combo.findText(settings.get("template", "Padrão"))
@@ -151,6 +179,25 @@ class ConfigDialog(QDialog):
         self.retry_check.setChecked(bool(settings.get("retry_automatico")))
         form.addRow("Repetir em falha:", self.retry_check)
 
+        self.logo_residente_check = QCheckBox("Manter logo na memória da impressora")
+        self.logo_residente_check.setChecked(bool(settings.get("logo_residente")))
+        form.addRow("Logo:", self.logo_residente_check)
+
+        self.modo_combo = QComboBox()
+        self.modo_combo.addItems(MODOS_IMPRESSAO)
+        idx = self.modo_combo.findText(settings.get("modo_impressao", "padrao"))
+        if idx >= 0:
+            self.modo_combo.setCurrentIndex(idx)
+        form.addRow("Modo de impressão:", self.modo_combo)
+
+        self.por_documento_spin = QSpinBox()
+        self.por_documento_spin.setRange(0, 10000)
+        self.por_documento_spin.setSpecialValueText("Lote inteiro")
+        self.por_documento_spin.setValue(
+            int(settings.get("etiquetas_por_documento") or 0)
+        )
+        form.addRow("Etiquetas por documento:", self.por_documento_spin)
+
         self.time_edit = QTimeEdit()
         horario = settings.get("backup_horario", "17:10")
         hora = QTime.fromString(str(horario), "HH:mm")
@@ -167,17 +214,65 @@ class ConfigDialog(QDialog):
         botoes.rejected.connect(self.reject)
         layout.addWidget(botoes)
 
+    def accept(self) -> None:
+        """Só fecha a janela se os destinos de impressão forem válidos."""
+
+        destinos = [(self.transporte_edit.text().strip(), True)] + [
+            (destino, False) for destino in self.obter_config()["pool_impressoras"]
+        ]
+        for destino, aceitar_padrao in destinos:
+            try:
+                validar_destino(destino, aceitar_padrao)
+            except ValueError as exc:
+                QMessageBox.warning(
+                    self, "Destino inválido", f"{destino or 'Transporte'}: {exc}"
+                )
+                return
+        super().accept()
+
     def obter_config(self) -> dict[str, Any]:
         """Retorna as configurações ajustadas pelo usuário."""
 
         return {
             "ultima_impressora": self.printer_edit.text().strip(),
+            "transporte": self.transporte_edit.text().strip(),
+            "pool_impressoras": [
+                destino.strip()
+                for destino in self.pool_edit.text().split(",")
+                if destino.strip()
+            ],
             "template": self.template_combo.currentText(),
             "retry_automatico": self.retry_check.isChecked(),
+            "logo_residente": self.logo_residente_check.isChecked(),
+            "modo_impressao": self.modo_combo.currentText(),
+            "etiquetas_por_documento": self.por_documento_spin.value(),
             "backup_horario": self.time_edit.time().toString("HH:mm"),
         }
 
 
+# Mensagens de status (sucesso, falha) de cada tipo de job
+MENSAGENS_JOB: dict[str, tuple[str, str]] = {
+    "nova": ("✅ Impressão concluída", "⚠️ Erro na impressão"),
+    "reimpressao": ("♻️ Reimpressão concluída", "⚠️ Erro na reimpressão"),
+    "faltantes": (
+        "♻️ Faltantes reimpressas",
+        "⚠️ Erro na reimpressão de faltantes",
+    ),
+    "intervalo": ("♻️ Intervalo reimpresso", "⚠️ Erro na reimpressão do intervalo"),
+    "teste": ("✅ Página de teste impressa", "⚠️ Erro na impressão de teste"),
+    "manifesto": ("✅ Manifesto impresso", "⚠️ Erro na impressão do manifesto"),
+}
+
+
+class SinaisFila(QObject):
+    """Sinais que levam os eventos da fila de impressão para a thread do Qt."""
+
+    iniciado = pyqtSignal(object)
+    progresso = pyqtSignal(object, int, int)
+    concluido = pyqtSignal(object)
+    falhou = pyqtSignal(object, object)
+
+
 class EtiquetaInfo(TypedDict):
     saida: str
     categoria: str
@@ -198,8 +293,11 @@ class EtiquetaApp(QWidget):
         self.setGeometry(300, 100, 800, 720)
         self.setWindowIcon(QIcon(recurso_caminho("color.png")))
         self.config = carregar_config()
+        configurar_armazenamento(str(self.config.get("armazenamento", "arquivos")))
         self.contagem_total, self.contagem_mensal = carregar_contagem()
         self.ultima_etiqueta: EtiquetaInfo | None = None
+        # faixas (primeira, ultima) do último lote que não foram enviadas
+        self._faixas_faltantes: list[tuple[int, int]] = []
         self._contagem_label = QLabel()
         self._contagem_label.setStyleSheet(
             "color: #CCCCCC; font-size: 15px; font-weight: 500; padding: 8px; "
@@ -208,10 +306,13 @@ class EtiquetaApp(QWidget):
         self._atualizar_contagem_label()
 
         self._setup_ui()
+        self._aplicar_disjuntor_config()
+        self._iniciar_fila()
         self._aplicar_tema_escuro()
         self._atualizar_status("🟢 Pronto")
         self._agendar_backup_diario()
         self._verificar_impressora()
+        self._recuperar_lote_interrompido()
 
     def _agendar_backup_diario(self) -> None:
         """Agenda a execução do backup diário conforme configuração."""
@@ -244,10 +345,23 @@ class EtiquetaApp(QWidget):
     def closeEvent(self, event: QCloseEvent) -> None:
         """Garante um backup ao fechar a janela.
 
+        Se houver impressões na fila, pede confirmação e as cancela.
+
         Args:
             event: Evento de fechamento recebido do Qt.
         """
 
+        if self.fila.ocupada():
+            resposta = QMessageBox.question(
+                self,
+                "Impressões pendentes",
+                "Há impressões em andamento. Cancelar e sair?",
+            )
+            if resposta != QMessageBox.Yes:
+                event.ignore()
+                return
+            self.fila.cancelar_todos()
+        self.fila.parar(timeout=5)
         backup_automatico()
         event.accept()
 
@@ -390,6 +504,9 @@ class EtiquetaApp(QWidget):
         self.reimprimir_intervalo_btn = QPushButton("Reimprimir Intervalo…")
         self.reimprimir_intervalo_btn.clicked.connect(self._reimprimir_intervalo)
 
+        self.manifesto_btn = QPushButton("Imprimir Manifesto…")
+        self.manifesto_btn.clicked.connect(self._imprimir_manifesto)
+
         self.historico_btn = QPushButton("Abrir Histórico")
         self.historico_btn.clicked.connect(self._abrir_historico)
 
@@ -409,13 +526,17 @@ class EtiquetaApp(QWidget):
         self.config_btn.clicked.connect(self._abrir_configuracoes)
 
         self.testar_conexao_btn = QPushButton("Testar conexão")
-        self.testar_conexao_btn.clicked.connect(self._verificar_impressora)
+        self.testar_conexao_btn.clicked.connect(self._testar_conexao)
+
+        self.cancelar_btn = QPushButton("Cancelar impressão")
+        self.cancelar_btn.clicked.connect(self._cancelar_impressoes)
 
         for b in (
             self.imprimir_btn,
             self.reimprimir_btn,
             self.reimprimir_faltantes_btn,
             self.reimprimir_intervalo_btn,
+            self.manifesto_btn,
             self.historico_btn,
             self.historico_mes_btn,
             self.exportar_relatorio_btn,
@@ -423,6 +544,7 @@ class EtiquetaApp(QWidget):
             self.teste_pagina_btn,
             self.config_btn,
             self.testar_conexao_btn,
+            self.cancelar_btn,
         ):
             b.setStyleSheet(
                 "background:#24292e;color:#eeeeee;padding:8px 18px;border-radius:6px;"
@@ -430,6 +552,7 @@ class EtiquetaApp(QWidget):
             )
             botoes.addWidget(b)
         self.testar_conexao_btn.hide()
+        self.cancelar_btn.hide()
         layout_quadro.addLayout(botoes)
 
         # Status
@@ -510,10 +633,7 @@ class EtiquetaApp(QWidget):
             return texto_norm, True
         return texto_norm, False
 
-    def _atualizar_listas_recentes(
-        self, categoria: str, emissor: str, municipio: str
-    ) -> None:
-        atualizar_recentes(categoria, emissor, municipio)
+    def _reordenar_recentes(self) -> None:
         recentes = carregar_recentes_listas()
         self._reordenar_combo(self.categoria_input, recentes.get("categoria", []))
         self._reordenar_combo(self.emissor_input, recentes.get("emissor", []))
@@ -527,6 +647,40 @@ class EtiquetaApp(QWidget):
             combo.setCurrentIndex(0)
         self.volumes_input.setValue(1)
 
+    def _opcoes_impressao(self) -> dict[str, Any]:
+        """Opções repassadas a todas as chamadas de ``imprimir_etiqueta``."""
+
+        return {
+            "politica": self._politica_retentativa(),
+            "template": self.template_input.currentText(),
+            "logo_residente": bool(self.config.get("logo_residente")),
+            "modo": str(self.config.get("modo_impressao", "padrao")),
+            "etiquetas_por_documento": int(
+                self.config.get("etiquetas_por_documento") or 0
+            ),
+        }
+
+    def _politica_retentativa(self) -> PoliticaRetentativa:
+        """Política de novas tentativas conforme a opção "Repetir em falha"."""
+
+        if not self.retry_checkbox.isChecked():
+            return SEM_RETENTATIVA
+        return PoliticaRetentativa.de_config(self.config.get("retentativa"))
+
+    def _aplicar_disjuntor_config(self) -> None:
+        dados = self.config.get("disjuntor") or {}
+        configurar_disjuntores(
+            int(dados.get("falhas_para_abrir", 3)),
+            float(dados.get("tempo_aberto", 30)),
+        )
+
+    def _pool_para(self, volumes: int) -> list[str]:
+        """Impressoras do pool, se o lote for grande o bastante para dividir."""
+
+        if volumes < int(self.config.get("pool_lote_minimo") or 0):
+            return []
+        return list(self.config.get("pool_impressoras") or [])
+
     def _salvar_template_config(self, texto: str) -> None:
         """Persistir seleção de template."""
 
@@ -546,6 +700,8 @@ class EtiquetaApp(QWidget):
         if dlg.exec_():
             self.config.update(dlg.obter_config())
             salvar_config(self.config)
+            invalidar_impressora()
+            self._aplicar_disjuntor_config()
             idx = self.template_input.findText(self.config.get("template", "Padrão"))
             if idx >= 0:
                 self.template_input.setCurrentIndex(idx)
@@ -565,8 +721,21 @@ class EtiquetaApp(QWidget):
             self.imprimir_btn.setEnabled(True)
             self.testar_conexao_btn.hide()
             self._atualizar_status("🟢 Pronto")
-            self.config["ultima_impressora"] = nome
-            salvar_config(self.config)
+            # com outro transporte o nome é o destino (ex.: tcp://host:9100),
+            # não uma fila do spooler
+            destino = str(self.config.get("transporte") or "")
+            if (
+                destino in ("", "win32")
+                and self.config.get("ultima_impressora") != nome
+            ):
+                self.config["ultima_impressora"] = nome
+                salvar_config(self.config)
+
+    def _testar_conexao(self) -> None:
+        """Sonda a impressora de novo, sem usar a resolução em cache."""
+
+        invalidar_impressora()
+        self._verificar_impressora()
 
     def _atualizar_status(
         self, mensagem: str = "🟢 Pronto", cor: str = "white"
@@ -586,7 +755,7 @@ class EtiquetaApp(QWidget):
 
         import subprocess
 
-        caminho = recurso_caminho("historico_impressoes.csv")
+        caminho = exportar_historico()
         if os.path.exists(caminho):
             subprocess.Popen(["start", "", caminho], shell=True)
         else:
@@ -595,93 +764,112 @@ class EtiquetaApp(QWidget):
             )
 
     def _imprimir_etiqueta(self) -> None:
-        """Coleta dados do formulário e solicita a impressão."""
+        """Coleta dados do formulário e envia o job para a fila de impressão."""
 
-        self._atualizar_status("🖨️ Imprimindo…")
         saida, err = self._sanitize_input(self.saida_input, 20)
         if err or saida == "":
             if saida == "":
                 QMessageBox.warning(
                     self, "Campo obrigatório", "Preencha o campo Saída."
                 )
-            self._atualizar_status()
             return
 
         categoria, err = self._sanitize_input(self.categoria_input, 50)
         if err:
-            self._atualizar_status()
             return
 
         emissor, err = self._sanitize_input(self.emissor_input, 50)
         if err:
-            self._atualizar_status()
             return
 
         municipio, err = self._sanitize_input(self.municipio_input, 50)
         if err:
-            self._atualizar_status()
             return
         volumes = self.volumes_input.value()
         data_hora = datetime.now().strftime("%d/%m/%Y %H:%M")
 
-        ok, erro = imprimir_etiqueta(
-            saida,
-            categoria,
-            emissor,
-            municipio,
-            volumes,
-            data_hora,
-            self.contagem_total,
-            self.contagem_mensal,
-            repetir_em_falha=self.retry_checkbox.isChecked(),
-        )
-
-        if not ok:
-            self._atualizar_status("⚠️ Erro na impressão", "orange")
-            logger.error("Erro na impressão: %s", erro)
-            QMessageBox.critical(self, "Erro", f"{erro['code']}: {erro['message']}")
-            return
-
-        try:
-            self.contagem_total += volumes
-            self.contagem_mensal += volumes
-            salvar_contagem(self.contagem_total, self.contagem_mensal)
-
-            salvar_historico(saida, categoria, emissor, municipio, volumes, data_hora)
-            self.ultima_etiqueta = EtiquetaInfo(
+        self._enfileirar(
+            JobImpressao(
                 saida=saida,
                 categoria=categoria,
                 emissor=emissor,
                 municipio=municipio,
                 volumes=volumes,
                 data_hora=data_hora,
+                opcoes=self._opcoes_impressao(),
+                acao="nova",
+                checkpoint=True,
+                pool=self._pool_para(volumes),
             )
+        )
 
-            self._atualizar_listas_recentes(categoria, emissor, municipio)
+    def _imprimir_manifesto(self) -> None:
+        """Imprime todas as saídas de um manifesto CSV/JSON em um único job."""
 
-            mes_atual = datetime.now().strftime("%m-%Y")
-            registrar_contagem_mensal(mes_atual, volumes)
-            self._atualizar_status("✅ Impressão concluída", "lightgreen")
-            QTimer.singleShot(30000, self._limpar_campos)
-            self._atualizar_contagem_label()
-        except Exception as e:
-            self._atualizar_status("⚠️ Erro na impressão", "orange")
-            logger.exception("Erro na impressão")
-            QMessageBox.critical(self, "Erro", str(e))
+        caminho, _ = QFileDialog.getOpenFileName(
+            self, "Abrir manifesto", "", "Manifestos (*.csv *.json);;Todos (*)"
+        )
+        if not caminho:
+            return
+        try:
+            itens = carregar_manifesto(caminho)
+        except (OSError, ErroManifesto) as e:
+            QMessageBox.critical(self, "Manifesto inválido", str(e))
+            return
+        if not itens:
+            QMessageBox.information(
+                self, "Manifesto vazio", "Nenhuma saída encontrada."
+            )
+            return
+        total = sum(item["volumes"] for item in itens)
+        resposta = QMessageBox.question(
+            self,
+            "Imprimir manifesto",
+            f"Imprimir {len(itens)} saídas ({total} etiquetas)?",
+        )
+        if resposta != QMessageBox.Yes:
+            return
+        opcoes = self._opcoes_impressao()
+        # o manifesto é sempre enviado no modo padrão
+        opcoes.pop("modo")
+        self._enfileirar(
+            JobImpressao(
+                tipo="manifesto",
+                acao="manifesto",
+                itens=[dict(item) for item in itens],
+                volumes=total,
+                data_hora=datetime.now().strftime("%d/%m/%Y %H:%M"),
+                opcoes=opcoes,
+            )
+        )
 
-    def _imprimir_teste(self) -> None:
-        """Imprime uma página de teste padrão."""
+    def _registrar_manifesto(self, job: JobImpressao, enviadas: int) -> None:
+        """Registra, de uma só vez, as saídas do manifesto já enviadas."""
 
-        self._atualizar_status("🖨️ Imprimindo teste…")
-        ok, erro = imprimir_pagina_teste(
-            repetir_em_falha=self.retry_checkbox.isChecked()
+        if enviadas <= 0:
+            return
+        self.contagem_total, self.contagem_mensal = registrar_enviadas(
+            [cast(ItemManifesto, item) for item in job.itens],
+            enviadas,
+            job.data_hora,
+        )
+        self._reordenar_recentes()
+        self._atualizar_contagem_label()
+
+    def _imprimir_teste(self) -> None:
+        """Envia uma página de teste padrão para a fila de impressão."""
+
+        self._enfileirar(
+            JobImpressao(
+                tipo="teste",
+                acao="teste",
+                prioridade=PRIORIDADE_URGENTE,
+                opcoes={
+                    "politica": self._politica_retentativa(),
+                    "template": self.template_input.currentText(),
+                },
+            )
         )
-        if ok:
-            self._atualizar_status("✅ Página de teste impressa", "lightgreen")
-        else:
-            self._atualizar_status("⚠️ Erro na impressão de teste", "orange")
-            logger.error("Erro na impressão de teste: %s", erro)
-            QMessageBox.critical(self, "Erro", f"{erro['code']}: {erro['message']}")
 
     def _reimprimir_ultima(self) -> None:
         """Reimprime a última etiqueta gerada, se houver."""
@@ -691,24 +879,7 @@ class EtiquetaApp(QWidget):
                 self, "Nenhuma etiqueta", "Nenhuma etiqueta foi impressa ainda."
             )
             return
-        dados = self.ultima_etiqueta
-        ok, erro = imprimir_etiqueta(
-            dados["saida"],
-            dados["categoria"],
-            dados["emissor"],
-            dados["municipio"],
-            dados["volumes"],
-            dados["data_hora"],
-            self.contagem_total,
-            self.contagem_mensal,
-            repetir_em_falha=self.retry_checkbox.isChecked(),
-        )
-        if ok:
-            self._atualizar_status("♻️ Reimpressão concluída", "lightblue")
-        else:
-            self._atualizar_status("⚠️ Erro na reimpressão", "orange")
-            logger.error("Erro na reimpressão: %s", erro)
-            QMessageBox.critical(self, "Erro", f"{erro['code']}: {erro['message']}")
+        self._enfileirar(self._job_da_ultima("reimpressao"))
 
     def _reimprimir_faltantes(self) -> None:
         """Reimprime apenas as etiquetas que faltaram de um lote."""
@@ -719,8 +890,26 @@ class EtiquetaApp(QWidget):
             )
             return
 
-        dados = self.ultima_etiqueta
-        total = int(dados["volumes"])
+        total = int(self.ultima_etiqueta["volumes"])
+
+        if self._faixas_faltantes:
+            # o lote parou (ou foi dividido no pool): reimprime o que não saiu
+            faixas = ", ".join(f"{ini}-{fim}" for ini, fim in self._faixas_faltantes)
+            resposta = QMessageBox.question(
+                self,
+                "Reimprimir Faltantes",
+                f"Não foram enviadas as etiquetas {faixas} desse lote de {total}."
+                "\n\nReimprimir essas etiquetas?",
+                QMessageBox.Yes | QMessageBox.No,
+            )
+            if resposta == QMessageBox.Yes:
+                for ini, fim in self._faixas_faltantes:
+                    self._enfileirar(
+                        self._job_da_ultima(
+                            "faltantes", inicio=ini, volumes=fim - ini + 1
+                        )
+                    )
+            return
 
         faltantes, ok = QInputDialog.getInt(
             self,
@@ -735,49 +924,9 @@ class EtiquetaApp(QWidget):
             return
 
         inicio = total - faltantes + 1
-
-        try:
-            from persistence import salvar_contagem, salvar_historico
-
-            ok, erro = imprimir_etiqueta(
-                dados["saida"],
-                dados["categoria"],
-                dados["emissor"],
-                dados["municipio"],
-                faltantes,
-                dados["data_hora"],
-                self.contagem_total,
-                self.contagem_mensal,
-                inicio_indice=inicio,
-                total_exibicao=total,
-                repetir_em_falha=self.retry_checkbox.isChecked(),
-            )
-
-            if not ok:
-                self._atualizar_status("⚠️ Erro na reimpressão de faltantes", "orange")
-                logger.error("Erro na reimpressão de faltantes: %s", erro)
-                QMessageBox.critical(self, "Erro", f"{erro['code']}: {erro['message']}")
-                return
-
-            # Atualiza contadores e histórico apenas com as faltantes
-            self.contagem_total += faltantes
-            self.contagem_mensal += faltantes
-            salvar_contagem(self.contagem_total, self.contagem_mensal)
-            salvar_historico(
-                dados["saida"],
-                dados["categoria"],
-                dados["emissor"],
-                dados["municipio"],
-                faltantes,
-                datetime.now().strftime("%d/%m/%Y %H:%M"),
-            )
-            self._atualizar_contagem_label()
-
-            self._atualizar_status("♻️ Faltantes reimpressas", "lightblue")
-        except Exception as e:
-            self._atualizar_status("⚠️ Erro na reimpressão de faltantes", "orange")
-            logger.exception("Erro na reimpressão de faltantes")
-            QMessageBox.critical(self, "Erro", str(e))
+        self._enfileirar(
+            self._job_da_ultima("faltantes", inicio=inicio, volumes=faltantes)
+        )
 
     def _reimprimir_intervalo(self) -> None:
         """Reimprime um intervalo específico da última etiqueta."""
@@ -788,8 +937,7 @@ class EtiquetaApp(QWidget):
             )
             return
 
-        dados = self.ultima_etiqueta
-        total = int(dados["volumes"])
+        total = int(self.ultima_etiqueta["volumes"])
 
         intervalo, ok = QInputDialog.getText(
             self,
@@ -820,33 +968,256 @@ class EtiquetaApp(QWidget):
             )
             return
 
-        volumes = fim - inicio + 1
+        self._enfileirar(
+            self._job_da_ultima("intervalo", inicio=inicio, volumes=fim - inicio + 1)
+        )
 
+    # -------------------- fila de impressão --------------------
+
+    def _iniciar_fila(self) -> None:
+        """Cria a fila de impressão em segundo plano e conecta seus sinais."""
+
+        self._sinais_fila = SinaisFila(self)
+        self._sinais_fila.iniciado.connect(self._ao_iniciar_job)
+        self._sinais_fila.progresso.connect(self._ao_progresso_job)
+        self._sinais_fila.concluido.connect(self._ao_concluir_job)
+        self._sinais_fila.falhou.connect(self._ao_falhar_job)
+        self.fila = FilaImpressao(
+            ao_iniciar=self._sinais_fila.iniciado.emit,
+            ao_progresso=self._sinais_fila.progresso.emit,
+            ao_concluir=self._sinais_fila.concluido.emit,
+            ao_falhar=self._sinais_fila.falhou.emit,
+        )
+        self.fila.iniciar()
+
+    def _job_da_ultima(
+        self, acao: str, inicio: int = 1, volumes: int | None = None
+    ) -> JobImpressao:
+        """Monta um job de reimpressão a partir da última etiqueta."""
+
+        dados = self.ultima_etiqueta
+        assert dados is not None
+        total = int(dados["volumes"])
+        return JobImpressao(
+            saida=dados["saida"],
+            categoria=dados["categoria"],
+            emissor=dados["emissor"],
+            municipio=dados["municipio"],
+            volumes=total if volumes is None else volumes,
+            data_hora=dados["data_hora"],
+            inicio_indice=inicio,
+            total_exibicao=total,
+            opcoes=self._opcoes_impressao(),
+            acao=acao,
+            # reimpressões passam à frente de lotes em andamento
+            prioridade=PRIORIDADE_URGENTE,
+        )
+
+    def _enfileirar(self, job: JobImpressao) -> None:
+        """Envia o job para a fila sem bloquear a interface."""
+
+        if self.fila.enviar(job) is not job:
+            # clique duplo: o job idêntico já está na fila
+            return
+        self.cancelar_btn.show()
+        pendentes = len(self.fila.pendentes())
+        if pendentes > 1:
+            self._atualizar_status(f"🕒 {pendentes} impressões na fila")
+        else:
+            self._atualizar_status("🖨️ Imprimindo…")
+
+    def _cancelar_impressoes(self) -> None:
+        """Cancela a impressão em andamento e as que aguardam na fila."""
+
+        self.fila.cancelar_todos()
+        self._atualizar_status("⏹️ Cancelando…", "orange")
+
+    def _ao_iniciar_job(self, job: JobImpressao) -> None:
+        texto = "teste" if job.tipo == "teste" else f"saída {job.saida}"
+        self._atualizar_status(f"🖨️ Imprimindo {texto}…")
+
+    def _ao_progresso_job(self, job: JobImpressao, enviadas: int, total: int) -> None:
+        if total > 1:
+            self._atualizar_status(
+                f"🖨️ Imprimindo saída {job.saida}: {enviadas}/{total}"
+            )
+
+    def _ao_terminar_job(self) -> None:
+        if not self.fila.ocupada():
+            self.cancelar_btn.hide()
+
+    def _ao_concluir_job(self, job: JobImpressao) -> None:
+        """Atualiza contadores, histórico e status após um job concluído."""
+
+        self._ao_terminar_job()
+        sucesso, _ = MENSAGENS_JOB[job.acao]
         try:
-            ok, erro = imprimir_etiqueta(
-                dados["saida"],
-                dados["categoria"],
-                dados["emissor"],
-                dados["municipio"],
-                volumes,
-                dados["data_hora"],
-                self.contagem_total,
-                self.contagem_mensal,
-                inicio_indice=inicio,
-                total_exibicao=total,
-                repetir_em_falha=self.retry_checkbox.isChecked(),
+            if job.acao == "manifesto":
+                self._registrar_manifesto(job, job.volumes)
+
+            if job.acao == "nova":
+                self.contagem_total, self.contagem_mensal = registrar_impressao(
+                    job.saida,
+                    job.categoria,
+                    job.emissor,
+                    job.municipio,
+                    job.volumes,
+                    job.data_hora,
+                )
+                self.ultima_etiqueta = EtiquetaInfo(
+                    saida=job.saida,
+                    categoria=job.categoria,
+                    emissor=job.emissor,
+                    municipio=job.municipio,
+                    volumes=job.volumes,
+                    data_hora=job.data_hora,
+                )
+                self._reordenar_recentes()
+                limpar_checkpoint(job.id)
+                self._faixas_faltantes = []
+                QTimer.singleShot(30000, self._limpar_campos)
+            elif job.acao == "faltantes":
+                # Registra apenas as faltantes; os recentes já contam o lote
+                self.contagem_total, self.contagem_mensal = registrar_impressao(
+                    job.saida,
+                    job.categoria,
+                    job.emissor,
+                    job.municipio,
+                    job.volumes,
+                    datetime.now().strftime("%d/%m/%Y %H:%M"),
+                    recentes=False,
+                    lote=job.total_exibicao,
+                )
+                fim = job.inicio_indice + job.volumes - 1
+                self._faixas_faltantes = [
+                    faixa
+                    for faixa in self._faixas_faltantes
+                    if faixa != (job.inicio_indice, fim)
+                ]
+
+            if job.acao in ("nova", "faltantes"):
+                self._atualizar_contagem_label()
+            cor = (
+                "lightgreen"
+                if job.acao in ("nova", "teste", "manifesto")
+                else "lightblue"
             )
-            if ok:
-                self._atualizar_status("♻️ Intervalo reimpresso", "lightblue")
-            else:
-                self._atualizar_status("⚠️ Erro na reimpressão do intervalo", "orange")
-                logger.error("Erro na reimpressão do intervalo: %s", erro)
-                QMessageBox.critical(self, "Erro", f"{erro['code']}: {erro['message']}")
+            self._atualizar_status(sucesso, cor)
         except Exception as e:
-            self._atualizar_status("⚠️ Erro na reimpressão do intervalo", "orange")
-            logger.exception("Erro na reimpressão do intervalo")
+            _, falha = MENSAGENS_JOB[job.acao]
+            self._atualizar_status(falha, "orange")
+            logger.exception(falha)
             QMessageBox.critical(self, "Erro", str(e))
 
+    def _ao_falhar_job(self, job: JobImpressao, erro: ErroImpressora) -> None:
+        """Informa a falha (ou o cancelamento) de um job."""
+
+        self._ao_terminar_job()
+        impressas = erro.get("impressas")
+        if job.acao == "nova" and impressas is not None:
+            self._registrar_lote_parcial(
+                EtiquetaInfo(
+                    saida=job.saida,
+                    categoria=job.categoria,
+                    emissor=job.emissor,
+                    municipio=job.municipio,
+                    volumes=job.volumes,
+                    data_hora=job.data_hora,
+                ),
+                impressas,
+                job.id,
+            )
+        if job.acao == "manifesto" and impressas:
+            try:
+                self._registrar_manifesto(
+                    job, sum(fim - ini + 1 for ini, fim in impressas)
+                )
+            except Exception:
+                logger.exception("Erro ao registrar manifesto parcial")
+        if job.cancelado:
+            self._atualizar_status("⏹️ Impressão cancelada", "orange")
+            return
+        _, falha = MENSAGENS_JOB[job.acao]
+        if erro["code"] == CODIGO_CIRCUITO_ABERTO:
+            falha = "⛔ Impressora offline"
+        self._atualizar_status(falha, "orange")
+        logger.error("%s: %s", falha, erro)
+        texto = f"{erro['code']}: {erro['message']}"
+        if impressas:
+            faixas = ", ".join(f"{ini}-{fim}" for ini, fim in impressas)
+            texto += f"\n\nEtiquetas já enviadas: {faixas}"
+        QMessageBox.critical(self, "Erro", texto)
+
+    def _registrar_lote_parcial(
+        self,
+        dados: EtiquetaInfo,
+        impressas: list[tuple[int, int]],
+        job: int | None = None,
+    ) -> None:
+        """Registra as etiquetas já enviadas de um lote que não terminou.
+
+        O lote passa a ser a última etiqueta, e as faixas fora de
+        ``impressas`` ficam sugeridas em "Reimprimir Faltantes". O checkpoint
+        é removido só se ainda for o de ``job`` (``None`` no lote recuperado
+        ao abrir o app).
+        """
+
+        enviadas = sum(fim - ini + 1 for ini, fim in impressas)
+        try:
+            if enviadas > 0:
+                self.contagem_total, self.contagem_mensal = registrar_impressao(
+                    dados["saida"],
+                    dados["categoria"],
+                    dados["emissor"],
+                    dados["municipio"],
+                    enviadas,
+                    dados["data_hora"],
+                    lote=int(dados["volumes"]),
+                )
+                self._reordenar_recentes()
+                self._atualizar_contagem_label()
+            self.ultima_etiqueta = dados
+            self._faixas_faltantes = faixas_faltantes(
+                1, int(dados["volumes"]), impressas
+            )
+            limpar_checkpoint(job)
+        except Exception:
+            logger.exception("Erro ao registrar lote parcial")
+
+    def _recuperar_lote_interrompido(self) -> None:
+        """Registra o lote que estava sendo impresso quando o app foi fechado."""
+
+        checkpoint = carregar_checkpoint()
+        if not checkpoint:
+            return
+        dados = EtiquetaInfo(
+            saida=str(checkpoint.get("saida", "")),
+            categoria=str(checkpoint.get("categoria", "")),
+            emissor=str(checkpoint.get("emissor", "")),
+            municipio=str(checkpoint.get("municipio", "")),
+            volumes=int(checkpoint.get("volumes") or 0),
+            data_hora=str(checkpoint.get("data_hora", "")),
+        )
+        enviadas = int(checkpoint.get("enviadas") or 0)
+        if "impressas" in checkpoint:
+            impressas = [(int(ini), int(fim)) for ini, fim in checkpoint["impressas"]]
+        else:  # checkpoint de versões anteriores: envio sempre do início
+            impressas = [(1, enviadas)] if enviadas else []
+        logger.warning(
+            "Lote interrompido recuperado: saída %s, %s de %s etiquetas",
+            dados["saida"],
+            enviadas,
+            dados["volumes"],
+        )
+        self._registrar_lote_parcial(dados, impressas)
+        QMessageBox.information(
+            self,
+            "Lote interrompido",
+            f"A impressão da saída {dados['saida']} foi interrompida após "
+            f"{enviadas} de {dados['volumes']} etiquetas.\n\n"
+            'Use "Reimprimir Faltantes" para concluir o lote.',
+        )
+
     def _abrir_log(self) -> None:
         """Abre o arquivo de log gerado pela aplicação."""
 
@@ -1,12 +1,29 @@
 """Funções utilitárias utilizadas pelo aplicativo."""
 
+import hashlib
 import os
 import shutil
+import sqlite3
+import struct
 import sys
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from contextlib import closing
 from datetime import datetime
 
 from PIL import Image
 
+DITHER_PADRAO = "floydsteinberg"
+_DITHERS: dict[str, Image.Dither] = {
+    "floydsteinberg": Image.Dither.FLOYDSTEINBERG,
+    "nenhum": Image.Dither.NONE,
+}
+
+# Limites do cache de bitmaps da logo (entradas em memória e arquivos em disco)
+LOGO_CACHE_MEMORIA_MAX = 8
+LOGO_CACHE_DISCO_MAX = 16
+
 
 def _base_dir() -> str:
     """Obtém o diretório base do aplicativo.
@@ -54,13 +71,15 @@ def normalize_text(texto: str, *, max_len: int) -> tuple[str, str | None]:
 
 
 def melhorar_logo(
-    path_logo: str, largura_desejada: int = 160
+    path_logo: str, largura_desejada: int = 160, dither: str = DITHER_PADRAO
 ) -> tuple[bytes, int, int]:
     """Converte a logo para bitmap monocromático TSPL.
 
     Args:
         path_logo (str): Caminho para a imagem da logo.
         largura_desejada (int, optional): Largura final desejada. Padrão 160.
+        dither (str, optional): Modo de binarização (``floydsteinberg`` ou
+            ``nenhum``).
 
     Returns:
         tuple[bytes, int, int]: Dados do bitmap, largura em bytes e altura em pixels.
@@ -76,25 +95,230 @@ def melhorar_logo(
     )
 
     # Binarização/dithering
-    logo_bw = logo.convert("1", dither=Image.Dither.FLOYDSTEINBERG)
+    logo_bw = logo.convert("1", dither=_DITHERS[dither])
 
     largura_em_bytes = largura_desejada // 8
-    pixels = logo_bw.load()
-    if pixels is None:
-        raise RuntimeError("Falha ao carregar pixels")
+    bitmap_data = empacotar_bitmap(logo_bw, largura_em_bytes)
+    return bitmap_data, largura_em_bytes, logo_bw.height
+
+
+# Inverte todos os bits: no modo "1" do Pillow o bit 1 é branco, no TSPL é preto
+_INVERTE_BITS = bytes(255 - i for i in range(256))
+
+
+def empacotar_bitmap(imagem: Image.Image, largura_em_bytes: int) -> bytes:
+    """Empacota uma imagem modo ``1`` no formato de bits do comando ``BITMAP``.
+
+    Usa o buffer bruto do Pillow (8 pixels por byte, MSB à esquerda) e inverte
+    os bits de uma só vez, em vez de percorrer pixel a pixel. Cada linha é
+    cortada em ``largura_em_bytes``; pixels além desse limite são descartados,
+    assim como no empacotamento original.
+
+    Args:
+        imagem (Image.Image): Imagem binarizada (modo ``1``).
+        largura_em_bytes (int): Quantidade de bytes por linha no bitmap.
+
+    Returns:
+        bytes: Dados do bitmap, com bit 1 representando ponto preto.
+    """
+
+    if imagem.mode != "1":
+        raise ValueError("Imagem precisa estar no modo '1'")
+    dados = imagem.tobytes("raw", "1").translate(_INVERTE_BITS)
+    passo = (imagem.width + 7) // 8
+    sobra = imagem.width % 8
+    if passo == largura_em_bytes and not sobra:
+        # >>> importante: retornar bytes, não bytearray, para concatenar com b"..."
+        return dados
+
+    # larguras não múltiplas de 8: ajusta linha a linha (O(altura), não O(pixels))
+    mascara = (0xFF << (8 - sobra)) & 0xFF if sobra else 0xFF
+    linhas = []
+    for inicio in range(0, len(dados), passo):
+        linha = bytearray(dados[inicio : inicio + passo])
+        linha[-1] &= mascara  # zera os bits de preenchimento do Pillow
+        linhas.append(bytes(linha[:largura_em_bytes]).ljust(largura_em_bytes, b"\0"))
+    return b"".join(linhas)
 
-    bitmap_data = bytearray()
-    for y in range(logo_bw.height):
-        for x_byte in range(largura_em_bytes):
-            byte = 0
-            for b in range(8):
-                x = x_byte * 8 + b
-                if x < logo_bw.width and pixels[x, y] == 0:
-                    byte |= 1 << (7 - b)
-            bitmap_data.append(byte)
 
-    # >>> importante: retornar bytes, não bytearray, para concatenar com b"..."
-    return bytes(bitmap_data), largura_em_bytes, logo_bw.height
+_logo_lock = threading.Lock()
+_logo_memoria: OrderedDict[str, tuple[bytes, int, int]] = OrderedDict()
+_logo_hashes: dict[str, tuple[int, int, str]] = {}
+
+
+def _cache_logo_dir() -> str:
+    """Retorna o diretório do cache em disco dos bitmaps da logo.
+
+    Fica junto ao executável, e não em ``_base_dir()``: no executável de
+    arquivo único esta é a pasta temporária ``_MEIPASS``, apagada ao sair.
+    """
+
+    return os.path.join(_install_dir(), "_cache", "logo")
+
+
+def _hash_logo(path_logo: str) -> str:
+    """Calcula o SHA-256 do arquivo, reaproveitando-o enquanto não mudar.
+
+    O hash só é recalculado quando ``mtime`` ou tamanho do arquivo mudam.
+    """
+
+    st = os.stat(path_logo)
+    assinatura = (st.st_mtime_ns, st.st_size)
+    salvo = _logo_hashes.get(path_logo)
+    if salvo is not None and salvo[:2] == assinatura:
+        return salvo[2]
+    with open(path_logo, "rb") as arquivo:
+        digest = hashlib.sha256(arquivo.read()).hexdigest()
+    _logo_hashes[path_logo] = (*assinatura, digest)
+    return digest
+
+
+def _ler_logo_disco(caminho: str) -> tuple[bytes, int, int] | None:
+    """Lê um bitmap salvo no cache em disco, validando o cabeçalho."""
+
+    try:
+        with open(caminho, "rb") as arquivo:
+            dados = arquivo.read()
+        largura_bytes, altura = struct.unpack_from("<HI", dados)
+        bitmap = dados[struct.calcsize("<HI") :]
+        if len(bitmap) != largura_bytes * altura:
+            return None
+        os.utime(caminho)  # marca como usado recentemente
+        return bitmap, largura_bytes, altura
+    except (OSError, struct.error):
+        return None
+
+
+def _gravar_logo_disco(caminho: str, valor: tuple[bytes, int, int]) -> None:
+    """Grava o bitmap no cache em disco e descarta os mais antigos."""
+
+    bitmap, largura_bytes, altura = valor
+    pasta = os.path.dirname(caminho)
+    try:
+        os.makedirs(pasta, exist_ok=True)
+        temporario = f"{caminho}.tmp"
+        with open(temporario, "wb") as arquivo:
+            arquivo.write(struct.pack("<HI", largura_bytes, altura) + bitmap)
+        os.replace(temporario, caminho)
+
+        arquivos = sorted(
+            (os.path.join(pasta, f) for f in os.listdir(pasta) if f.endswith(".bin")),
+            key=os.path.getmtime,
+        )
+        for antigo in arquivos[: max(0, len(arquivos) - LOGO_CACHE_DISCO_MAX)]:
+            os.remove(antigo)
+    except OSError:
+        from log import logger
+
+        logger.exception("Falha ao gravar cache da logo em %s", caminho)
+
+
+def bitmap_para_bmp(bitmap: bytes, largura_em_bytes: int, altura: int) -> bytes:
+    """Converte o bitmap do comando ``BITMAP`` em um arquivo BMP monocromático.
+
+    O arquivo gerado é usado com ``DOWNLOAD``/``PUTBMP`` para manter a logo na
+    memória da impressora. Segue o formato BMP padrão (paleta 0=preto,
+    1=branco, linhas de baixo para cima alinhadas em 4 bytes).
+
+    Args:
+        bitmap (bytes): Dados do bitmap TSPL (bit 1 = ponto preto).
+        largura_em_bytes (int): Quantidade de bytes por linha.
+        altura (int): Altura em pixels.
+
+    Returns:
+        bytes: Conteúdo do arquivo BMP.
+    """
+
+    passo = (largura_em_bytes + 3) & ~3
+    linhas = [
+        bitmap[y * largura_em_bytes : (y + 1) * largura_em_bytes]
+        .translate(_INVERTE_BITS)
+        .ljust(passo, b"\xff")
+        for y in reversed(range(altura))
+    ]
+    pixels = b"".join(linhas)
+    paleta = b"\x00\x00\x00\x00\xff\xff\xff\x00"
+    deslocamento = 14 + 40 + len(paleta)
+    cabecalho = struct.pack(
+        "<2sIHHI", b"BM", deslocamento + len(pixels), 0, 0, deslocamento
+    )
+    info = struct.pack(
+        "<IiiHHIIiiII",
+        40,
+        largura_em_bytes * 8,
+        altura,
+        1,
+        1,
+        0,
+        len(pixels),
+        2835,
+        2835,
+        2,
+        0,
+    )
+    return cabecalho + info + paleta + pixels
+
+
+def logo_em_cache(
+    path_logo: str,
+    largura_desejada: int,
+    gerar: Callable[[], tuple[bytes, int, int]] | None = None,
+    dither: str = DITHER_PADRAO,
+) -> tuple[bytes, int, int]:
+    """Obtém o bitmap TSPL da logo a partir do cache em memória ou em disco.
+
+    A chave combina o hash do conteúdo da imagem, a largura desejada e o modo
+    de dithering, de modo que qualquer alteração no arquivo gera uma nova
+    entrada. O cache em memória é LRU com ``LOGO_CACHE_MEMORIA_MAX`` entradas
+    e o de disco mantém no máximo ``LOGO_CACHE_DISCO_MAX`` arquivos.
+
+    Args:
+        path_logo (str): Caminho para a imagem da logo.
+        largura_desejada (int): Largura final desejada em pixels.
+        gerar (Callable, optional): Função que produz o bitmap em caso de
+            falta no cache. Padrão :func:`melhorar_logo`.
+        dither (str, optional): Modo de binarização usado na chave.
+
+    Returns:
+        tuple[bytes, int, int]: Dados do bitmap, largura em bytes e altura em pixels.
+    """
+
+    if gerar is None:
+
+        def gerar() -> tuple[bytes, int, int]:
+            return melhorar_logo(path_logo, largura_desejada, dither)
+
+    with _logo_lock:
+        try:
+            digest = _hash_logo(path_logo)
+        except OSError:
+            # sem acesso ao arquivo não há chave; o gerador reporta o erro
+            return gerar()
+
+        chave = f"{digest[:32]}_{largura_desejada}_{dither}"
+        valor = _logo_memoria.get(chave)
+        if valor is not None:
+            _logo_memoria.move_to_end(chave)
+            return valor
+
+        caminho = os.path.join(_cache_logo_dir(), f"{chave}.bin")
+        valor = _ler_logo_disco(caminho)
+        if valor is None:
+            valor = gerar()
+            _gravar_logo_disco(caminho, valor)
+
+        _logo_memoria[chave] = valor
+        while len(_logo_memoria) > LOGO_CACHE_MEMORIA_MAX:
+            _logo_memoria.popitem(last=False)
+        return valor
+
+
+def limpar_cache_logo() -> None:
+    """Descarta o cache de bitmaps mantido em memória."""
+
+    with _logo_lock:
+        _logo_memoria.clear()
+        _logo_hashes.clear()
 
 
 def backup_automatico() -> None:
@@ -112,12 +336,26 @@ def backup_automatico() -> None:
     config = carregar_config()
     max_backups = int(config.get("backup_quantidade", 7))
 
-    arquivos = ["historico_impressoes.csv", "contagem.json", "contagem_mensal.json"]
+    arquivos = [
+        "historico_impressoes.csv",
+        "contagem.json",
+        "contagem_mensal.json",
+        "historico.db",
+    ]
     for arq in arquivos:
         orig = os.path.join(origem, arq)
         if os.path.exists(orig):
             nome_backup = f"{arq.replace('.', f'_{agora}.')}"
-            shutil.copy2(orig, os.path.join(destino, nome_backup))
+            caminho_backup = os.path.join(destino, nome_backup)
+            if arq.endswith(".db"):
+                # a API de backup inclui o que ainda está no journal WAL
+                with (
+                    closing(sqlite3.connect(orig)) as banco,
+                    closing(sqlite3.connect(caminho_backup)) as copia,
+                ):
+                    banco.backup(copia)
+            else:
+                shutil.copy2(orig, caminho_backup)
 
             base_nome, ext = os.path.splitext(arq)
             backups = sorted(